@@ -0,0 +1,252 @@
+from datetime import date
+import chats
+import violations
+
+# Агреговані підсумки по користувачах.
+# Таблиці user_totals і user_type_totals оновлюються в тій самій транзакції,
+# що й зміна статусу запису, тому /stats і /top не перераховують історію.
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS user_totals (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        records INTEGER NOT NULL DEFAULT 0,   -- всі записи незалежно від статусу
+        approved INTEGER NOT NULL DEFAULT 0,  -- затверджені записи
+        volume INTEGER NOT NULL DEFAULT 0,    -- затверджений об'єм, мл
+        pure_alcohol REAL NOT NULL DEFAULT 0  -- затверджений чистий спирт, мл
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_type_totals (
+        user_id INTEGER NOT NULL,
+        alcohol_type TEXT NOT NULL,
+        records INTEGER NOT NULL DEFAULT 0,
+        approved INTEGER NOT NULL DEFAULT 0,
+        volume INTEGER NOT NULL DEFAULT 0,
+        pure_alcohol REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, alcohol_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_user_totals_pure
+    ON user_totals (pure_alcohol DESC)
+    ''',
+)
+
+# Підсумки затверджених записів за днями і періодами (міграція 9).
+# День - дата з drinks.timestamp (UTC, як її записує SQLite).
+# Статистика за будь-яке вікно читає лише рядки користувача за ці дні,
+# а топ за тиждень чи місяць - перші рядки індексу period_totals.
+ROLLUP_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS user_daily_totals (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,                    -- YYYY-MM-DD
+        alcohol_type TEXT NOT NULL,
+        approved INTEGER NOT NULL DEFAULT 0,
+        volume INTEGER NOT NULL DEFAULT 0,
+        pure_alcohol REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, alcohol_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS period_totals (
+        period TEXT NOT NULL,                 -- 2024-W07 або 2024-02
+        user_id INTEGER NOT NULL,
+        approved INTEGER NOT NULL DEFAULT 0,
+        volume INTEGER NOT NULL DEFAULT 0,
+        pure_alcohol REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, user_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_period_totals_pure
+    ON period_totals (period, pure_alcohol DESC)
+    ''',
+)
+
+
+# Ключі періодів: ISO-тиждень і календарний місяць
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(day):
+    return day.strftime('%Y-%m')
+
+
+def _day_of(timestamp):
+    return date.fromisoformat(timestamp[:10])
+
+
+# Новий запис (зі статусом pending) збільшує лише лічильники записів
+def record_added(conn, user_id, username, alcohol_type):
+    conn.execute('''
+        INSERT INTO user_totals (user_id, username, records)
+        VALUES (?, ?, 1)
+        ON CONFLICT (user_id) DO UPDATE SET
+            records = records + 1,
+            username = excluded.username
+    ''', (user_id, username))
+    conn.execute('''
+        INSERT INTO user_type_totals (user_id, alcohol_type, records)
+        VALUES (?, ?, 1)
+        ON CONFLICT (user_id, alcohol_type) DO UPDATE SET
+            records = records + 1
+    ''', (user_id, alcohol_type))
+
+
+# Додаємо (sign=1) або віднімаємо (sign=-1) затверджений запис з підсумків
+def _apply_approved(conn, user_id, username, alcohol_type, volume, proof, timestamp, sign):
+    pure_alcohol = volume * proof / 100
+    conn.execute('''
+        INSERT INTO user_totals (user_id, username, approved, volume, pure_alcohol)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            approved = approved + excluded.approved,
+            volume = volume + excluded.volume,
+            pure_alcohol = pure_alcohol + excluded.pure_alcohol
+    ''', (user_id, username, sign, sign * volume, sign * pure_alcohol))
+    conn.execute('''
+        INSERT INTO user_type_totals (user_id, alcohol_type, approved, volume, pure_alcohol)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, alcohol_type) DO UPDATE SET
+            approved = approved + excluded.approved,
+            volume = volume + excluded.volume,
+            pure_alcohol = pure_alcohol + excluded.pure_alcohol
+    ''', (user_id, alcohol_type, sign, sign * volume, sign * pure_alcohol))
+    chats.apply_approved(conn, user_id, sign, sign * volume, sign * pure_alcohol)
+    day = _day_of(timestamp)
+    conn.execute('''
+        INSERT INTO user_daily_totals (user_id, day, alcohol_type, approved, volume, pure_alcohol)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, day, alcohol_type) DO UPDATE SET
+            approved = approved + excluded.approved,
+            volume = volume + excluded.volume,
+            pure_alcohol = pure_alcohol + excluded.pure_alcohol
+    ''', (user_id, day.isoformat(), alcohol_type, sign, sign * volume, sign * pure_alcohol))
+    periods = [(week_key(day), user_id, sign, sign * volume, sign * pure_alcohol),
+               (month_key(day), user_id, sign, sign * volume, sign * pure_alcohol)]
+    conn.executemany('''
+        INSERT INTO period_totals (period, user_id, approved, volume, pure_alcohol)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (period, user_id) DO UPDATE SET
+            approved = approved + excluded.approved,
+            volume = volume + excluded.volume,
+            pure_alcohol = pure_alcohol + excluded.pure_alcohol
+    ''', periods)
+    # Порожні рядки прибираємо, щоб вони не потрапляли в топ за період
+    if sign < 0:
+        conn.execute('''
+            DELETE FROM user_daily_totals
+            WHERE user_id = ? AND day = ? AND alcohol_type = ? AND approved <= 0
+        ''', (user_id, day.isoformat(), alcohol_type))
+        conn.executemany(
+            'DELETE FROM period_totals WHERE period = ? AND user_id = ? AND approved <= 0',
+            [period[:2] for period in periods]
+        )
+
+
+# Змінюємо статус запису та оновлюємо підсумки в поточній транзакції.
+# Якщо задано expected_status, зміна відбувається лише з цього статусу
+# (compare-and-set), тому повторне натискання кнопки нічого не змінить.
+# Повертає (user_id, username, alcohol_type, volume, proof, old_status)
+# або None, якщо запису немає чи статус не підходить.
+def set_status(conn, record_id, status, expected_status=None):
+    row = conn.execute('''
+        SELECT user_id, username, alcohol_type, volume, proof, status, timestamp
+        FROM drinks
+        WHERE id = ?
+    ''', (record_id,)).fetchone()
+    if row is None or row[5] == status:
+        return None
+    if expected_status is not None and row[5] != expected_status:
+        return None
+    user_id, username, alcohol_type, volume, proof, old_status, timestamp = row
+    updated = conn.execute(
+        'UPDATE drinks SET status = ? WHERE id = ? AND status = ?',
+        (status, record_id, old_status)
+    ).rowcount
+    if not updated:
+        return None
+    if status == 'approved':
+        _apply_approved(conn, user_id, username, alcohol_type, volume, proof, timestamp, 1)
+    elif old_status == 'approved':
+        _apply_approved(conn, user_id, username, alcohol_type, volume, proof, timestamp, -1)
+    # Лічильник відхилень у стані порушень користувача
+    if status == 'rejected':
+        violations.record_rejection(conn, user_id, 1)
+    elif old_status == 'rejected':
+        violations.record_rejection(conn, user_id, -1)
+    return row[:6]
+
+
+# Повністю перераховуємо підсумки з таблиці drinks (після збою чи ручних правок).
+# Повертає кількість користувачів у перерахованій таблиці.
+def rebuild(conn):
+    conn.execute('DELETE FROM user_totals')
+    conn.execute('DELETE FROM user_type_totals')
+    # username береться з останнього запису користувача (рядок з MAX(id))
+    conn.execute('''
+        INSERT INTO user_totals (user_id, username, records, approved, volume, pure_alcohol)
+        SELECT user_id, username, records, approved, volume, pure_alcohol
+        FROM (
+            SELECT
+                user_id,
+                username,
+                MAX(id),
+                COUNT(*) AS records,
+                COALESCE(SUM(status = 'approved'), 0) AS approved,
+                COALESCE(SUM(CASE WHEN status = 'approved' THEN volume ELSE 0 END), 0) AS volume,
+                COALESCE(SUM(CASE WHEN status = 'approved' THEN volume * proof / 100 ELSE 0 END), 0) AS pure_alcohol
+            FROM drinks
+            GROUP BY user_id
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO user_type_totals (user_id, alcohol_type, records, approved, volume, pure_alcohol)
+        SELECT
+            user_id,
+            alcohol_type,
+            COUNT(*),
+            COALESCE(SUM(status = 'approved'), 0),
+            COALESCE(SUM(CASE WHEN status = 'approved' THEN volume ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN status = 'approved' THEN volume * proof / 100 ELSE 0 END), 0)
+        FROM drinks
+        GROUP BY user_id, alcohol_type
+    ''')
+    return conn.execute('SELECT COUNT(*) FROM user_totals').fetchone()[0]
+
+
+# Повністю перераховуємо user_daily_totals і period_totals з таблиці drinks.
+# Повертає кількість рядків у user_daily_totals.
+def rebuild_rollups(conn):
+    conn.execute('DELETE FROM user_daily_totals')
+    conn.execute('DELETE FROM period_totals')
+    conn.execute('''
+        INSERT INTO user_daily_totals (user_id, day, alcohol_type, approved, volume, pure_alcohol)
+        SELECT user_id, date(timestamp), alcohol_type, COUNT(*), SUM(volume), SUM(volume * proof / 100)
+        FROM drinks
+        WHERE status = 'approved'
+        GROUP BY user_id, date(timestamp), alcohol_type
+    ''')
+    # ISO-тиждень SQLite до 3.46 не вміє, тому періоди рахуємо в Python
+    periods = {}
+    for user_id, day, approved, volume, pure_alcohol in conn.execute('''
+        SELECT user_id, day, SUM(approved), SUM(volume), SUM(pure_alcohol)
+        FROM user_daily_totals
+        GROUP BY user_id, day
+    '''):
+        day = date.fromisoformat(day)
+        for period in (week_key(day), month_key(day)):
+            totals = periods.setdefault((period, user_id), [0, 0, 0.0])
+            totals[0] += approved
+            totals[1] += volume
+            totals[2] += pure_alcohol
+    conn.executemany('''
+        INSERT INTO period_totals (period, user_id, approved, volume, pure_alcohol)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(period, user_id, *totals) for (period, user_id), totals in periods.items()])
+    return conn.execute('SELECT COUNT(*) FROM user_daily_totals').fetchone()[0]
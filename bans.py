@@ -0,0 +1,60 @@
+from datetime import datetime
+from expiry import ExpiryHeap
+
+# Активні бани в пам'яті: user_id -> ban_until.
+# Перевірка бану - це пошук у словнику; закінчені бани знімаються по купі
+# термінів (expiry.ExpiryHeap) без сканування, і при цьому можна повідомити
+# користувача.
+
+
+class BanIndex:
+    def __init__(self):
+        self._bans = {}
+        self._expiry = ExpiryHeap(lambda ban_until: (ban_until - datetime.now()).total_seconds())
+
+    def __len__(self):
+        return len(self._bans)
+
+    # Завантажуємо активні бани з рядків (user_id, ban_until)
+    def load(self, rows):
+        self._bans = {}
+        for user_id, ban_until in rows:
+            if isinstance(ban_until, str):
+                ban_until = datetime.fromisoformat(ban_until)
+            if ban_until > self._bans.get(user_id, datetime.min):
+                self._bans[user_id] = ban_until
+        self._expiry.reset((ban_until, user_id) for user_id, ban_until in self._bans.items())
+
+    def add(self, user_id, ban_until):
+        if ban_until <= self._bans.get(user_id, datetime.min):
+            return
+        self._bans[user_id] = ban_until
+        self._expiry.push(ban_until, user_id)
+
+    # Час закінчення бану або None, якщо користувач не заблокований
+    def get(self, user_id):
+        ban_until = self._bans.get(user_id)
+        if ban_until is None or ban_until > datetime.now():
+            return ban_until
+        return None
+
+    # Знімаємо всі закінчені бани; повертаємо список user_id
+    def expire(self, now=None):
+        now = now or datetime.now()
+        expired = []
+        for ban_until, user_id in self._expiry.pop_due(now):
+            # Запис купи застарів, якщо бан продовжили
+            if self._bans.get(user_id) == ban_until:
+                del self._bans[user_id]
+                expired.append(user_id)
+        return expired
+
+    # Фонова задача: прокидаємось до найближчого закінчення бану
+    async def run_expirer(self, on_expire, max_interval=3600):
+        async def expire():
+            for user_id in self.expire():
+                try:
+                    await on_expire(user_id)
+                except Exception as e:
+                    print(f"Помилка при знятті бану користувача {user_id}: {e}")
+        await self._expiry.run(expire, max_interval)
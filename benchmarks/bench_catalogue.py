@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import tracemalloc
+import yaml
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# Мікробенчмарк: клавіатури й тексти, які будуються на кожне оновлення
+# з config['alcohol_types'], проти готових об'єктів каталогу.
+# Запуск з кореня репозиторію: python benchmarks/bench_catalogue.py [config.yml]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalogue import Catalogue
+
+ITERATIONS = 20000
+
+
+# Як було раніше: handle_video, alcohol_ і subtype_ будують клавіатури заново
+def build_per_update(alcohol_types, alcohol_type):
+    keyboard = []
+    row = []
+    for alcohol_id, details in alcohol_types.items():
+        if len(row) == 2:
+            keyboard.append(row)
+            row = []
+        row.append(InlineKeyboardButton(details['name'], callback_data=f"alcohol_{alcohol_id}"))
+    if row:
+        keyboard.append(row)
+    type_keyboard = InlineKeyboardMarkup(keyboard)
+
+    keyboard = []
+    row = []
+    for subtype in alcohol_types[alcohol_type]['subtypes']:
+        if len(row) == 2:
+            keyboard.append(row)
+            row = []
+        row.append(InlineKeyboardButton(subtype, callback_data=f"subtype_{alcohol_type}_{subtype}"))
+    if row:
+        keyboard.append(row)
+    subtype_keyboard = InlineKeyboardMarkup(keyboard)
+    prompt = f"🥃 Виберіть підтип {alcohol_types[alcohol_type]['name']}:"
+
+    default_volume = alcohol_types[alcohol_type]['default_volume']
+    volume_keyboard = InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(f"{default_volume}мл", callback_data=f"volume_{default_volume}"),
+            InlineKeyboardButton(f"{default_volume*2}мл", callback_data=f"volume_{default_volume*2}")
+        ],
+        [
+            InlineKeyboardButton("Інший об'єм", callback_data="volume_custom")
+        ]
+    ])
+
+    text = "📋 Доступні типи алкоголю:\n\n"
+    for alcohol_id, details in alcohol_types.items():
+        text += f"🍷 {details['name']} ({details['strength']}%)\n"
+        text += f"└ Підтипи: {', '.join(details['subtypes'])}\n"
+    return type_keyboard, subtype_keyboard, prompt, volume_keyboard, text
+
+
+# Зараз: лише пошук у каталозі
+def lookup_catalogue(catalogue, type_id):
+    alcohol_type = catalogue.by_id(type_id)
+    return (catalogue.type_keyboard, alcohol_type.subtype_keyboard, alcohol_type.subtype_prompt,
+            alcohol_type.volume_keyboard, catalogue.types_text)
+
+
+def measure(name, fn, *args):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [fn(*args) for _ in range(100)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    allocated = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    del results
+
+    print(f"{name:<12} {elapsed / ITERATIONS * 1e6:8.2f} мкс/оновлення  "
+          f"{allocated / 100:9.0f} Б/оновлення  {blocks / 100:7.1f} блоків/оновлення")
+
+
+def main():
+    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.yml'
+    with open(config_path, 'r', encoding='utf-8') as file:
+        alcohol_types = yaml.safe_load(file)['alcohol_types']
+
+    alcohol_type = next(iter(alcohol_types))
+    catalogue = Catalogue(alcohol_types)
+    type_id = catalogue.get(alcohol_type).id
+
+    print(f"Типів: {len(catalogue)}, ітерацій: {ITERATIONS}")
+    measure("per-update", build_per_update, alcohol_types, alcohol_type)
+    measure("catalogue", lookup_catalogue, catalogue, type_id)
+
+
+if __name__ == '__main__':
+    main()
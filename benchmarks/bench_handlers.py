@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import yaml
+
+# Бенчмарк обробників bot.py без мережі і без облікових даних Telegram.
+# Для кожного розміру бази генерується SQLite з N записів drinks, бот
+# імпортується з тимчасовою конфігурацією (ALCOMETERBOT_CONFIG), а обробники
+# викликаються з підробленими Message/CallbackQuery і клієнтом, який лише
+# рахує надіслані повідомлення. Кожен розмір бази запускається в окремому
+# процесі, щоб стан модуля bot (рейтинг, сесії, черга) не перетікав між ними.
+# Згенерована база зберігається як шаблон, а кожен запуск працює з її копією,
+# тому записи, додані сценаріями, не впливають на наступні запуски.
+#
+# Запуск з кореня репозиторію:
+#   python benchmarks/bench_handlers.py --rows 10000 1000000 --save-baseline benchmarks/baseline.json
+#   python benchmarks/bench_handlers.py --rows 10000 --baseline benchmarks/baseline.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_ID = 1
+GENERATE_BATCH = 50000
+# Частка відхилених записів у згенерованій базі (решта - підтверджені)
+REJECTED_SHARE = 0.15
+# Допустиме погіршення p95 відносно базової лінії
+DEFAULT_TOLERANCE = 0.2
+
+
+# Підроблені об'єкти Pyrogram: лише ті атрибути, які читають обробники
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.username = f"user{user_id}"
+        self.first_name = self.username
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+        self.type = 'private'
+
+
+class FakeMessage:
+    _ids = iter(range(1, 1 << 62))
+
+    def __init__(self, user_id, text=''):
+        self.id = next(self._ids)
+        self.from_user = FakeUser(user_id)
+        self.chat = FakeChat(user_id)
+        self.text = text
+        self.video_note = None
+        self.command = text[1:].split() if text.startswith('/') else None
+
+    async def reply_text(self, text, **kwargs):
+        return FakeMessage(0, text)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        return self
+
+
+class FakeCallbackQuery:
+    def __init__(self, user_id, data, message=None):
+        self.id = '0'
+        self.from_user = FakeUser(user_id)
+        self.data = data
+        self.message = message or FakeMessage(user_id, 'callback')
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+
+# Клієнт без мережі: будь-який send_*/edit_* лише збільшує лічильник
+class FakeClient:
+    def __init__(self):
+        self.sent = {}
+
+    def __getattr__(self, name):
+        if not name.startswith(('send_', 'edit_')):
+            raise AttributeError(name)
+
+        async def method(**kwargs):
+            self.sent[name] = self.sent.get(name, 0) + 1
+            return FakeMessage(0)
+        return method
+
+
+def write_config(data_dir, db_path):
+    with open(os.path.join(ROOT, 'config.yml'), 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+    config['bot'].update(api_id=1, api_hash='bench', bot_token='0:bench', admin_ids=[ADMIN_ID])
+    config['database'] = {'path': db_path}
+    # Без обмеження швидкості: міряємо обробники, а не ліміти Telegram
+    config['outbound'] = {'global_rate': 1e9, 'chat_rate': 1e9, 'chat_burst': 1e9, 'workers': 4}
+    config['sessions'] = {'persist': False}
+    config['reload'] = {'watch_interval': 0}
+    path = os.path.join(data_dir, 'bench_config.yml')
+    with open(path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+    return path
+
+
+# Генеруємо записи drinks: рівномірно по користувачах, час зростає з id
+def generate(bot, rows, users, pending):
+    conn = bot.db.get_connection()
+    rnd = random.Random(rows)
+    types = bot.settings.catalogue.types
+    start = datetime.now() - timedelta(days=365)
+    step = timedelta(days=365) / max(rows + pending, 1)
+    started = time.perf_counter()
+
+    def row(i, status):
+        user_id = rnd.randint(ADMIN_ID + 1, users + ADMIN_ID)
+        alcohol_type = rnd.choice(types)
+        return (
+            user_id, f"user{user_id}", alcohol_type.key, rnd.choice(alcohol_type.subtypes),
+            alcohol_type.default_volume * rnd.choice((1, 2)), alcohol_type.strength, 'bench',
+            status, (start + step * i).isoformat(sep=' ', timespec='seconds')
+        )
+
+    for offset in range(0, rows, GENERATE_BATCH):
+        batch = [
+            row(i, 'rejected' if rnd.random() < REJECTED_SHARE else 'approved')
+            for i in range(offset, min(offset + GENERATE_BATCH, rows))
+        ]
+        with bot.db.transaction() as tx:
+            tx.executemany('''
+                INSERT INTO drinks (user_id, username, alcohol_type, subtype, volume, proof,
+                                    video_file_id, status, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+    # Невелика черга заявок для /requests
+    with bot.db.transaction() as tx:
+        tx.executemany('''
+            INSERT INTO drinks (user_id, username, alcohol_type, subtype, volume, proof,
+                                video_file_id, status, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row(rows + i, 'pending') for i in range(pending)])
+        bot.aggregates.rebuild(tx)
+        bot.aggregates.rebuild_rollups(tx)
+        bot.violations.rebuild(tx)
+    conn.execute('ANALYZE')
+    conn.commit()
+    print(f"Згенеровано {rows + pending} записів за {time.perf_counter() - started:.1f}с")
+
+
+def percentile(samples, fraction):
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+async def measure(name, scenario, iterations, warmup):
+    for i in range(warmup):
+        await scenario(i)
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        await scenario(warmup + i)
+        samples.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    result = {
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'ops_per_sec': round(iterations / elapsed, 1),
+    }
+    print(f"  {name:<28} p50 {result['p50_ms']:9.3f}мс  p95 {result['p95_ms']:9.3f}мс  "
+          f"p99 {result['p99_ms']:9.3f}мс  {result['ops_per_sec']:10.1f} оп/с")
+    return result
+
+
+async def run_scenarios(bot, users, iterations, warmup):
+    import callbacks
+    client = FakeClient()
+    rnd = random.Random(0)
+    heavy_user = ADMIN_ID + 1
+
+    def random_user():
+        return rnd.randint(ADMIN_ID + 1, users + ADMIN_ID)
+
+    async def stats(i):
+        await bot.stats_command(client, FakeMessage(random_user(), '/stats'))
+
+    async def stats_month(i):
+        await bot.stats_command(client, FakeMessage(random_user(), '/stats month'))
+
+    async def top(i):
+        await bot.top_command(client, FakeMessage(random_user(), '/top'))
+
+    async def top_week(i):
+        await bot.top_command(client, FakeMessage(random_user(), '/top week'))
+
+    async def history(i):
+        await bot.history_command(client, FakeMessage(random_user(), '/history'))
+
+    async def history_filtered(i):
+        await bot.history_command(client, FakeMessage(random_user(), '/history approved beer'))
+
+    async def requests(i):
+        await bot.requests_command(client, FakeMessage(ADMIN_ID, '/requests'))
+
+    history_data = callbacks.encode(callbacks.OP_HISTORY, 0, 1 << 40, 0, 0)
+
+    async def callback_history(i):
+        await bot.handle_callback(client, FakeCallbackQuery(heavy_user, history_data))
+
+    alcohol_data = callbacks.encode(callbacks.OP_ALCOHOL, 0)
+
+    async def callback_alcohol(i):
+        user_id = random_user()
+        session = bot.sessions.create(user_id, f"user{user_id}")
+        session.waiting_for_video = False
+        await bot.handle_callback(client, FakeCallbackQuery(user_id, alcohol_data))
+
+    first_type = bot.settings.catalogue.types[0]
+
+    async def text_volume(i):
+        user_id = random_user()
+        session = bot.sessions.create(user_id, f"user{user_id}")
+        session.waiting_for_video = False
+        session.file_id = 'bench'
+        session.alcohol_type = first_type.key
+        session.subtype = first_type.subtypes[0]
+        session.proof = first_type.strength
+        session.waiting_for_volume = True
+        await bot.handle_text(client, FakeMessage(user_id, '330'))
+
+    results = {}
+    for name, scenario, count in (
+        ('stats_command', stats, iterations),
+        ('stats_command[month]', stats_month, iterations),
+        ('top_command', top, iterations),
+        ('top_command[week]', top_week, iterations),
+        ('history_command', history, iterations),
+        ('history_command[filtered]', history_filtered, iterations),
+        ('requests_command', requests, max(1, iterations // 10)),
+        ('handle_callback[history]', callback_history, iterations),
+        ('handle_callback[alcohol]', callback_alcohol, iterations),
+        ('handle_text[volume]', text_volume, iterations),
+    ):
+        results[name] = await measure(name, scenario, count, warmup)
+
+    # Чекаємо фонові розсилки адмінам, щоб вони не заважали наступному запуску
+    if bot.background_tasks:
+        await asyncio.gather(*bot.background_tasks, return_exceptions=True)
+    await bot.outbox.stop()
+    return results
+
+
+# Один розмір бази в поточному процесі; результати пишемо у JSON-файл
+def run_child(rows, users, pending, iterations, warmup, data_dir, output):
+    template_path = os.path.join(data_dir, f"bench_{rows}_{users}_{pending}.db")
+    db_path = os.path.join(data_dir, f"bench_{rows}.run.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    template_exists = os.path.exists(template_path)
+    if template_exists:
+        print(f"Використовуємо згенеровану базу {template_path}")
+        shutil.copyfile(template_path, db_path)
+
+    os.environ['ALCOMETERBOT_CONFIG'] = write_config(data_dir, db_path)
+    sys.path.insert(0, ROOT)
+    import bot
+
+    bot.init_db()
+    if not template_exists:
+        generate(bot, rows, users, pending)
+        template = sqlite3.connect(template_path)
+        bot.db.get_connection().backup(template)
+        template.close()
+    bot.db.start()
+    bot.leaderboard.load(bot.db.fetchall(bot.LEADERBOARD_QUERY))
+    bot.bans.load(bot.db.fetchall(bot.ACTIVE_BANS_QUERY, (datetime.now().isoformat(sep=' '),)))
+
+    print(f"База {rows} записів, {users} користувачів:")
+    loop = asyncio.get_event_loop()
+    try:
+        results = loop.run_until_complete(run_scenarios(bot, users, iterations, warmup))
+    finally:
+        bot.db.shutdown()
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for rows, handlers in results.items():
+        for name, result in handlers.items():
+            base = baseline.get(rows, {}).get(name)
+            if base is None or not base['p95_ms']:
+                continue
+            ratio = result['p95_ms'] / base['p95_ms']
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{rows} записів, {name}: p95 {base['p95_ms']}мс -> {result['p95_ms']}мс (x{ratio:.2f})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк обробників AlcoMeterBot")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000, 10000000],
+                        help="розміри згенерованих баз (записів drinks)")
+    parser.add_argument('--users', type=int, default=None,
+                        help="кількість користувачів (за замовчуванням rows / 100, не менше 100)")
+    parser.add_argument('--pending', type=int, default=20, help="заявок у черзі для /requests")
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--data-dir', default=None,
+                        help="де зберігати згенеровані бази (повторно використовуються між запусками)")
+    parser.add_argument('--save-baseline', help="записати результати у JSON як базову лінію")
+    parser.add_argument('--baseline', help="порівняти з базовою лінією і завершитися з кодом 1 при регресії")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="допустиме погіршення p95 (0.2 = 20%%)")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='alcometerbot-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+
+    def users_for(rows):
+        return args.users or max(100, rows // 100)
+
+    if args.child is not None:
+        run_child(args.child, users_for(args.child), args.pending, args.iterations,
+                  args.warmup, data_dir, args.output)
+        return
+
+    results = {}
+    for rows in args.rows:
+        output = os.path.join(data_dir, f"results_{rows}.json")
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__),
+            '--child', str(rows), '--output', output, '--data-dir', data_dir,
+            '--pending', str(args.pending), '--iterations', str(args.iterations),
+            '--warmup', str(args.warmup), '--users', str(users_for(rows))
+        ], check=True)
+        with open(output, 'r', encoding='utf-8') as file:
+            results[str(rows)] = json.load(file)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+        print(f"Базову лінію записано в {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Регресії продуктивності:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Регресій відносно базової лінії немає")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import sys
+import time
+from bisect import bisect_left, insort
+
+# Мікробенчмарк рейтингу в пам'яті: зміна підсумків (як при затвердженні)
+# і /rank на N користувачах, SortedKeys проти одного відсортованого списку.
+# Запуск з кореня репозиторію: python benchmarks/bench_leaderboard.py [--users 10000 1000000]
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from leaderboard import SortedKeys
+
+OPERATIONS = 20000
+
+
+# Як було раніше: del + insort у суцільному списку зсувають O(n) елементів
+class FlatKeys:
+    def __init__(self, keys=()):
+        self._keys = sorted(keys)
+
+    def add(self, key):
+        insort(self._keys, key)
+
+    def remove(self, key):
+        del self._keys[bisect_left(self._keys, key)]
+
+    def index(self, key):
+        return bisect_left(self._keys, key)
+
+    def __getitem__(self, index):
+        return self._keys[index]
+
+
+def measure(name, keys_class, users, rng):
+    totals = {user_id: rng.uniform(0, 5000) for user_id in range(users)}
+    keys = keys_class((-pure, user_id) for user_id, pure in totals.items())
+    # Затвердження частіше в активних користувачів, тобто ближче до верху рейтингу
+    updated = [min(int(rng.expovariate(1 / (users / 20))), users - 1) for _ in range(OPERATIONS)]
+    ranked = [rng.randrange(users) for _ in range(OPERATIONS)]
+
+    start = time.perf_counter()
+    for user_id in updated:
+        pure = totals[user_id]
+        keys.remove((-pure, user_id))
+        pure += 20.0
+        totals[user_id] = pure
+        keys.add((-pure, user_id))
+    update_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user_id in ranked:
+        index = keys.index((-totals[user_id], user_id))
+        if index:
+            keys[index - 1]
+    rank_seconds = time.perf_counter() - start
+
+    print(f"{users:>9} {name:<11} {update_seconds / OPERATIONS * 1e6:8.2f} мкс/оновлення  "
+          f"{rank_seconds / OPERATIONS * 1e6:8.2f} мкс/rank")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк рейтингу в пам'яті")
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    for users in args.users:
+        for name, keys_class in (("flat list", FlatKeys), ("SortedKeys", SortedKeys)):
+            measure(name, keys_class, users, random.Random(users))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,35 @@
 import os
 import yaml
-import sqlite3
-from datetime import datetime
-from pyrogram import Client, filters
+import configuration
+import database as db
+import migrations
+import aggregates
+import chats
+import violations
+import callbacks
+import export
+import metrics
+from leaderboard import Leaderboard
+from outbound import Outbound, PRIORITY_USER, PRIORITY_ADMIN, PRIORITY_BACKLOG, PRIORITY_NAMES
+from sessions import SessionStore
+from bans import BanIndex
+from slowlog import SlowQueryLog
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import asyncio
+from pyrogram import Client, enums, filters, idle
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
-# Завантаження конфігурації
-with open('config.yml', 'r', encoding='utf-8') as file:
-    config = yaml.safe_load(file)
+# Завантаження конфігурації (шлях можна змінити змінною середовища ALCOMETERBOT_CONFIG)
+CONFIG_PATH = os.environ.get('ALCOMETERBOT_CONFIG', 'config.yml')
+
+# Поточний знімок конфігурації (каталог з готовими клавіатурами, адміністратори).
+# Підміняється цілком при /reload або зміні файлу; обробники читають settings
+# один раз, щоб не змішувати дані старого і нового знімка
+settings = configuration.load(CONFIG_PATH)
+
+# Параметри, які читаються лише при старті
+config = settings.config
 
 # Ініціалізація бота
 app = Client(
@@ -19,70 +41,92 @@ app = Client(
 
 # Створення папки для бази даних
 os.makedirs(os.path.dirname(config['database']['path']), exist_ok=True)
+db.configure(config['database']['path'])
+
+# Журнал повільних запитів з EXPLAIN QUERY PLAN (вмикається в config.yml)
+slow_queries_config = config['database'].get('slow_queries', {})
+slow_log = None
+if slow_queries_config.get('enabled', False):
+    slow_log = SlowQueryLog(
+        threshold_ms=slow_queries_config.get('threshold_ms', 50),
+        top=slow_queries_config.get('top', 10),
+        window=slow_queries_config.get('window', 86400)
+    )
+    db.enable_slow_log(slow_log)
+
+# Черга вихідних повідомлень з обмеженням швидкості (всі client.send_* йдуть через неї)
+outbox = Outbound(**config.get('outbound', {}))
+
+# Сесії додавання запису (/add) з автоматичним скиданням
+sessions = SessionStore(
+    ttl=config.get('sessions', {}).get('ttl', 300),
+    max_sessions=config.get('sessions', {}).get('max_sessions', 10000),
+    persist=config.get('sessions', {}).get('persist', True),
+    flush_interval=config.get('sessions', {}).get('flush_interval', 1.0)
+)
+
+# Активні бани в пам'яті (завантажуються при старті з violations)
+bans = BanIndex()
+
+ACTIVE_BANS_QUERY = '''
+    SELECT user_id, MAX(ban_until)
+    FROM violations
+    GROUP BY user_id
+    HAVING MAX(ban_until) > ?
+'''
+
+# Рейтинг у пам'яті (завантажується при старті з user_totals)
+leaderboard = Leaderboard()
+
+# Як часто звіряти рейтинг з базою (секунди)
+LEADERBOARD_CHECK_INTERVAL = config.get('leaderboard', {}).get('check_interval', 600)
+
+LEADERBOARD_QUERY = '''
+    SELECT user_id, username, approved, volume, pure_alcohol
+    FROM user_totals
+'''
 
-# Ініціалізація бази даних
+# Ініціалізація бази даних: застосовуємо всі нові міграції схеми
 def init_db():
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS drinks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            username TEXT,
-            alcohol_type TEXT,
-            subtype TEXT,
-            volume INTEGER,
-            proof REAL,
-            video_file_id TEXT,
-            status TEXT DEFAULT 'pending',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Додаємо таблицю для порушень
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS violations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            username TEXT,
-            violation_type TEXT,
-            ban_duration INTEGER,  -- тривалість бану в годинах
-            ban_until DATETIME,    -- час до якого діє бан
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    migrations.migrate(db.get_connection())
 
 # Функція для отримання загального об'єму випитого
-def get_total_volume(user_id):
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    c.execute('''
-        SELECT 
-            SUM(volume) as total_volume,
-            SUM(volume * proof / 100) as total_pure_alcohol
-        FROM drinks 
-        WHERE user_id = ? AND status = 'approved'
+async def get_total_volume(user_id):
+    result = await db.query_one('''
+        SELECT volume, pure_alcohol
+        FROM user_totals
+        WHERE user_id = ?
     ''', (user_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] or 0, result[1] or 0
+    if not result:
+        return 0, 0
+    return result[0], result[1]
 
 # Функція для збереження запису про випите
-def save_drink(user_id, username, alcohol_type, subtype, volume, proof, video_file_id):
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    c.execute('''
+async def save_drink(user_id, username, alcohol_type, subtype, volume, proof, video_file_id):
+    return await db.run_write(
+        _insert_drink, user_id, username, alcohol_type, subtype, volume, proof, video_file_id
+    )
+
+def _insert_drink(conn, user_id, username, alcohol_type, subtype, volume, proof, video_file_id):
+    record_id = conn.execute('''
         INSERT INTO drinks (user_id, username, alcohol_type, subtype, volume, proof, video_file_id)
         VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, username, alcohol_type, subtype, volume, proof, video_file_id))
-    conn.commit()
-    conn.close()
+    ''', (user_id, username, alcohol_type, subtype, volume, proof, video_file_id)).lastrowid
+    aggregates.record_added(conn, user_id, username, alcohol_type)
+    return record_id
+
+# Пошук запису для старих кнопок формату approve_{user_id}_{volume}
+def _find_legacy_pending_record(conn, user_id, volume):
+    result = conn.execute('''
+        SELECT id FROM drinks 
+        WHERE user_id = ? AND volume = ? AND status = 'pending'
+        ORDER BY id DESC LIMIT 1
+    ''', (user_id, volume)).fetchone()
+    return result[0] if result else None
 
 # Перевірка на адміністратора
 def is_admin(user_id):
-    return user_id in config['bot']['admin_ids']
+    return user_id in settings.admin_ids
 
 # Оновлюємо текст команди /help
 HELP_TEXT = """
@@ -92,10 +136,15 @@ HELP_TEXT = """
 /start - Почати роботу з ботом
 /help - Показати цю довідку
 /types - Показати доступні типи алкоголю
-/top - Показати топ користувачів
+/top - Показати топ користувачів (/top week, /top month)
+  (у групі - рейтинг учасників цього чату)
+/rank - Показати ваше місце в рейтингу 🏅
 /add - Додати новий запис 👈 
 /stats - Показати вашу статистику 📊
+  (за період: /stats today, week, month або /stats 2024-05-01 2024-05-31)
 /history - Показати історію ваших записів 📜
+  (фільтри: /history approved beer)
+/export - Вивантажити ваші записи у файл (/export json)
 /tos - Показати умови використання
 
 📝 Як додати запис:
@@ -147,16 +196,19 @@ TOS_TEXT = """
 
 # Команда /help
 @app.on_message(filters.command("help"))
+@metrics.timed('help_command')
 async def help_command(client, message: Message):
     await message.reply_text(HELP_TEXT)
 
 # Команда /tos
 @app.on_message(filters.command("tos"))
+@metrics.timed('tos_command')
 async def tos_command(client, message: Message):
     await message.reply_text(TOS_TEXT)
 
 # Оновлюємо текст команди /start
 @app.on_message(filters.command("start"))
+@metrics.timed('start_command')
 async def start_command(client, message: Message):
     await message.reply_text(
         "🍺 AlcoMeterBot - ваш персональний трекер випитого алкоголю!\n\n"
@@ -170,51 +222,63 @@ async def start_command(client, message: Message):
     )
 # Додаємо команду для перегляду статистики користувача
 @app.on_message(filters.command("stats"))
+@metrics.timed('stats_command')
 async def stats_command(client, message):
-    await message.reply_text("⚙️ Ця команда знаходиться в розробці. Слідкуйте за оновленнями!")
     user_id = message.from_user.id
+    try:
+        window = _parse_stats_window(message.command[1:])
+    except ValueError as e:
+        await message.reply_text(f"❌ {e}")
+        return
+
+    if window is None:
+        # Персональна статистика за весь час (готові підсумки з user_totals)
+        stats = await db.query_one('''
+            SELECT records, volume, pure_alcohol
+            FROM user_totals
+            WHERE user_id = ?
+        ''', (user_id,)) or (0, 0, 0)
+
+        types_stats = await db.query_all('''
+            SELECT alcohol_type, records, volume
+            FROM user_type_totals
+            WHERE user_id = ?
+            ORDER BY volume DESC
+        ''', (user_id,))
+
+        text = "📊 Ваша персональна статистика:\n\n"
+        text += f"📝 Всього записів: {stats[0]}\n"
+    else:
+        # Статистика за період з user_daily_totals: не більше рядків,
+        # ніж днів у вікні на кількість типів алкоголю
+        title, first_day, last_day = window
+        types_stats = await db.query_all('''
+            SELECT alcohol_type, SUM(approved), SUM(volume), SUM(pure_alcohol)
+            FROM user_daily_totals
+            WHERE user_id = ? AND day BETWEEN ? AND ?
+            GROUP BY alcohol_type
+            ORDER BY SUM(volume) DESC
+        ''', (user_id, first_day.isoformat(), last_day.isoformat()))
+        stats = (
+            sum(row[1] for row in types_stats),
+            sum(row[2] for row in types_stats),
+            sum(row[3] for row in types_stats),
+        )
+        types_stats = [row[:3] for row in types_stats]
+
+        text = f"📊 Ваша статистика {title}:\n\n"
+        text += f"📝 Затверджених записів: {stats[0]}\n"
 
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    
-    # Персональна статистика для користувача
-    c.execute('''
-        SELECT 
-            COUNT(*) as total_records,
-            COALESCE(SUM(CASE WHEN status = 'approved' THEN volume ELSE 0 END), 0) as total_volume,
-            COALESCE(SUM(CASE WHEN status = 'approved' THEN volume * proof / 100 ELSE 0 END), 0) as total_pure_alcohol
-        FROM drinks
-        WHERE user_id = ?
-    ''', (user_id,))
-    stats = c.fetchone() or (0, 0, 0)
-    
-    c.execute('''
-        SELECT 
-            alcohol_type,
-            COUNT(*) as count,
-            COALESCE(SUM(CASE WHEN status = 'approved' THEN volume ELSE 0 END), 0) as volume
-        FROM drinks
-        WHERE user_id = ?
-        GROUP BY alcohol_type
-        ORDER BY volume DESC
-    ''', (user_id,))
-    types_stats = c.fetchall()
-    
-    conn.close()
-    
-    text = "📊 Ваша персональна статистика:\n\n"
-    text += f"📝 Всього записів: {stats[0]}\n"
-    
     total_volume = stats[1]
     total_pure = stats[2]
-    
+
     liters = total_volume // 1000
     ml = total_volume % 1000
     volume_text = f"{liters}л {ml}мл" if liters > 0 else f"{ml}мл"
-    
+
     text += f"🥃 Загальний об'єм: {volume_text}\n"
     text += f"💪 Чистого спирту: {total_pure:.1f}мл\n\n"
-    
+
     if types_stats:
         text += "🍷 По типам напоїв:\n"
         for type_name, count, volume in types_stats:
@@ -222,91 +286,336 @@ async def stats_command(client, message):
                 liters = volume // 1000
                 ml = volume % 1000
                 volume_text = f"{liters}л {ml}мл" if liters > 0 else f"{ml}мл"
-                text += f"- {config['alcohol_types'].get(type_name, {}).get('name', type_name)}: {volume_text} ({count} записів)\n"
-    else:
+                text += f"- {settings.catalogue.name(type_name)}: {volume_text} ({count} записів)\n"
+    elif window is None:
         text += "🔹 У вас ще немає затверджених записів. Додайте свій перший запис!"
-    
+    else:
+        text += "🔹 За цей період затверджених записів немає."
+
     await message.reply_text(text)
 
+# Періоди для /stats і /top (англійською або українською)
+STATS_WINDOWS = {
+    'today': 'today', 'сьогодні': 'today',
+    'week': 'week', 'тиждень': 'week',
+    'month': 'month', 'місяць': 'month',
+    'all': None, 'все': None,
+}
+STATS_MAX_RANGE_DAYS = 366
+STATS_DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+
+# Дати в підсумках - це дати UTC (як CURRENT_TIMESTAMP у SQLite)
+def _today():
+    return datetime.now(timezone.utc).date()
+
+def _parse_date(value):
+    for date_format in STATS_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+# Розбираємо аргументи /stats: None для всього часу або
+# (заголовок, перший день, останній день); ValueError з поясненням для користувача
+def _parse_stats_window(args):
+    if not args:
+        return None
+    today = _today()
+    value = args[0].lower()
+    if value in STATS_WINDOWS:
+        window = STATS_WINDOWS[value]
+        if window == 'today':
+            return "за сьогодні", today, today
+        if window == 'week':
+            return "за цей тиждень", today - timedelta(days=today.weekday()), today
+        if window == 'month':
+            return "за цей місяць", today.replace(day=1), today
+        return None
+
+    first_day = _parse_date(args[0])
+    last_day = _parse_date(args[1]) if len(args) > 1 else first_day
+    if first_day is None or last_day is None:
+        raise ValueError(
+            "Використання: /stats [today|week|month|all] або /stats 2024-05-01 [2024-05-31]"
+        )
+    if last_day < first_day:
+        first_day, last_day = last_day, first_day
+    if (last_day - first_day).days >= STATS_MAX_RANGE_DAYS:
+        raise ValueError(f"Період не може бути довшим за {STATS_MAX_RANGE_DAYS} днів")
+    if first_day == last_day:
+        return f"за {first_day.strftime('%d.%m.%Y')}", first_day, last_day
+    return (
+        f"з {first_day.strftime('%d.%m.%Y')} по {last_day.strftime('%d.%m.%Y')}",
+        first_day, last_day
+    )
+
 # Додаємо команду для перегляду історії записів
-@app.on_message(filters.command("history"))
-async def history_command(client, message: Message):
-    user_id = message.from_user.id
-    
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    
-    # Отримуємо останні 10 записів
-    c.execute('''
-        SELECT 
-            alcohol_type,
-            subtype,
-            volume,
-            proof,
-            status,
-            timestamp
+HISTORY_PAGE_SIZE = 10
+
+HISTORY_STATUS_EMOJI = {
+    'pending': '⏳',
+    'approved': '✅',
+    'rejected': '❌'
+}
+
+# Коди фільтрів і напрямку в кнопках історії (індекс у кортежі)
+HISTORY_DIRECTIONS = ('older', 'newer')
+HISTORY_STATUSES = (None, 'pending', 'approved', 'rejected')
+
+# Розбираємо фільтри /history: статус (approved/pending/rejected) і тип алкоголю
+def _parse_history_filters(args):
+    status, alcohol_type = None, None
+    for arg in args:
+        value = arg.lower()
+        if value in HISTORY_STATUS_EMOJI:
+            status = value
+            continue
+        found = settings.catalogue.find(value)
+        if found is not None:
+            alcohol_type = found.key
+    return status, alcohol_type
+
+# Одна сторінка історії за курсором (keyset-пагінація по id).
+# Кожна сторінка - це один пошук в індексі незалежно від глибини.
+def _fetch_history_page(conn, user_id, status, alcohol_type, cursor, direction):
+    query = '''
+        SELECT id, alcohol_type, subtype, volume, proof, status, timestamp
         FROM drinks
         WHERE user_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 10
-    ''', (user_id,))
-    history = c.fetchall()
-    conn.close()
+    '''
+    params = [user_id]
+    if status:
+        query += " AND status = ?"
+        params.append(status)
+    if alcohol_type:
+        query += " AND alcohol_type = ?"
+        params.append(alcohol_type)
     
-    if not history:
-        await message.reply_text("📭 У вас поки що немає записів.")
-        return
+    if direction == 'newer':
+        query += " AND id > ? ORDER BY id ASC LIMIT ?"
+        params += [cursor, HISTORY_PAGE_SIZE + 1]
+    else:
+        if cursor:
+            query += " AND id < ?"
+            params.append(cursor)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(HISTORY_PAGE_SIZE + 1)
+    
+    rows = conn.execute(query, params).fetchall()
+    has_more = len(rows) > HISTORY_PAGE_SIZE
+    rows = rows[:HISTORY_PAGE_SIZE]
+    if direction == 'newer':
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = bool(cursor), has_more
+    return rows, has_newer, has_older
+
+# callback_data кнопки навігації: тип передається як ID з каталогу + 1 (0 - без фільтра)
+def _history_callback(direction, cursor, status, alcohol_type):
+    found = settings.catalogue.get(alcohol_type) if alcohol_type else None
+    return callbacks.encode(
+        callbacks.OP_HISTORY,
+        HISTORY_DIRECTIONS.index(direction),
+        cursor,
+        HISTORY_STATUSES.index(status),
+        found.id + 1 if found is not None else 0
+    )
+
+# Формуємо текст і кнопки навігації для сторінки історії
+async def _render_history_page(user_id, status=None, alcohol_type=None, cursor=0, direction='older'):
+    rows, has_newer, has_older = await db.run_read(
+        _fetch_history_page, user_id, status, alcohol_type, cursor, direction
+    )
+    if not rows:
+        return None, None
     
-    text = "📜 Останні 10 записів:\n\n"
-    for alcohol_type, subtype, volume, proof, status, timestamp in history:
+    text = "📜 Ваші записи:\n\n"
+    for _, row_type, subtype, volume, proof, row_status, timestamp in rows:
         dt = datetime.fromisoformat(timestamp)
         formatted_date = dt.strftime("%d.%m.%Y %H:%M")
-        
-        status_emoji = {
-            'pending': '⏳',
-            'approved': '✅',
-            'rejected': '❌'
-        }.get(status, '❓')
+        status_emoji = HISTORY_STATUS_EMOJI.get(row_status, '❓')
+        type_name = settings.catalogue.name(row_type)
         
         text += f"{formatted_date}\n"
-        text += f"{status_emoji} {config['alcohol_types'][alcohol_type]['name']} ({subtype})\n"
+        text += f"{status_emoji} {type_name} ({subtype})\n"
         text += f"└ {volume}мл, {proof}%\n\n"
     
-    await message.reply_text(text)
+    # Фільтри передаються в кнопках, щоб навігація їх зберігала
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton("⬅️ Новіші",
+            callback_data=_history_callback('newer', rows[0][0], status, alcohol_type)))
+    if has_older:
+        buttons.append(InlineKeyboardButton("Старіші ➡️",
+            callback_data=_history_callback('older', rows[-1][0], status, alcohol_type)))
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    return text, reply_markup
+
+@app.on_message(filters.command("history"))
+@metrics.timed('history_command')
+async def history_command(client, message: Message):
+    user_id = message.from_user.id
+    status, alcohol_type = _parse_history_filters(message.command[1:])
+    
+    text, reply_markup = await _render_history_page(user_id, status, alcohol_type)
+    if text is None:
+        await message.reply_text("📭 У вас поки що немає записів.")
+        return
+    
+    await message.reply_text(text, reply_markup=reply_markup)
+
+# Навігація по історії: редагуємо те саме повідомлення
+async def handle_history_callback(client, callback_query: CallbackQuery, direction, cursor, status, type_code):
+    if direction >= len(HISTORY_DIRECTIONS) or status >= len(HISTORY_STATUSES):
+        await callback_query.answer("❌ Непідтримувана кнопка.", show_alert=True)
+        return
+    alcohol_type = settings.catalogue.by_id(type_code - 1) if type_code else None
+    text, reply_markup = await _render_history_page(
+        callback_query.from_user.id,
+        HISTORY_STATUSES[status],
+        alcohol_type.key if alcohol_type is not None else None,
+        cursor,
+        HISTORY_DIRECTIONS[direction]
+    )
+    if text is None:
+        await callback_query.answer("📭 Більше записів немає.")
+        return
+    
+    await callback_query.message.edit_text(text, reply_markup=reply_markup)
+    await callback_query.answer()
+
+# Вивантаження записів у файл: /export для користувача, /export_all для адміністраторів.
+# Файл готується в окремому потоці; одночасно - не більше EXPORT_CONCURRENCY
+# вивантажень, і не більше одного від кожного користувача
+EXPORT_CONCURRENCY = 2
+export_semaphore = asyncio.Semaphore(EXPORT_CONCURRENCY)
+exports_in_progress = set()
+
+# Файли з чужими записами не надсилаємо в групи
+PRIVATE_ONLY_TEXT = "❌ Використовуйте цю команду в особистому чаті з ботом."
+
+# Формат з аргументу команди (csv за замовчуванням) або None, якщо невідомий
+def _parse_export_format(message):
+    if len(message.command) < 2:
+        return 'csv'
+    fmt = message.command[1].lower()
+    return fmt if fmt in export.FORMATS else None
+
+async def send_export(message, query, params, columns, fmt, file_name, caption):
+    user_id = message.from_user.id
+    if user_id in exports_in_progress:
+        await message.reply_text("⏳ Попереднє вивантаження ще готується.")
+        return
+    exports_in_progress.add(user_id)
+    try:
+        progress = await message.reply_text("⏳ Готуємо файл...")
+        try:
+            async with export_semaphore:
+                loop = asyncio.get_running_loop()
+                path, count = await loop.run_in_executor(
+                    None, export.export_to_file, query, params, columns, fmt
+                )
+        except Exception as e:
+            print(f"Помилка при вивантаженні {file_name}: {e}")
+            await progress.edit_text("❌ Не вдалося підготувати файл. Спробуйте пізніше.")
+            return
+        try:
+            if count == 0:
+                await progress.edit_text("📊 Немає записів для вивантаження.")
+                return
+            if os.path.getsize(path) > export.MAX_DOCUMENT_BYTES:
+                await progress.edit_text("❌ Файл завеликий для надсилання через Telegram.")
+                return
+            await outbox.send(
+                app.send_document,
+                priority=PRIORITY_USER,
+                chat_id=message.chat.id,
+                document=path,
+                file_name=f"{file_name}.{fmt}.gz",
+                caption=f"{caption} ({count} записів)",
+                reply_to_message_id=message.id
+            )
+            await progress.edit_text("✅ Файл готовий.")
+        finally:
+            os.remove(path)
+    finally:
+        exports_in_progress.discard(user_id)
+
+# Команда /export [csv|json] - власні записи користувача
+@app.on_message(filters.command("export"))
+@metrics.timed('export_command')
+async def export_command(client, message: Message):
+    if _group_chat_id(message) is not None:
+        await message.reply_text(PRIVATE_ONLY_TEXT)
+        return
+    fmt = _parse_export_format(message)
+    if fmt is None:
+        await message.reply_text("❌ Використання: /export [csv|json]")
+        return
+    user_id = message.from_user.id
+    await send_export(
+        message, export.USER_QUERY, (user_id,), export.USER_COLUMNS, fmt,
+        f"alcometer_{user_id}", "📜 Ваші записи"
+    )
+
+# Команда /export_all [csv|json] для адміністраторів - всі записи drinks
+@app.on_message(filters.command("export_all"))
+@metrics.timed('export_all_command')
+async def export_all_command(client, message: Message):
+    if _group_chat_id(message) is not None:
+        await message.reply_text(PRIVATE_ONLY_TEXT)
+        return
+    if not is_admin(message.from_user.id):
+        await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
+        return
+    fmt = _parse_export_format(message)
+    if fmt is None:
+        await message.reply_text("❌ Використання: /export_all [csv|json]")
+        return
+    await send_export(
+        message, export.ALL_QUERY, (), export.ALL_COLUMNS, fmt,
+        f"alcometer_{datetime.now().strftime('%Y%m%d_%H%M')}", "🗄 Всі записи"
+    )
+
 # Команда /types
 @app.on_message(filters.command("types"))
+@metrics.timed('types_command')
 async def types_command(client, message: Message):
-    text = "📋 Доступні типи алкоголю:\n\n"
-    for alcohol_id, details in config['alcohol_types'].items():
-        text += f"🍷 {details['name']} ({details['strength']}%)\n"
-        text += f"└ Підтипи: {', '.join(details['subtypes'])}\n"
-    await message.reply_text(text)
+    await message.reply_text(settings.catalogue.types_text)
 
 # Команда /top
 @app.on_message(filters.command("top"))
+@metrics.timed('top_command')
 async def top_command(client, message: Message):
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    c.execute('''
-        SELECT 
-            user_id,
-            username,
-            SUM(volume) as total_volume,
-            SUM(volume * proof / 100) as total_pure_alcohol
-        FROM drinks 
-        WHERE status = 'approved'
-        GROUP BY user_id
-        ORDER BY total_pure_alcohol DESC
-        LIMIT 10
-    ''')
-    results = c.fetchall()
-    conn.close()
+    period = STATS_WINDOWS.get(message.command[1].lower(), 'unknown') if len(message.command) > 1 else None
+    # У групі рейтинг лише серед учасників цього чату
+    chat_id = _group_chat_id(message)
+    if period in ('week', 'month'):
+        period_key = aggregates.week_key(_today()) if period == 'week' else aggregates.month_key(_today())
+        if chat_id is None:
+            results = await db.query_all(TOP_PERIOD_QUERY, (period_key,))
+        else:
+            results = await db.run_read(chats.top_period, chat_id, period_key, 10)
+        title = "🏆 Топ-10 за цей тиждень:" if period == 'week' else "🏆 Топ-10 за цей місяць:"
+    elif period is None:
+        if chat_id is None:
+            results = leaderboard.top(10)
+        else:
+            results = await db.run_read(chats.top, chat_id, 10)
+        title = "🏆 Топ-10 по випитому:"
+    else:
+        await message.reply_text("❌ Використання: /top [week|month]")
+        return
+    if chat_id is not None:
+        title = title[:-1] + " у цьому чаті:"
 
     if not results:
         await message.reply_text("📊 Поки що немає даних для відображення.")
         return
 
-    text = "🏆 Топ-10 по випитому:\n\n"
+    text = f"{title}\n\n"
     for i, (user_id, username, volume, pure_alcohol) in enumerate(results, 1):
         liters = volume // 1000
         ml = volume % 1000
@@ -315,8 +624,90 @@ async def top_command(client, message: Message):
 
     await message.reply_text(text)
 
+# Топ за тиждень чи місяць: перші рядки індексу (period, pure_alcohol)
+TOP_PERIOD_QUERY = '''
+    SELECT period_totals.user_id, user_totals.username, period_totals.volume, period_totals.pure_alcohol
+    FROM period_totals
+    JOIN user_totals ON user_totals.user_id = period_totals.user_id
+    WHERE period_totals.period = ?
+    ORDER BY period_totals.pure_alcohol DESC
+    LIMIT 10
+'''
+
+# Учасники групових чатів для рейтингів chat_totals.
+# Учасником вважається кожен, хто писав у чат або був доданий до нього.
+# Пари (chat_id, user_id), які вже є в базі, кешуються, тому звичайне
+# повідомлення в групі не звертається до бази.
+CHAT_MEMBERS_CACHE_LIMIT = 50000
+known_chat_members = OrderedDict()
+
+# ID групового чату або None для особистих повідомлень
+def _group_chat_id(message):
+    if message.chat is not None and message.chat.type in (enums.ChatType.GROUP, enums.ChatType.SUPERGROUP):
+        return message.chat.id
+    return None
+
+async def remember_chat_member(chat_id, user_id):
+    key = (chat_id, user_id)
+    if key in known_chat_members:
+        known_chat_members.move_to_end(key)
+        return
+    await db.run_write(chats.join, chat_id, user_id)
+    known_chat_members[key] = True
+    if len(known_chat_members) > CHAT_MEMBERS_CACHE_LIMIT:
+        known_chat_members.popitem(last=False)
+
+async def forget_chat_member(chat_id, user_id):
+    known_chat_members.pop((chat_id, user_id), None)
+    await db.run_write(chats.leave, chat_id, user_id)
+
+async def forget_chat(chat_id):
+    for key in [key for key in known_chat_members if key[0] == chat_id]:
+        del known_chat_members[key]
+    await db.run_write(chats.forget, chat_id)
+
+# Окрема група обробників (-1): виконується перед командами і не заважає їм
+@app.on_message(filters.group, group=-1)
+@metrics.timed('track_chat_member')
+async def track_chat_member(client, message: Message):
+    chat_id = message.chat.id
+    if message.left_chat_member is not None:
+        if message.left_chat_member.is_self:
+            await forget_chat(chat_id)
+        else:
+            await forget_chat_member(chat_id, message.left_chat_member.id)
+        return
+    for member in message.new_chat_members or ():
+        if not member.is_bot:
+            await remember_chat_member(chat_id, member.id)
+    if message.from_user is not None and not message.from_user.is_bot:
+        await remember_chat_member(chat_id, message.from_user.id)
+
+# Команда /rank - місце користувача в рейтингу
+@app.on_message(filters.command("rank"))
+@metrics.timed('rank_command')
+async def rank_command(client, message: Message):
+    chat_id = _group_chat_id(message)
+    if chat_id is None:
+        rank = leaderboard.rank(message.from_user.id)
+    else:
+        rank = await db.run_read(chats.rank, chat_id, message.from_user.id)
+    if rank is None:
+        await message.reply_text("📊 Ви ще не в рейтингу. Додайте свій перший запис через /add!")
+        return
+    
+    position, pure_alcohol, gap, ahead_username, total = rank
+    text = f"🏅 Ваше місце: {position} з {total}\n"
+    text += f"💪 Чистого спирту: {pure_alcohol:.1f}мл\n"
+    if ahead_username is not None:
+        text += f"⬆️ До {position - 1} місця ({ahead_username}) не вистачає {gap:.1f}мл"
+    else:
+        text += "👑 Ви на першому місці!"
+    await message.reply_text(text)
+
 # Команда /add для додавання нового запису
 @app.on_message(filters.command("add"))
+@metrics.timed('add_command')
 async def add_command(client, message: Message):
     user_id = message.from_user.id
     
@@ -330,22 +721,15 @@ async def add_command(client, message: Message):
         return
     
     # Перевіряємо чи користувач вже не додає запис
-    if hasattr(app, 'temp_data') and user_id in app.temp_data:
+    if await sessions.load(user_id) is not None:
         await message.reply_text(
             "❌ У вас вже є активна сесія додавання запису.\n"
-            "Будь ласка, завершіть її або почекайте 5 хвилин для автоматичного скидання."
+            f"Будь ласка, завершіть її або почекайте {sessions.ttl // 60} хвилин для автоматичного скидання."
         )
         return
     
-    # Ініціалізуємо тимчасові дані
-    if not hasattr(app, 'temp_data'):
-        app.temp_data = {}
-    
-    app.temp_data[user_id] = {
-        'waiting_for_video': True,
-        'user_id': user_id,
-        'username': message.from_user.username or message.from_user.first_name
-    }
+    # Створюємо сесію додавання запису
+    sessions.create(user_id, message.from_user.username or message.from_user.first_name)
     
     await message.reply_text(
         "🎥 Будь ласка, надішліть відео-кружечок з доказом випитого алкоголю.\n"
@@ -357,18 +741,21 @@ async def add_command(client, message: Message):
 if not hasattr(app, 'admin_paused'):
     app.admin_paused = set()
 
+# Дані пропозицій нових типів алкоголю
+if not hasattr(app, 'suggest_data'):
+    app.suggest_data = {}
+
 # Команда /requests для адміністраторів
 @app.on_message(filters.command("requests"))
+@metrics.timed('requests_command')
 async def requests_command(client, message: Message):
     if not is_admin(message.from_user.id):
         await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
         return
+    catalogue = settings.catalogue
         
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    
     # Отримуємо всі pending заявки
-    c.execute('''
+    pending_requests = await db.query_all('''
         SELECT 
             id,
             user_id,
@@ -381,15 +768,13 @@ async def requests_command(client, message: Message):
             timestamp
         FROM drinks
         WHERE status = 'pending'
-        ORDER BY timestamp DESC
+        ORDER BY id DESC
     ''')
-    pending_requests = c.fetchall()
-    conn.close()
     
     if not pending_requests:
         pause_button = InlineKeyboardButton(
             "⏸️ Призупинити сповіщення" if message.from_user.id not in app.admin_paused else "▶️ Відновити сповіщення",
-            callback_data="toggle_pause"
+            callback_data=callbacks.encode(callbacks.OP_TOGGLE_PAUSE)
         )
         await message.reply_text(
             "📭 Немає активних заявок на розгляд.",
@@ -407,27 +792,31 @@ async def requests_command(client, message: Message):
         
         try:
             # Спочатку надсилаємо відео-кружечок
-            await client.send_video_note(
+            await outbox.send(
+                client.send_video_note,
+                priority=PRIORITY_BACKLOG,
                 chat_id=message.chat.id,
                 video_note=video_id
             )
             
             # Потім надсилаємо інформацію окремим повідомленням
-            await client.send_message(
+            await outbox.send(
+                client.send_message,
+                priority=PRIORITY_BACKLOG,
                 chat_id=message.chat.id,
                 text=(
                     f"📝 Заявка #{req_id}\n"
                     f"📅 Дата: {formatted_date}\n"
                     f"👤 Користувач: {username}\n"
-                    f"🍷 Тип: {config['alcohol_types'][alcohol_type]['name']}\n"
+                    f"🍷 Тип: {catalogue.name(alcohol_type)}\n"
                     f"📝 Підтип: {subtype}\n"
                     f"🔢 Об'єм: {volume}мл\n"
                     f"💪 Міцність: {proof}%"
                 ),
                 reply_markup=InlineKeyboardMarkup([
                     [
-                        InlineKeyboardButton("✅ Підтвердити", callback_data=f"approve_{user_id}_{volume}"),
-                        InlineKeyboardButton("❌ Відхилити", callback_data=f"reject_{user_id}_{volume}")
+                        InlineKeyboardButton("✅ Підтвердити", callback_data=callbacks.encode(callbacks.OP_APPROVE, req_id)),
+                        InlineKeyboardButton("❌ Відхилити", callback_data=callbacks.encode(callbacks.OP_REJECT, req_id))
                     ]
                 ])
             )
@@ -438,281 +827,547 @@ async def requests_command(client, message: Message):
     # Додаємо кнопку паузи/відновлення в окремому повідомленні
     pause_button = InlineKeyboardButton(
         "⏸️ Призупинити сповіщення" if message.from_user.id not in app.admin_paused else "▶️ Відновити сповіщення",
-        callback_data="toggle_pause"
+        callback_data=callbacks.encode(callbacks.OP_TOGGLE_PAUSE)
     )
     await message.reply_text(
         f"📋 Всього активних заявок: {len(pending_requests)}",
         reply_markup=InlineKeyboardMarkup([[pause_button]])
     )
 
-# Оновлюємо обробку callback-кнопок
-@app.on_callback_query()
-async def handle_callback(client: Client, callback_query: CallbackQuery):
-    user_id = callback_query.from_user.id
-    data = callback_query.data
-    
-    # Обробка паузи/відновлення сповіщень
-    if data == "toggle_pause" and is_admin(user_id):
-        if user_id in app.admin_paused:
-            app.admin_paused.remove(user_id)
-            await callback_query.message.edit_text(
-                callback_query.message.text + "\n\n▶️ Сповіщення відновлено!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("⏸️ Призупинити сповіщення", callback_data="toggle_pause")
-                ]])
-            )
-        else:
-            app.admin_paused.add(user_id)
-            await callback_query.message.edit_text(
-                callback_query.message.text + "\n\n⏸️ Сповіщення призупинено!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("▶️ Відновити сповіщення", callback_data="toggle_pause")
-                ]])
+# Команда /rebuild_totals для адміністраторів: перерахунок підсумків з таблиці drinks
+@app.on_message(filters.command("rebuild_totals"))
+@metrics.timed('rebuild_totals_command')
+async def rebuild_totals_command(client, message: Message):
+    if not is_admin(message.from_user.id):
+        await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
+        return
+    
+    users_count = await db.run_write(aggregates.rebuild)
+    await db.run_write(aggregates.rebuild_rollups)
+    await db.run_write(chats.rebuild)
+    await db.run_write(violations.rebuild)
+    leaderboard.load(await db.query_all(LEADERBOARD_QUERY))
+    await message.reply_text(f"🔄 Підсумки перераховано для {users_count} користувачів.")
+
+# Перезавантаження конфігурації: новий знімок будується й перевіряється
+# в окремому потоці, а потім підміняється одним присвоєнням.
+# Конфігурація, яка змінює ID типів чи підтипів у кнопках, відхиляється (ValueError).
+# Повертає список параметрів, зміна яких потребує перезапуску
+settings_reload_lock = asyncio.Lock()
+
+async def reload_settings():
+    global settings
+    async with settings_reload_lock:
+        loop = asyncio.get_running_loop()
+        new_settings = await loop.run_in_executor(None, configuration.load, CONFIG_PATH)
+        id_changes = configuration.catalogue_id_changes(settings.config, new_settings.config)
+        if id_changes:
+            raise ValueError(
+                "Зміни каталогу потребують перезапуску бота:\n" + "\n".join(id_changes)
             )
+        restart_keys = configuration.restart_required(settings.config, new_settings.config)
+        settings = new_settings
+    return restart_keys
+
+# Команда /reload для адміністраторів: перечитати config.yml без перезапуску
+@app.on_message(filters.command("reload"))
+@metrics.timed('reload_command')
+async def reload_command(client, message: Message):
+    if not is_admin(message.from_user.id):
+        await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
         return
     
-    # Обробка підтвердження/відхилення адміністратором
-    if data.startswith(('approve_', 'reject_')):
-        if not is_admin(user_id):
-            await callback_query.answer("❌ Ця дія доступна тільки адміністраторам!", show_alert=True)
-            return
-            
-        # Обробка звичайних записів
-        action, target_user_id, volume = data.split('_')
-        target_user_id = int(target_user_id)
-        volume = int(volume)
-        
-        conn = sqlite3.connect(config['database']['path'])
-        c = conn.cursor()
-        
-        if action == 'approve':
-            # Спочатку знаходимо ID запису
-            c.execute('''
-                SELECT id FROM drinks 
-                WHERE user_id = ? AND volume = ? AND status = 'pending'
-                ORDER BY id DESC LIMIT 1
-            ''', (target_user_id, volume))
-            
-            result = c.fetchone()
-            if result:
-                record_id = result[0]
-                # Тепер оновлюємо конкретний запис
-                c.execute('''
-                    UPDATE drinks 
-                    SET status = 'approved' 
-                    WHERE id = ?
-                ''', (record_id,))
-                
-                if c.rowcount > 0:
-                    await callback_query.message.edit_text(
-                        callback_query.message.text + "\n\n✅ Підтверджено!"
-                    )
-                    
-                    # Повідомляємо користувача
-                    try:
-                        await client.send_message(
-                            chat_id=target_user_id,
-                            text="🎉 Ваш запис було підтверджено адміністратором!"
-                        )
-                    except Exception:
-                        pass
-            
-        else:  # reject
-            # Спочатку знаходимо ID запису
-            c.execute('''
-                SELECT id, username FROM drinks 
-                WHERE user_id = ? AND volume = ? AND status = 'pending'
-                ORDER BY id DESC LIMIT 1
-            ''', (target_user_id, volume))
-            
-            result = c.fetchone()
-            if result:
-                record_id, username = result
-                # Оновлюємо статус запису
-                c.execute('''
-                    UPDATE drinks 
-                    SET status = 'rejected' 
-                    WHERE id = ?
-                ''', (record_id,))
-                
-                if c.rowcount > 0:
-                    # Отримуємо інформацію про порушення
-                    rejected_count, next_ban_duration = get_user_info(target_user_id)
-                    
-                    # Якщо це не перше порушення, баним користувача
-                    ban_info = ""
-                    if rejected_count >= 3:
-                        ban_until = ban_user(target_user_id, username, next_ban_duration)
-                        ban_info = f"\n\n🚫 Користувача заблоковано до {ban_until.strftime('%d.%m.%Y %H:%M')}"
-                    
-                    await callback_query.message.edit_text(
-                        callback_query.message.text + f"\n\n❌ Відхилено!\n📊 Всього відхилень: {rejected_count}{ban_info}"
-                    )
-                    
-                    # Повідомляємо користувача
-                    try:
-                        message = "❌ Ваш запис було відхилено адміністратором."
-                        if ban_info:
-                            message += f"\n{ban_info}"
-                        await client.send_message(
-                            chat_id=target_user_id,
-                            text=message
-                        )
-                    except Exception:
-                        pass
-        
-        conn.commit()
-        conn.close()
+    try:
+        restart_keys = await reload_settings()
+    except (OSError, yaml.YAMLError, ValueError) as e:
+        await message.reply_text(f"❌ Конфігурацію не оновлено, діє попередня:\n{e}")
         return
-        
-    # Обробка інших callback-кнопок (вибір типу, підтипу, об'єму)
-    if not hasattr(app, 'temp_data') or user_id not in app.temp_data:
-        await callback_query.answer("❌ Сесія закінчилася. Будь ласка, надішліть відео знову.", show_alert=True)
+    
+    text = (
+        "🔄 Конфігурацію перезавантажено.\n"
+        f"🍷 Типів алкоголю: {len(settings.catalogue)}\n"
+        f"👮 Адміністраторів: {len(settings.admin_ids)}"
+    )
+    if restart_keys:
+        text += f"\n\n⚠️ Потребують перезапуску: {', '.join(restart_keys)}"
+    await message.reply_text(text)
+
+# ID вже оброблених заявок: повторне натискання кнопки не звертається до бази
+RESOLVED_RECORDS_LIMIT = 10000
+resolved_records = OrderedDict()
+
+def _mark_resolved(record_id):
+    resolved_records[record_id] = True
+    resolved_records.move_to_end(record_id)
+    if len(resolved_records) > RESOLVED_RECORDS_LIMIT:
+        resolved_records.popitem(last=False)
+
+# Зміна статусу заявки (виконується на потоці запису однією транзакцією).
+# При відхиленні тут же оновлюється стан порушень і за потреби видається бан.
+# Повертає (рядок запису або None, кількість відхилень, ban_until або None)
+def _moderate_in_transaction(conn, record_id, status):
+    # Зміна статусу лише з pending (compare-and-set) разом з підсумками
+    record = aggregates.set_status(conn, record_id, status, 'pending')
+    if not record or status != 'rejected':
+        return record, None, None
+    rejected_count, ban_until = violations.apply_rejection_penalty(conn, record[0], record[1])
+    return record, rejected_count, ban_until
+
+# Текст про бан для повідомлень (порожній, якщо бану немає)
+def _ban_info(ban_until):
+    if ban_until is None:
+        return ""
+    return f"\n\n🚫 Користувача заблоковано до {ban_until.strftime('%d.%m.%Y %H:%M')}"
+
+# Підтвердження/відхилення заявки за її ID
+async def moderate_record(client, callback_query, action, record_id):
+    if record_id is None or record_id in resolved_records:
+        await callback_query.answer("ℹ️ Цю заявку вже оброблено.", show_alert=True)
         return
     
-    # Обробка вибору типу алкоголю
-    if data.startswith('alcohol_'):
-        alcohol_type = data.split('_')[1]
-        app.temp_data[user_id]['alcohol_type'] = alcohol_type
-        
-        # Створюємо клавіатуру з підтипами
-        keyboard = []
-        row = []
-        for subtype in config['alcohol_types'][alcohol_type]['subtypes']:
-            if len(row) == 2:
-                keyboard.append(row)
-                row = []
-            row.append(InlineKeyboardButton(
-                subtype,
-                callback_data=f"subtype_{alcohol_type}_{subtype}"
-            ))
-        if row:
-            keyboard.append(row)
-            
+    status = 'approved' if action == 'approve' else 'rejected'
+    record, rejected_count, ban_until = await db.run_write(_moderate_in_transaction, record_id, status)
+    _mark_resolved(record_id)
+    if not record:
+        await callback_query.answer("ℹ️ Цю заявку вже оброблено.", show_alert=True)
+        return
+    
+    leaderboard.apply_status_change(record, status)
+    target_user_id = record[0]
+    
+    if action == 'approve':
         await callback_query.message.edit_text(
-            f"🥃 Виберіть підтип {config['alcohol_types'][alcohol_type]['name']}:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            callback_query.message.text + "\n\n✅ Підтверджено!"
         )
         
-    # Обробка вибору підтипу
-    elif data.startswith('subtype_'):
-        _, alcohol_type, subtype = data.split('_')
-        app.temp_data[user_id]['subtype'] = subtype
-        app.temp_data[user_id]['proof'] = config['alcohol_types'][alcohol_type]['strength']
+        # Повідомляємо користувача
+        try:
+            await outbox.send(
+                client.send_message,
+                priority=PRIORITY_USER,
+                chat_id=target_user_id,
+                text="🎉 Ваш запис було підтверджено адміністратором!"
+            )
+        except Exception:
+            pass
         
-        # Створюємо клавіатуру для вибору об'єму
-        default_volume = config['alcohol_types'][alcohol_type]['default_volume']
-        keyboard = [
-            [
-                InlineKeyboardButton(f"{default_volume}мл", callback_data=f"volume_{default_volume}"),
-                InlineKeyboardButton(f"{default_volume*2}мл", callback_data=f"volume_{default_volume*2}")
-            ],
-            [
-                InlineKeyboardButton("Інший об'єм", callback_data="volume_custom")
-            ]
-        ]
+    else:  # reject
+        if ban_until is not None:
+            bans.add(target_user_id, ban_until)
+        ban_info = _ban_info(ban_until)
         
         await callback_query.message.edit_text(
-            "🔢 Виберіть об'єм або введіть свій:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            callback_query.message.text + f"\n\n❌ Відхилено!\n📊 Всього відхилень: {rejected_count}{ban_info}"
         )
         
-    # Обробка вибору об'єму
-    elif data.startswith('volume_'):
-        volume = data.split('_')[1]
-        
-        if volume == 'custom':
-            await callback_query.message.edit_text(
-                "📝 Введіть об'єм в мілілітрах (наприклад: 750):"
+        # Повідомляємо користувача
+        try:
+            message = "❌ Ваш запис було відхилено адміністратором."
+            if ban_info:
+                message += f"\n{ban_info}"
+            await outbox.send(
+                client.send_message,
+                priority=PRIORITY_USER,
+                chat_id=target_user_id,
+                text=message
             )
-            app.temp_data[user_id]['waiting_for_volume'] = True
+        except Exception:
+            pass
+
+# Пакетний розгляд заявок (/review): сторінка з N заявок, мультивибір
+# і підтвердження/відхилення вибраних однією транзакцією.
+REVIEW_DEFAULT_PAGE_SIZE = 10
+REVIEW_MAX_PAGE_SIZE = 30
+REVIEW_SESSIONS_LIMIT = 100
+
+# (chat_id, message_id) -> стан сторінки розгляду
+review_sessions = OrderedDict()
+
+def _fetch_review_page(conn, after_id, page_size):
+    return conn.execute('''
+        SELECT id, username, alcohol_type, subtype, volume, proof
+        FROM drinks
+        WHERE status = 'pending' AND id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (after_id, page_size)).fetchall()
+
+# Змінюємо статус усіх вибраних заявок в одній транзакції.
+# Порушення перевіряються один раз на користувача після всього пакета.
+# Повертає (рядки записів, {user_id: ban_until})
+def _apply_review_batch(conn, record_ids, status):
+    records = []
+    for record_id in record_ids:
+        record = aggregates.set_status(conn, record_id, status, 'pending')
+        if record:
+            records.append(record)
+    
+    new_bans = {}
+    if status == 'rejected':
+        usernames = {record[0]: record[1] for record in records}
+        for user_id, username in usernames.items():
+            _, ban_until = violations.apply_rejection_penalty(conn, user_id, username)
+            if ban_until is not None:
+                new_bans[user_id] = ban_until
+    return records, new_bans
+
+def _render_review_page(session):
+    if not session['rows']:
+        return "📭 Немає активних заявок на розгляд.", None
+    
+    text = f"📋 Пакетний розгляд заявок ({len(session['rows'])}):\n\n"
+    buttons = []
+    for record_id, username, alcohol_type, subtype, volume, proof in session['rows']:
+        type_name = settings.catalogue.name(alcohol_type)
+        text += f"#{record_id} {username}: {type_name} ({subtype}), {volume}мл, {proof}%\n"
+        mark = "☑️" if record_id in session['selected'] else "⬜"
+        buttons.append(InlineKeyboardButton(f"{mark} #{record_id}", callback_data=callbacks.encode(callbacks.OP_REVIEW_TOGGLE, record_id)))
+    
+    keyboard = [buttons[i:i + 3] for i in range(0, len(buttons), 3)]
+    keyboard.append([
+        InlineKeyboardButton("✅ Підтвердити вибрані", callback_data=callbacks.encode(callbacks.OP_REVIEW_APPROVE)),
+        InlineKeyboardButton("❌ Відхилити вибрані", callback_data=callbacks.encode(callbacks.OP_REVIEW_REJECT))
+    ])
+    keyboard.append([
+        InlineKeyboardButton("☑️ Вибрати всі", callback_data=callbacks.encode(callbacks.OP_REVIEW_ALL)),
+        InlineKeyboardButton("➡️ Далі", callback_data=callbacks.encode(callbacks.OP_REVIEW_NEXT))
+    ])
+    return text, InlineKeyboardMarkup(keyboard)
+
+def _remember_review_session(key, session):
+    review_sessions[key] = session
+    review_sessions.move_to_end(key)
+    if len(review_sessions) > REVIEW_SESSIONS_LIMIT:
+        review_sessions.popitem(last=False)
+
+# Команда /review [N] для адміністраторів
+@app.on_message(filters.command("review"))
+@metrics.timed('review_command')
+async def review_command(client, message: Message):
+    if not is_admin(message.from_user.id):
+        await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
+        return
+    
+    page_size = REVIEW_DEFAULT_PAGE_SIZE
+    if len(message.command) > 1 and message.command[1].isdigit():
+        page_size = max(1, min(int(message.command[1]), REVIEW_MAX_PAGE_SIZE))
+    
+    session = {
+        'after_id': 0,
+        'page_size': page_size,
+        'rows': await db.run_read(_fetch_review_page, 0, page_size),
+        'selected': set()
+    }
+    text, reply_markup = _render_review_page(session)
+    sent = await message.reply_text(text, reply_markup=reply_markup)
+    if session['rows']:
+        _remember_review_session((sent.chat.id, sent.id), session)
+
+# Застосовуємо рішення по пакету: один запис у базу, одне оновлення рейтингу
+# і одна перевірка порушень на користувача, одне повідомлення кожному користувачу
+async def _resolve_review_batch(client, record_ids, action):
+    status = 'approved' if action == 'approve' else 'rejected'
+    records, new_bans = await db.run_write(_apply_review_batch, record_ids, status)
+    for user_id, ban_until in new_bans.items():
+        bans.add(user_id, ban_until)
+    
+    per_user = {}
+    deltas = {}
+    for record in records:
+        user_id, username, alcohol_type, volume, proof, _ = record
+        per_user.setdefault(user_id, [username, 0])[1] += 1
+        if status == 'approved':
+            delta = deltas.setdefault(user_id, [username, 0, 0, 0.0])
+            delta[1] += 1
+            delta[2] += volume
+            delta[3] += volume * proof / 100
+    for user_id, (username, approved, volume, pure_alcohol) in deltas.items():
+        leaderboard.update(user_id, username, approved, volume, pure_alcohol)
+    for record_id in record_ids:
+        _mark_resolved(record_id)
+    
+    for user_id, (username, count) in per_user.items():
+        if status == 'approved':
+            text = f"🎉 Адміністратор підтвердив ваші записи: {count}"
         else:
-            volume = int(volume)
-            app.temp_data[user_id]['volume'] = volume
-            
-            # Зберігаємо запис
-            save_drink(
-                user_id=app.temp_data[user_id]['user_id'],
-                username=app.temp_data[user_id]['username'],
-                alcohol_type=app.temp_data[user_id]['alcohol_type'],
-                subtype=app.temp_data[user_id]['subtype'],
-                volume=volume,
-                proof=app.temp_data[user_id]['proof'],
-                video_file_id=app.temp_data[user_id]['file_id']
-            )
-            
-            await callback_query.message.edit_text(
-                "✅ Запис збережено і відправлено на підтвердження адміністратору!\n"
-                f"Тип: {config['alcohol_types'][app.temp_data[user_id]['alcohol_type']]['name']}\n"
-                f"Підтип: {app.temp_data[user_id]['subtype']}\n"
-                f"Об'єм: {volume}мл\n"
-                f"Міцність: {app.temp_data[user_id]['proof']}%"
+            ban_info = _ban_info(new_bans.get(user_id))
+            text = f"❌ Адміністратор відхилив ваші записи: {count}"
+            if ban_info:
+                text += f"\n{ban_info}"
+        try:
+            await outbox.send(
+                client.send_message,
+                priority=PRIORITY_USER,
+                chat_id=user_id,
+                text=text
             )
-            
-            # Надсилаємо повідомлення адмінам
-            for admin_id in config['bot']['admin_ids']:
-                await send_video_to_admin(
-                    client,
-                    admin_id,
-                    app.temp_data[user_id],
-                    app.temp_data[user_id].get('is_video_note', True)
-                )
-            
-            # Очищаємо тимчасові дані
-            del app.temp_data[user_id]
+        except Exception:
+            pass
+    return len(records)
+
+# Дії на сторінці /review: 'toggle', 'all', 'approve', 'reject', 'next'
+async def handle_review_callback(client, callback_query: CallbackQuery, action, record_id=None):
+    key = (callback_query.message.chat.id, callback_query.message.id)
+    session = review_sessions.get(key)
+    if session is None:
+        await callback_query.answer("❌ Сторінка застаріла. Використайте /review ще раз.", show_alert=True)
+        return
+    
+    notice = None
+    if action == 'toggle':
+        session['selected'] ^= {record_id}
+    elif action == 'all':
+        session['selected'] = {row[0] for row in session['rows']}
+    elif action in ('approve', 'reject'):
+        if not session['selected']:
+            await callback_query.answer("Спочатку виберіть заявки.")
+            return
+        processed = await _resolve_review_batch(client, sorted(session['selected']), action)
+        notice = f"{'✅ Підтверджено' if action == 'approve' else '❌ Відхилено'}: {processed}"
+        session['selected'] = set()
+        session['rows'] = await db.run_read(_fetch_review_page, session['after_id'], session['page_size'])
+    elif action == 'next':
+        if session['rows']:
+            session['after_id'] = session['rows'][-1][0]
+        session['selected'] = set()
+        session['rows'] = await db.run_read(_fetch_review_page, session['after_id'], session['page_size'])
+    
+    text, reply_markup = _render_review_page(session)
+    await callback_query.message.edit_text(text, reply_markup=reply_markup)
+    await callback_query.answer(notice)
+
+# Пауза/відновлення сповіщень адміністратора
+async def handle_toggle_pause(client, callback_query: CallbackQuery):
+    user_id = callback_query.from_user.id
+    if user_id in app.admin_paused:
+        app.admin_paused.remove(user_id)
+        await callback_query.message.edit_text(
+            callback_query.message.text + "\n\n▶️ Сповіщення відновлено!",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("⏸️ Призупинити сповіщення",
+                    callback_data=callbacks.encode(callbacks.OP_TOGGLE_PAUSE))
+            ]])
+        )
+    else:
+        app.admin_paused.add(user_id)
+        await callback_query.message.edit_text(
+            callback_query.message.text + "\n\n⏸️ Сповіщення призупинено!",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("▶️ Відновити сповіщення",
+                    callback_data=callbacks.encode(callbacks.OP_TOGGLE_PAUSE))
+            ]])
+        )
+
+# Підтвердження/відхилення за старими кнопками approve_{user_id}_{volume}
+async def handle_legacy_moderation(client, callback_query: CallbackQuery, action, user_id, volume):
+    record_id = await db.run_read(_find_legacy_pending_record, user_id, volume)
+    await moderate_record(client, callback_query, action, record_id)
+
+# Обробка вибору типу алкоголю
+async def handle_alcohol_choice(client, callback_query: CallbackQuery, session, type_id):
+    alcohol_type = settings.catalogue.by_id(type_id)
+    if alcohol_type is None:
+        await callback_query.answer("❌ Невідомий тип алкоголю.", show_alert=True)
+        return
+    session.alcohol_type = alcohol_type.key
+    sessions.touch(session)
+    
+    # Готова клавіатура з підтипами
+    await callback_query.message.edit_text(
+        alcohol_type.subtype_prompt,
+        reply_markup=alcohol_type.subtype_keyboard
+    )
+
+# Обробка вибору підтипу
+async def handle_subtype_choice(client, callback_query: CallbackQuery, session, type_id, subtype_id):
+    alcohol_type = settings.catalogue.by_id(type_id)
+    subtype = alcohol_type.subtype(subtype_id) if alcohol_type is not None else None
+    if subtype is None:
+        await callback_query.answer("❌ Невідомий підтип алкоголю.", show_alert=True)
+        return
+    session.alcohol_type = alcohol_type.key
+    session.subtype = subtype
+    session.proof = alcohol_type.strength
+    sessions.touch(session)
+    
+    # Готова клавіатура для вибору об'єму
+    await callback_query.message.edit_text(
+        "🔢 Виберіть об'єм або введіть свій:",
+        reply_markup=alcohol_type.volume_keyboard
+    )
+
+# Запит на введення свого об'єму
+async def handle_custom_volume(client, callback_query: CallbackQuery, session):
+    await callback_query.message.edit_text(
+        "📝 Введіть об'єм в мілілітрах (наприклад: 750):"
+    )
+    session.waiting_for_volume = True
+    sessions.touch(session)
+
+# Обробка вибору об'єму
+async def handle_volume_choice(client, callback_query: CallbackQuery, session, volume):
+    user_id = callback_query.from_user.id
+    session.volume = volume
+    
+    # Закриваємо сесію до збереження, щоб повторне натискання не створило дубль
+    sessions.pop(user_id)
+    
+    # Зберігаємо запис
+    record_id = await save_drink(
+        user_id=session.user_id,
+        username=session.username,
+        alcohol_type=session.alcohol_type,
+        subtype=session.subtype,
+        volume=volume,
+        proof=session.proof,
+        video_file_id=session.file_id
+    )
+    
+    await callback_query.message.edit_text(
+        "✅ Запис збережено і відправлено на підтвердження адміністратору!\n"
+        f"Тип: {settings.catalogue.name(session.alcohol_type)}\n"
+        f"Підтип: {session.subtype}\n"
+        f"Об'єм: {volume}мл\n"
+        f"Міцність: {session.proof}%"
+    )
+    
+    # Надсилаємо повідомлення адмінам у фоні, не затримуючи користувача
+    notify_admins(client, record_id, session.to_dict())
+
+# Хто може натискати кнопку
+ACCESS_ANY = 'any'          # будь-хто
+ACCESS_ADMIN = 'admin'      # лише адміністратори
+ACCESS_SESSION = 'session'  # користувач з активною сесією /add (сесія передається обробнику)
+
+# Внутрішні коди для старих кнопок approve_{user_id}_{volume}; у нові кнопки не кодуються
+OP_LEGACY_APPROVE = 'legacy_approve'
+OP_LEGACY_REJECT = 'legacy_reject'
+
+# Код операції -> (обробник, доступ). Обробник викликається як
+# handler(client, callback_query, [session,] *аргументи з callback_data)
+CALLBACK_ROUTES = {
+    callbacks.OP_TOGGLE_PAUSE: (handle_toggle_pause, ACCESS_ADMIN),
+    callbacks.OP_HISTORY: (handle_history_callback, ACCESS_ANY),
+    callbacks.OP_REVIEW_TOGGLE: (
+        lambda client, cq, record_id: handle_review_callback(client, cq, 'toggle', record_id), ACCESS_ADMIN),
+    callbacks.OP_REVIEW_ALL: (lambda client, cq: handle_review_callback(client, cq, 'all'), ACCESS_ADMIN),
+    callbacks.OP_REVIEW_APPROVE: (lambda client, cq: handle_review_callback(client, cq, 'approve'), ACCESS_ADMIN),
+    callbacks.OP_REVIEW_REJECT: (lambda client, cq: handle_review_callback(client, cq, 'reject'), ACCESS_ADMIN),
+    callbacks.OP_REVIEW_NEXT: (lambda client, cq: handle_review_callback(client, cq, 'next'), ACCESS_ADMIN),
+    callbacks.OP_APPROVE: (lambda client, cq, record_id: moderate_record(client, cq, 'approve', record_id), ACCESS_ADMIN),
+    callbacks.OP_REJECT: (lambda client, cq, record_id: moderate_record(client, cq, 'reject', record_id), ACCESS_ADMIN),
+    OP_LEGACY_APPROVE: (lambda client, cq, *args: handle_legacy_moderation(client, cq, 'approve', *args), ACCESS_ADMIN),
+    OP_LEGACY_REJECT: (lambda client, cq, *args: handle_legacy_moderation(client, cq, 'reject', *args), ACCESS_ADMIN),
+    callbacks.OP_ALCOHOL: (handle_alcohol_choice, ACCESS_SESSION),
+    callbacks.OP_SUBTYPE: (handle_subtype_choice, ACCESS_SESSION),
+    callbacks.OP_VOLUME: (handle_volume_choice, ACCESS_SESSION),
+    callbacks.OP_VOLUME_CUSTOM: (handle_custom_volume, ACCESS_SESSION),
+}
+
+# Переводимо старі текстові кнопки, які ще лишились у чатах, у (код операції, аргументи).
+# Повертає None для непідтримуваних кнопок
+def _decode_legacy_callback(data):
+    catalogue = settings.catalogue
+    try:
+        if data == 'toggle_pause':
+            return callbacks.OP_TOGGLE_PAUSE, ()
+        if data.startswith(('approve_', 'reject_')):
+            parts = data.split('_')
+            if len(parts) != 3:
+                return None
+            op = OP_LEGACY_APPROVE if parts[0] == 'approve' else OP_LEGACY_REJECT
+            return op, (int(parts[1]), int(parts[2]))
+        if data.startswith('alcohol_'):
+            return callbacks.OP_ALCOHOL, (catalogue.get(data[len('alcohol_'):]).id,)
+        if data.startswith('subtype_'):
+            for alcohol_type in catalogue.types:
+                prefix = f"subtype_{alcohol_type.key}_"
+                if data.startswith(prefix):
+                    subtype_id = alcohol_type.subtypes.index(data[len(prefix):])
+                    return callbacks.OP_SUBTYPE, (alcohol_type.id, subtype_id)
+            return None
+        if data == 'volume_custom':
+            return callbacks.OP_VOLUME_CUSTOM, ()
+        if data.startswith('volume_'):
+            return callbacks.OP_VOLUME, (int(data[len('volume_'):]),)
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+# Оновлюємо обробку callback-кнопок: розбираємо код операції і
+# передаємо обробнику з таблиці CALLBACK_ROUTES
+@app.on_callback_query()
+@metrics.timed('handle_callback')
+async def handle_callback(client: Client, callback_query: CallbackQuery):
+    user_id = callback_query.from_user.id
+    decoded = callbacks.decode(callback_query.data) or _decode_legacy_callback(callback_query.data)
+    if decoded is None:
+        await callback_query.answer("❌ Непідтримувана кнопка.", show_alert=True)
+        return
+    
+    op, args = decoded
+    handler, access = CALLBACK_ROUTES[op]
+    if access == ACCESS_ADMIN and not is_admin(user_id):
+        await callback_query.answer("❌ Ця дія доступна тільки адміністраторам!", show_alert=True)
+        return
+    
+    if access == ACCESS_SESSION:
+        session = await sessions.load(user_id)
+        if session is None:
+            await callback_query.answer("❌ Сесія закінчилася. Будь ласка, надішліть відео знову.", show_alert=True)
+            return
+        args = (session,) + args
+    
+    await handler(client, callback_query, *args)
 
 # Обробка введення користувацького об'єму
 @app.on_message(filters.text & filters.private)
+@metrics.timed('handle_text')
 async def handle_text(client: Client, message: Message):
     user_id = message.from_user.id
     
     # Перевіряємо чи користувач в процесі додавання об'єму
-    if hasattr(app, 'temp_data') and user_id in app.temp_data and app.temp_data[user_id].get('waiting_for_volume'):
+    session = await sessions.load(user_id)
+    if session is not None and session.waiting_for_volume:
         try:
             volume = int(message.text)
             if volume <= 0:
                 raise ValueError
                 
-            app.temp_data[user_id]['volume'] = volume
-            app.temp_data[user_id]['waiting_for_volume'] = False
+            session.volume = volume
+            session.waiting_for_volume = False
+            
+            # Закриваємо сесію до збереження, щоб повторне натискання не створило дубль
+            sessions.pop(user_id)
             
             # Зберігаємо запис
-            save_drink(
-                user_id=app.temp_data[user_id]['user_id'],
-                username=app.temp_data[user_id]['username'],
-                alcohol_type=app.temp_data[user_id]['alcohol_type'],
-                subtype=app.temp_data[user_id]['subtype'],
+            record_id = await save_drink(
+                user_id=session.user_id,
+                username=session.username,
+                alcohol_type=session.alcohol_type,
+                subtype=session.subtype,
                 volume=volume,
-                proof=app.temp_data[user_id]['proof'],
-                video_file_id=app.temp_data[user_id]['file_id']
+                proof=session.proof,
+                video_file_id=session.file_id
             )
             
             await message.reply_text(
                 "✅ Запис збережено і відправлено на підтвердження адміністратору!\n"
-                f"Тип: {config['alcohol_types'][app.temp_data[user_id]['alcohol_type']]['name']}\n"
-                f"Підтип: {app.temp_data[user_id]['subtype']}\n"
+                f"Тип: {settings.catalogue.name(session.alcohol_type)}\n"
+                f"Підтип: {session.subtype}\n"
                 f"Об'єм: {volume}мл\n"
-                f"Міцність: {app.temp_data[user_id]['proof']}%"
+                f"Міцність: {session.proof}%"
             )
             
-            # Надсилаємо повідомлення адмінам
-            for admin_id in config['bot']['admin_ids']:
-                await send_video_to_admin(
-                    client,
-                    admin_id,
-                    app.temp_data[user_id],
-                    app.temp_data[user_id].get('is_video_note', True)
-                )
-            
-            # Очищаємо тимчасові дані
-            del app.temp_data[user_id]
+            # Надсилаємо повідомлення адмінам у фоні, не затримуючи користувача
+            notify_admins(client, record_id, session.to_dict())
             
         except ValueError:
             await message.reply_text("❌ Будь ласка, введіть коректне число в мілілітрах (наприклад: 750)")
         return
     
     # Перевіряємо чи користувач в процесі додавання пропозиції
-    if hasattr(app, 'suggest_data') and user_id in app.suggest_data:
+    if user_id in app.suggest_data:
         suggest_data = app.suggest_data[user_id]
         
         if suggest_data['step'] == 'name':
@@ -742,20 +1397,18 @@ async def handle_text(client: Client, message: Message):
             suggest_data['subtypes'] = ','.join(subtypes)
             
             # Зберігаємо пропозицію
-            conn = sqlite3.connect(config['database']['path'])
-            c = conn.cursor()
-            c.execute('''
+            await db.write('''
                 INSERT INTO alcohol_suggestions (user_id, username, name, strength, subtypes)
                 VALUES (?, ?, ?, ?, ?)
             ''', (user_id, suggest_data['username'], suggest_data['name'], 
                   suggest_data['strength'], suggest_data['subtypes']))
-            conn.commit()
-            conn.close()
             
             # Надсилаємо повідомлення адміністраторам
-            for admin_id in config['bot']['admin_ids']:
+            for admin_id in settings.admin_ids:
                 try:
-                    await client.send_message(
+                    await outbox.send(
+                        client.send_message,
+                        priority=PRIORITY_ADMIN,
                         chat_id=admin_id,
                         text=(
                             "🆕 Нова пропозиція типу алкоголю!\n\n"
@@ -782,82 +1435,116 @@ async def handle_text(client: Client, message: Message):
             
             # Очищаємо дані пропозиції
             del app.suggest_data[user_id]
-# Оновлюємо функцію надсилання відео адміністратору
+# Оновлюємо функцію надсилання відео адміністратору.
+# Повертає False, якщо адмін на паузі; помилки відправлення передаються викликачу
 async def send_video_to_admin(client, admin_id, user_data, is_video_note=True):
     # Перевіряємо чи адмін не на паузі
     if admin_id in app.admin_paused:
-        return
+        return False
         
+    # Спочатку надсилаємо відео-кружечок
+    await outbox.send(
+        client.send_video_note,
+        priority=PRIORITY_ADMIN,
+        chat_id=admin_id,
+        video_note=user_data['file_id']
+    )
+    
+    # Потім надсилаємо інформацію окремим повідомленням
+    await outbox.send(
+        client.send_message,
+        priority=PRIORITY_ADMIN,
+        chat_id=admin_id,
+        text=(
+            "🆕 Новий запис на підтвердження!\n"
+            f"👤 Користувач: {user_data['username']}\n"
+            f"🍷 Тип: {settings.catalogue.name(user_data['alcohol_type'])}\n"
+            f"📝 Підтип: {user_data['subtype']}\n"
+            f"🔢 Об'єм: {user_data['volume']}мл\n"
+            f"💪 Міцність: {user_data['proof']}%"
+        ),
+        reply_markup=InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton("✅ Підтвердити", callback_data=callbacks.encode(callbacks.OP_APPROVE, user_data['record_id'])),
+                InlineKeyboardButton("❌ Відхилити", callback_data=callbacks.encode(callbacks.OP_REJECT, user_data['record_id']))
+            ]
+        ])
+    )
+    return True
+
+# Фонові задачі (зберігаємо посилання, щоб їх не зібрав garbage collector)
+background_tasks = set()
+
+# Обмеження кількості одночасних відправлень адмінам
+admin_fanout_semaphore = asyncio.Semaphore(config['bot'].get('admin_fanout_concurrency', 5))
+
+# Розсилаємо нову заявку всім адмінам паралельно у фоновій задачі
+def notify_admins(client, record_id, user_data):
+    task = asyncio.create_task(_fan_out_to_admins(client, record_id, dict(user_data, record_id=record_id)))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def _fan_out_to_admins(client, record_id, user_data):
+    results = await asyncio.gather(*[
+        _deliver_to_admin(client, admin_id, user_data)
+        for admin_id in settings.admin_ids
+    ])
     try:
-        # Спочатку надсилаємо відео-кружечок
-        await client.send_video_note(
-            chat_id=admin_id,
-            video_note=user_data['file_id']
-        )
-        
-        # Потім надсилаємо інформацію окремим повідомленням
-        await client.send_message(
-            chat_id=admin_id,
-            text=(
-                "🆕 Новий запис на підтвердження!\n"
-                f"👤 Користувач: {user_data['username']}\n"
-                f"🍷 Тип: {config['alcohol_types'][user_data['alcohol_type']]['name']}\n"
-                f"📝 Підтип: {user_data['subtype']}\n"
-                f"🔢 Об'єм: {user_data['volume']}мл\n"
-                f"💪 Міцність: {user_data['proof']}%"
-            ),
-            reply_markup=InlineKeyboardMarkup([
-                [
-                    InlineKeyboardButton("✅ Підтвердити", callback_data=f"approve_{user_data['user_id']}_{user_data['volume']}"),
-                    InlineKeyboardButton("❌ Відхилити", callback_data=f"reject_{user_data['user_id']}_{user_data['volume']}")
-                ]
-            ])
-        )
+        await db.run_write(_record_admin_deliveries, record_id, results)
     except Exception as e:
-        print(f"Помилка при надсиланні відео адміністратору {admin_id}: {e}")
+        print(f"Помилка при збереженні результатів розсилки для запису #{record_id}: {e}")
+
+# Відправлення одному адміну: помилка одного не впливає на інших
+async def _deliver_to_admin(client, admin_id, user_data):
+    async with admin_fanout_semaphore:
+        try:
+            if await send_video_to_admin(client, admin_id, user_data):
+                return admin_id, 'sent', None
+            return admin_id, 'paused', None
+        except Exception as e:
+            print(f"Помилка при надсиланні відео адміністратору {admin_id}: {e}")
+            return admin_id, 'failed', str(e)
+
+def _record_admin_deliveries(conn, record_id, results):
+    conn.executemany('''
+        INSERT OR REPLACE INTO admin_deliveries (drink_id, admin_id, status, error)
+        VALUES (?, ?, ?, ?)
+    ''', [(record_id, admin_id, status, error) for admin_id, status, error in results])
 
 # Оновлюємо обробку відео
 @app.on_message(filters.video_note)
+@metrics.timed('handle_video')
 async def handle_video(client, message: Message):
     user_id = message.from_user.id
     
     # Перевіряємо чи користувач в процесі додавання запису
-    if not hasattr(app, 'temp_data') or user_id not in app.temp_data or not app.temp_data[user_id].get('waiting_for_video'):
+    session = await sessions.load(user_id)
+    if session is None or not session.waiting_for_video:
         await message.reply_text(
             "❌ Будь ласка, спочатку використайте команду /add для початку додавання запису."
         )
         return
     
     # Зберігаємо file_id відео
-    app.temp_data[user_id]['file_id'] = message.video_note.file_id
-    app.temp_data[user_id]['waiting_for_video'] = False
-    
-    # Створюємо клавіатуру з типами алкоголю
-    keyboard = []
-    row = []
-    for alcohol_id, details in config['alcohol_types'].items():
-        if len(row) == 2:
-            keyboard.append(row)
-            row = []
-        row.append(InlineKeyboardButton(
-            details['name'],
-            callback_data=f"alcohol_{alcohol_id}"
-        ))
-    if row:
-        keyboard.append(row)
-
+    session.file_id = message.video_note.file_id
+    session.waiting_for_video = False
+    sessions.touch(session)
+    
+    # Готова клавіатура з типами алкоголю
     await message.reply_text(
         "🍷 Виберіть тип алкоголю:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=settings.catalogue.type_keyboard
     )
 
 # Додаємо обробник для звичайних відео
 @app.on_message(filters.video)
+@metrics.timed('handle_regular_video')
 async def handle_regular_video(client, message: Message):
     user_id = message.from_user.id
     
     # Перевіряємо чи користувач в процесі додавання запису
-    if not hasattr(app, 'temp_data') or user_id not in app.temp_data or not app.temp_data[user_id].get('waiting_for_video'):
+    session = await sessions.load(user_id)
+    if session is None or not session.waiting_for_video:
         return
     
     await message.reply_text(
@@ -865,88 +1552,212 @@ async def handle_regular_video(client, message: Message):
         "Будь ласка, надішліть ваше відео у форматі відео-кружечка."
     )
 
-# Додаємо функцію для роботи з порушеннями
-def get_user_violations(user_id):
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
+# Функція перевірки чи користувач забанений (пошук в індексі банів у пам'яті)
+def is_user_banned(user_id):
+    return bans.get(user_id)
+
+# Повідомляємо користувача про закінчення бану
+async def notify_unbanned(user_id):
+    await outbox.send(
+        app.send_message,
+        priority=PRIORITY_USER,
+        chat_id=user_id,
+        text="✅ Ваше блокування закінчилося. Ви знову можете додавати записи через /add."
+    )
+
+
+
+# Знімок user_totals читається на потоці запису, між пакетами записів.
+# Результати записів повертаються в event loop у порядку комітів, а рейтинг
+# оновлюється одразу після run_write, тому до звірки вже застосовано кожен
+# запис, що потрапив у знімок, і жоден з тих, що не потрапили
+def _leaderboard_snapshot(conn):
+    return conn.execute(LEADERBOARD_QUERY).fetchall()
+
+async def check_leaderboard():
+    rows = await db.run_write(_leaderboard_snapshot)
+    drift = leaderboard.find_drift(rows)
+    if drift:
+        print(f"Розбіжність рейтингу з базою для {len(drift)} користувачів: {drift[:10]}")
+        leaderboard.load(rows)
+    return drift
+
+# Періодична звірка рейтингу в пам'яті з таблицею user_totals
+async def leaderboard_check_loop():
+    while True:
+        await asyncio.sleep(LEADERBOARD_CHECK_INTERVAL)
+        try:
+            await check_leaderboard()
+        except Exception as e:
+            print(f"Помилка при звірці рейтингу: {e}")
+
+# Команда /slow_queries для адміністраторів: найповільніші запити з планами
+SLOW_QUERY_SQL_LIMIT = 300
+
+@app.on_message(filters.command("slow_queries"))
+@metrics.timed('slow_queries_command')
+async def slow_queries_command(client, message: Message):
+    if not is_admin(message.from_user.id):
+        await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
+        return
+    if slow_log is None:
+        await message.reply_text("ℹ️ Журнал повільних запитів вимкнено (database.slow_queries.enabled у config.yml).")
+        return
     
-    # Отримуємо кількість відхилених заявок
-    c.execute('''
-        SELECT COUNT(*) 
-        FROM drinks 
-        WHERE user_id = ? AND status = 'rejected'
-    ''', (user_id,))
-    rejected_count = c.fetchone()[0]
+    entries = slow_log.report()
+    if not entries:
+        await message.reply_text(f"✅ Запитів, довших за {slow_log.threshold * 1000:g}мс, не було.")
+        return
     
-    # Отримуємо історію банів
-    c.execute('''
-        SELECT violation_type, ban_duration, ban_until, timestamp
-        FROM violations
-        WHERE user_id = ?
-        ORDER BY timestamp DESC
-    ''', (user_id,))
-    violations = c.fetchall()
+    text = f"🐢 Найповільніші запити (поріг {slow_log.threshold * 1000:g}мс):\n\n"
+    for position, entry in enumerate(entries, 1):
+        sql = entry.sql if len(entry.sql) <= SLOW_QUERY_SQL_LIMIT else entry.sql[:SLOW_QUERY_SQL_LIMIT] + "…"
+        text += f"{position}. {'⚠️ повний прохід таблиці, ' if entry.full_scan else ''}"
+        text += f"max {entry.max * 1000:.1f}мс, середнє {entry.total / entry.count * 1000:.1f}мс, разів: {entry.count}\n"
+        text += f"[{entry.shape}] {sql}\n"
+        text += "\n".join(f"└ {line}" for line in entry.plan) + "\n\n"
     
-    conn.close()
-    return rejected_count, violations
+    if len(text) > METRICS_TEXT_LIMIT:
+        text = text[:METRICS_TEXT_LIMIT] + "\n…"
+    await message.reply_text(text)
 
-# Функція для бану користувача
-def ban_user(user_id, username, duration_hours):
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    
-    ban_until = datetime.now().replace(microsecond=0)
-    ban_until = ban_until.replace(hour=ban_until.hour + duration_hours)
+# Показники для метрик (обчислюються лише під час зчитування)
+async def _pending_requests_count():
+    row = await db.query_one("SELECT COUNT(*) FROM drinks WHERE status = 'pending'")
+    return row[0]
+
+def _outbound_queue():
+    stats = outbox.stats()
+    return {(('priority', name),): stats[f'queue_{name}'] for name in PRIORITY_NAMES.values()}
+
+def _outbound_events():
+    stats = outbox.stats()
+    return {(('event', event),): stats[event] for event in ('sent', 'failed', 'retries', 'flood_waits')}
+
+metrics.gauge('alcometerbot_sessions_active', "Активні сесії /add", lambda: len(sessions))
+metrics.gauge('alcometerbot_pending_requests', "Заявки, що чекають на розгляд", _pending_requests_count)
+metrics.gauge('alcometerbot_outbound_queue', "Повідомлення в черзі на відправлення", _outbound_queue)
+metrics.gauge('alcometerbot_outbound_events', "Події черги відправлення від старту", _outbound_events)
+metrics.gauge('alcometerbot_outbound_max_queue_delay_seconds', "Найдовше очікування в черзі відправлення",
+              lambda: outbox.stats()['max_queue_delay'])
+metrics.gauge('alcometerbot_admin_fanout_tasks', "Незавершені розсилки заявок адміністраторам",
+              lambda: len(background_tasks))
+metrics.gauge('alcometerbot_active_bans', "Активні бани", lambda: len(bans))
+metrics.gauge('alcometerbot_leaderboard_users', "Користувачі в рейтингу", lambda: len(leaderboard))
+
+# Локальний HTTP-сервер метрик для Prometheus (port: 0 - вимкнено)
+METRICS_HOST = config.get('metrics', {}).get('host', '127.0.0.1')
+METRICS_PORT = config.get('metrics', {}).get('port', 9108)
+METRICS_TEXT_LIMIT = 4000
+
+# Рядок гістограми для /metrics: кількість, p50/p95 (межі кошиків) і помилки
+def _format_histogram(name, histogram, errors):
+    p50 = histogram.quantile(0.5) * 1000
+    p95 = histogram.quantile(0.95) * 1000
+    return f"- {name}: {histogram.count}, ≤{p50:g}/≤{p95:g}мс, помилок {errors}\n"
+
+# Команда /metrics для адміністраторів: короткий зріз метрик
+@app.on_message(filters.command("metrics"))
+@metrics.timed('metrics_command')
+async def metrics_command(client, message: Message):
+    if not is_admin(message.from_user.id):
+        await message.reply_text("❌ Ця команда доступна тільки адміністраторам!")
+        return
     
-    c.execute('''
-        INSERT INTO violations (user_id, username, violation_type, ban_duration, ban_until)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (user_id, username, 'rejection_ban', duration_hours, ban_until))
+    registry = metrics.registry
+    text = "📈 Метрики бота\n\n⏱ Обробники (кількість, p50/p95, помилки):\n"
+    handler_errors = registry.counters.get(metrics.HANDLER_ERRORS, {})
+    for labels, histogram in sorted(registry.histograms.get(metrics.HANDLER_SECONDS, {}).items()):
+        text += _format_histogram(labels[0][1], histogram, handler_errors.get(labels, 0))
     
-    conn.commit()
-    conn.close()
-    return ban_until
-
-# Функція перевірки чи користувач забанений
-def is_user_banned(user_id):
-    conn = sqlite3.connect(config['database']['path'])
-    c = conn.cursor()
-    
-    c.execute('''
-        SELECT ban_until
-        FROM violations
-        WHERE user_id = ? AND ban_until > datetime('now')
-        ORDER BY ban_until DESC
-        LIMIT 1
-    ''', (user_id,))
+    text += "\n🗄 Запити до бази:\n"
+    db_errors = registry.counters.get(metrics.DB_ERRORS, {})
+    for labels, histogram in sorted(registry.histograms.get(metrics.DB_SECONDS, {}).items()):
+        text += _format_histogram(f"{labels[0][1]} {labels[1][1]}", histogram, db_errors.get(labels, 0))
+    batches = registry.histograms.get(metrics.DB_WRITE_BATCH_SIZE, {}).get(())
+    flushes = registry.histograms.get(metrics.DB_WRITE_FLUSH_SECONDS, {}).get(())
+    if batches and flushes:
+        text += (f"- групові коміти: {batches.count}, в середньому {batches.sum / batches.count:.1f} записів, "
+                 f"коміт p95 ≤{flushes.quantile(0.95) * 1000:g}мс\n")
     
-    result = c.fetchone()
-    conn.close()
+    text += "\n📦 Показники:\n"
+    for name, series in (await registry.collect_gauges()).items():
+        for labels, value in series.items():
+            suffix = ','.join(f"{key}={label}" for key, label in labels)
+            text += f"- {name.replace('alcometerbot_', '')}{f' [{suffix}]' if suffix else ''}: {value}\n"
     
-    if result:
-        return datetime.fromisoformat(result[0])
-    return None
+    if len(text) > METRICS_TEXT_LIMIT:
+        text = text[:METRICS_TEXT_LIMIT] + "\n…"
+    await message.reply_text(text)
 
-# Оновлюємо функцію для отримання інформації про користувача
-def get_user_info(user_id):
-    rejected_count, violations = get_user_violations(user_id)
-    
-    # Визначаємо тривалість наступного бану
-    if rejected_count == 0:
-        next_ban_duration = 72  # 3 дні для першого порушення
-    else:
-        last_ban = violations[0][1] if violations else 72
-        if rejected_count > len(violations) * 2:
-            next_ban_duration = min(last_ban * 2, 720)  # Максимум 30 днів
-        else:
-            next_ban_duration = max(72, last_ban // 2)  # Зменшуємо покарання
-            
-    return rejected_count, next_ban_duration
+# Як часто перевіряти, чи змінився config.yml (секунди; 0 - вимкнено)
+CONFIG_WATCH_INTERVAL = config.get('reload', {}).get('watch_interval', 5)
 
+# Фонова задача: перезавантажуємо конфігурацію, коли змінюється час модифікації файлу
+async def config_watch_loop():
+    failed_mtime = None
+    while True:
+        await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+        try:
+            mtime = os.stat(CONFIG_PATH).st_mtime
+        except OSError as e:
+            print(f"Помилка при перевірці конфігурації: {e}")
+            continue
+        if mtime == settings.mtime or mtime == failed_mtime:
+            continue
+        try:
+            restart_keys = await reload_settings()
+        except (OSError, yaml.YAMLError, ValueError) as e:
+            # Не повторюємо спробу, поки файл не зміниться знову
+            failed_mtime = mtime
+            print(f"Конфігурацію не оновлено, діє попередня: {e}")
+            continue
+        failed_mtime = None
+        print("Конфігурацію перезавантажено")
+        if restart_keys:
+            print(f"Потребують перезапуску: {', '.join(restart_keys)}")
 
+async def main():
+    await app.start()
+    outbox.start()
+    periodic_tasks = [
+        asyncio.create_task(leaderboard_check_loop()),
+        asyncio.create_task(sessions.run_sweeper()),
+        asyncio.create_task(sessions.run_flusher()),
+        asyncio.create_task(bans.run_expirer(notify_unbanned))
+    ]
+    if CONFIG_WATCH_INTERVAL > 0:
+        periodic_tasks.append(asyncio.create_task(config_watch_loop()))
+    metrics_server = None
+    if METRICS_PORT:
+        try:
+            metrics_server = await metrics.serve(METRICS_HOST, METRICS_PORT)
+            print(f"Метрики: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Не вдалося запустити сервер метрик: {e}")
+    print("AlcoMeterBot запущено!")
+    try:
+        await idle()
+    finally:
+        for task in periodic_tasks:
+            task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        await sessions.flush()
+        await outbox.stop()
+        await app.stop()
 
 # Запуск бота
 if __name__ == "__main__":
     init_db()
-    print("AlcoMeterBot запущено!")
-    app.run()
\ No newline at end of file
+    db.start(
+        config['database'].get('read_workers', db.DEFAULT_READ_WORKERS),
+        config['database'].get('write_batch', db.DEFAULT_WRITE_BATCH),
+        config['database'].get('write_flush_ms', db.DEFAULT_WRITE_FLUSH_MS)
+    )
+    leaderboard.load(db.fetchall(LEADERBOARD_QUERY))
+    bans.load(db.fetchall(ACTIVE_BANS_QUERY, (datetime.now().isoformat(sep=' '),)))
+    try:
+        app.run(main())
+    finally:
+        db.shutdown()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import base64
+
+# Компактне кодування callback_data.
+# Формат: версія (1 символ) + код операції (1 символ) + base64url від
+# аргументів-цілих чисел у вигляді varint. Назви типів і підтипів у кнопки
+# не потрапляють (лише цілі ID з каталогу), тому довжина не залежить від
+# кирилиці й завжди вкладається в ліміт Telegram у 64 байти.
+
+VERSION = '1'
+
+# Ліміт Telegram на callback_data (у байтах)
+MAX_CALLBACK_DATA = 64
+
+# Коди операцій
+OP_TOGGLE_PAUSE = 'p'
+OP_HISTORY = 'h'          # (напрямок, курсор, статус, тип)
+OP_REVIEW_TOGGLE = 't'    # (record_id,)
+OP_REVIEW_ALL = 'l'
+OP_REVIEW_APPROVE = 'y'
+OP_REVIEW_REJECT = 'x'
+OP_REVIEW_NEXT = 'n'
+OP_APPROVE = 'a'          # (record_id,)
+OP_REJECT = 'r'           # (record_id,)
+OP_ALCOHOL = 'c'          # (type_id,)
+OP_SUBTYPE = 's'          # (type_id, subtype_id)
+OP_VOLUME = 'v'           # (мл,)
+OP_VOLUME_CUSTOM = 'u'
+
+# Код операції -> кількість аргументів
+OPCODES = {
+    OP_TOGGLE_PAUSE: 0,
+    OP_HISTORY: 4,
+    OP_REVIEW_TOGGLE: 1,
+    OP_REVIEW_ALL: 0,
+    OP_REVIEW_APPROVE: 0,
+    OP_REVIEW_REJECT: 0,
+    OP_REVIEW_NEXT: 0,
+    OP_APPROVE: 1,
+    OP_REJECT: 1,
+    OP_ALCOHOL: 1,
+    OP_SUBTYPE: 2,
+    OP_VOLUME: 1,
+    OP_VOLUME_CUSTOM: 0,
+}
+
+
+def encode(op, *args):
+    if op not in OPCODES:
+        raise ValueError(f"Невідомий код операції: {op!r}")
+    if len(args) != OPCODES[op]:
+        raise ValueError(f"Операція {op!r} очікує {OPCODES[op]} аргументів, отримано {len(args)}")
+    payload = bytearray()
+    for value in args:
+        _write_varint(payload, value)
+    data = VERSION + op + base64.urlsafe_b64encode(bytes(payload)).decode('ascii').rstrip('=')
+    if len(data.encode('utf-8')) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data довша за {MAX_CALLBACK_DATA} байт: {data}")
+    return data
+
+
+# (код операції, кортеж аргументів) або None, якщо це не наш формат
+# (наприклад, старі текстові кнопки) чи дані пошкоджені
+def decode(data):
+    if len(data) < 2 or data[0] != VERSION or data[1] not in OPCODES:
+        return None
+    encoded = data[2:]
+    try:
+        payload = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+        args = _read_varints(payload)
+    except ValueError:
+        return None
+    if len(args) != OPCODES[data[1]]:
+        return None
+    return data[1], args
+
+
+def _write_varint(payload, value):
+    if value < 0:
+        raise ValueError(f"Від'ємне значення в callback_data: {value}")
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            payload.append(byte | 0x80)
+        else:
+            payload.append(byte)
+            return
+
+
+def _read_varints(payload):
+    values = []
+    value, shift = 0, 0
+    for byte in payload:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value, shift = 0, 0
+    if shift:
+        raise ValueError("Обірваний varint у callback_data")
+    return tuple(values)
@@ -0,0 +1,95 @@
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+import callbacks
+
+# Каталог алкоголю, зібраний один раз з config['alcohol_types'].
+# Типи й підтипи отримують цілі ID (порядок у конфігурації), клавіатури
+# і текст /types будуються заздалегідь, тому обробники лише повторно
+# використовують готові об'єкти замість створення нових на кожне оновлення.
+
+# Скільки кнопок в одному рядку клавіатури
+KEYBOARD_ROW_SIZE = 2
+
+
+class AlcoholType:
+    __slots__ = (
+        'id', 'key', 'name', 'strength', 'default_volume', 'subtypes',
+        'subtype_prompt', 'subtype_keyboard', 'volume_keyboard'
+    )
+
+    def __init__(self, type_id, key, details):
+        self.id = type_id
+        self.key = key
+        self.name = details['name']
+        self.strength = details['strength']
+        self.default_volume = details['default_volume']
+        self.subtypes = tuple(details['subtypes'])
+        self.subtype_prompt = f"🥃 Виберіть підтип {self.name}:"
+        self.subtype_keyboard = InlineKeyboardMarkup(_rows([
+            InlineKeyboardButton(subtype, callback_data=callbacks.encode(callbacks.OP_SUBTYPE, type_id, subtype_id))
+            for subtype_id, subtype in enumerate(self.subtypes)
+        ]))
+        self.volume_keyboard = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton(f"{self.default_volume}мл",
+                    callback_data=callbacks.encode(callbacks.OP_VOLUME, self.default_volume)),
+                InlineKeyboardButton(f"{self.default_volume*2}мл",
+                    callback_data=callbacks.encode(callbacks.OP_VOLUME, self.default_volume*2))
+            ],
+            [
+                InlineKeyboardButton("Інший об'єм", callback_data=callbacks.encode(callbacks.OP_VOLUME_CUSTOM))
+            ]
+        ])
+
+    # Підтип за ID з callback або None
+    def subtype(self, subtype_id):
+        return self.subtypes[subtype_id] if 0 <= subtype_id < len(self.subtypes) else None
+
+
+class Catalogue:
+    def __init__(self, alcohol_types):
+        self.types = tuple(
+            AlcoholType(type_id, key, details)
+            for type_id, (key, details) in enumerate(alcohol_types.items())
+        )
+        self._by_key = {alcohol_type.key: alcohol_type for alcohol_type in self.types}
+        # Пошук за ключем або назвою в нижньому регістрі (фільтри /history)
+        self._by_alias = {}
+        for alcohol_type in self.types:
+            self._by_alias[alcohol_type.key.lower()] = alcohol_type
+            self._by_alias[alcohol_type.name.lower()] = alcohol_type
+
+        self.type_keyboard = InlineKeyboardMarkup(_rows([
+            InlineKeyboardButton(alcohol_type.name, callback_data=callbacks.encode(callbacks.OP_ALCOHOL, alcohol_type.id))
+            for alcohol_type in self.types
+        ]))
+
+        text = "📋 Доступні типи алкоголю:\n\n"
+        for alcohol_type in self.types:
+            text += f"🍷 {alcohol_type.name} ({alcohol_type.strength}%)\n"
+            text += f"└ Підтипи: {', '.join(alcohol_type.subtypes)}\n"
+        self.types_text = text
+
+    def __len__(self):
+        return len(self.types)
+
+    # Тип за ключем з бази (наприклад 'beer') або None
+    def get(self, key):
+        return self._by_key.get(key)
+
+    # Тип за ID з callback або None
+    def by_id(self, type_id):
+        return self.types[type_id] if 0 <= type_id < len(self.types) else None
+
+    # Тип за ключем або назвою, введеними користувачем
+    def find(self, alias):
+        return self._by_alias.get(alias.lower())
+
+    # Назва типу для відображення (ключ, якщо тип прибрали з конфігурації)
+    def name(self, key):
+        alcohol_type = self._by_key.get(key)
+        return alcohol_type.name if alcohol_type is not None else key
+
+
+# Розбиваємо кнопки на рядки по KEYBOARD_ROW_SIZE
+def _rows(buttons):
+    return [buttons[i:i + KEYBOARD_ROW_SIZE] for i in range(0, len(buttons), KEYBOARD_ROW_SIZE)]
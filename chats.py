@@ -0,0 +1,136 @@
+# Рейтинги групових чатів.
+# Рядок chat_totals означає, що користувач є учасником чату, і зберігає його
+# підсумки. При вступі підсумки копіюються з user_totals, а далі оновлюються
+# в тій самій транзакції, що й зміна статусу запису (по рядку на кожен чат
+# користувача). /top і /rank у групі читають лише індекс (chat_id, pure_alcohol)
+# свого чату, тому їх вартість не залежить від кількості інших чатів.
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS chat_totals (
+        chat_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        approved INTEGER NOT NULL DEFAULT 0,
+        volume INTEGER NOT NULL DEFAULT 0,
+        pure_alcohol REAL NOT NULL DEFAULT 0,
+        joined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (chat_id, user_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_chat_totals_pure
+    ON chat_totals (chat_id, pure_alcohol DESC)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_chat_totals_user
+    ON chat_totals (user_id)
+    ''',
+)
+
+
+# Додаємо користувача до чату з його поточними підсумками.
+# Повертає True, якщо користувача в чаті ще не було
+def join(conn, chat_id, user_id):
+    return conn.execute('''
+        INSERT OR IGNORE INTO chat_totals (chat_id, user_id, approved, volume, pure_alcohol)
+        SELECT ?, member.user_id,
+               COALESCE(user_totals.approved, 0),
+               COALESCE(user_totals.volume, 0),
+               COALESCE(user_totals.pure_alcohol, 0)
+        FROM (SELECT ? AS user_id) AS member
+        LEFT JOIN user_totals ON user_totals.user_id = member.user_id
+    ''', (chat_id, user_id)).rowcount == 1
+
+
+def leave(conn, chat_id, user_id):
+    conn.execute('DELETE FROM chat_totals WHERE chat_id = ? AND user_id = ?', (chat_id, user_id))
+
+
+# Бот вийшов з чату (або його видалили): рейтинг чату більше не потрібен
+def forget(conn, chat_id):
+    return conn.execute('DELETE FROM chat_totals WHERE chat_id = ?', (chat_id,)).rowcount
+
+
+# Зміна затверджених підсумків користувача в усіх його чатах
+def apply_approved(conn, user_id, approved_delta, volume_delta, pure_delta):
+    conn.execute('''
+        UPDATE chat_totals SET
+            approved = approved + ?,
+            volume = volume + ?,
+            pure_alcohol = pure_alcohol + ?
+        WHERE user_id = ?
+    ''', (approved_delta, volume_delta, pure_delta, user_id))
+
+
+# Перші n учасників чату: (user_id, username, volume, pure_alcohol)
+def top(conn, chat_id, n=10):
+    return conn.execute('''
+        SELECT chat_totals.user_id, user_totals.username, chat_totals.volume, chat_totals.pure_alcohol
+        FROM chat_totals
+        JOIN user_totals ON user_totals.user_id = chat_totals.user_id
+        WHERE chat_totals.chat_id = ? AND chat_totals.approved > 0
+        ORDER BY chat_totals.pure_alcohol DESC, chat_totals.user_id
+        LIMIT ?
+    ''', (chat_id, n)).fetchall()
+
+
+# Топ учасників чату за тиждень чи місяць (ключ періоду з aggregates.week_key /
+# month_key): перебираються лише учасники цього чату
+def top_period(conn, chat_id, period, n=10):
+    return conn.execute('''
+        SELECT period_totals.user_id, user_totals.username, period_totals.volume, period_totals.pure_alcohol
+        FROM chat_totals
+        JOIN period_totals ON period_totals.period = ? AND period_totals.user_id = chat_totals.user_id
+        JOIN user_totals ON user_totals.user_id = chat_totals.user_id
+        WHERE chat_totals.chat_id = ?
+        ORDER BY period_totals.pure_alcohol DESC
+        LIMIT ?
+    ''', (period, chat_id, n)).fetchall()
+
+
+# Позиція в рейтингу чату у форматі Leaderboard.rank:
+# (місце, pure_alcohol, відставання від попереднього, username попереднього,
+# всього учасників з записами) або None
+def rank(conn, chat_id, user_id):
+    row = conn.execute('''
+        SELECT pure_alcohol FROM chat_totals
+        WHERE chat_id = ? AND user_id = ? AND approved > 0
+    ''', (chat_id, user_id)).fetchone()
+    if row is None:
+        return None
+    pure_alcohol = row[0]
+    # Ті, хто вище: більше спирту, а при рівності - менший user_id (як у Leaderboard)
+    ahead = conn.execute('''
+        SELECT COUNT(*) FROM chat_totals
+        WHERE chat_id = ? AND approved > 0
+          AND (pure_alcohol > ? OR (pure_alcohol = ? AND user_id < ?))
+    ''', (chat_id, pure_alcohol, pure_alcohol, user_id)).fetchone()[0]
+    total = conn.execute(
+        'SELECT COUNT(*) FROM chat_totals WHERE chat_id = ? AND approved > 0', (chat_id,)
+    ).fetchone()[0]
+    gap, ahead_username = 0.0, None
+    if ahead:
+        ahead_pure, ahead_username = conn.execute('''
+            SELECT chat_totals.pure_alcohol, user_totals.username
+            FROM chat_totals
+            JOIN user_totals ON user_totals.user_id = chat_totals.user_id
+            WHERE chat_totals.chat_id = ? AND chat_totals.approved > 0
+              AND (chat_totals.pure_alcohol > ?
+                   OR (chat_totals.pure_alcohol = ? AND chat_totals.user_id < ?))
+            ORDER BY chat_totals.pure_alcohol, chat_totals.user_id DESC
+            LIMIT 1
+        ''', (chat_id, pure_alcohol, pure_alcohol, user_id)).fetchone()
+        gap = ahead_pure - pure_alcohol
+    return ahead + 1, pure_alcohol, gap, ahead_username, total
+
+
+# Перераховуємо підсумки учасників з user_totals (після aggregates.rebuild).
+# Повертає кількість чатів
+def rebuild(conn):
+    conn.execute('''
+        UPDATE chat_totals SET
+            approved = COALESCE((SELECT approved FROM user_totals WHERE user_totals.user_id = chat_totals.user_id), 0),
+            volume = COALESCE((SELECT volume FROM user_totals WHERE user_totals.user_id = chat_totals.user_id), 0),
+            pure_alcohol = COALESCE((SELECT pure_alcohol FROM user_totals WHERE user_totals.user_id = chat_totals.user_id), 0)
+    ''')
+    return conn.execute('SELECT COUNT(DISTINCT chat_id) FROM chat_totals').fetchone()[0]
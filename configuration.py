@@ -0,0 +1,107 @@
+import os
+import yaml
+from catalogue import Catalogue
+
+# Знімок конфігурації: config.yml разом з усім, що з нього будується
+# (каталог алкоголю з клавіатурами, множина адміністраторів).
+# Знімок не змінюється після створення; при перезавантаженні будується новий
+# і підміняється одним присвоєнням, тому обробник завжди бачить узгоджені дані.
+
+# Параметри, які читаються лише при старті (їх зміна потребує перезапуску)
+RESTART_KEYS = (
+    ('bot', 'api_id'),
+    ('bot', 'api_hash'),
+    ('bot', 'bot_token'),
+    ('bot', 'admin_fanout_concurrency'),
+    ('database',),
+    ('outbound',),
+    ('sessions',),
+    ('leaderboard',),
+    ('reload',),
+    ('metrics',),
+)
+
+
+class Settings:
+    __slots__ = ('config', 'catalogue', 'admin_ids', 'mtime')
+
+    def __init__(self, config, mtime=None):
+        validate(config)
+        self.config = config
+        self.catalogue = Catalogue(config['alcohol_types'])
+        self.admin_ids = frozenset(config['bot']['admin_ids'])
+        self.mtime = mtime
+
+
+# Читаємо і перевіряємо config.yml; помилки - OSError, yaml.YAMLError або ValueError
+def load(path):
+    mtime = os.stat(path).st_mtime
+    with open(path, 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+    return Settings(config, mtime)
+
+
+def validate(config):
+    if not isinstance(config, dict):
+        raise ValueError("Конфігурація має бути словником YAML")
+    for section in ('bot', 'database', 'alcohol_types'):
+        if not isinstance(config.get(section), dict):
+            raise ValueError(f"Відсутній розділ '{section}'")
+
+    admin_ids = config['bot'].get('admin_ids')
+    if not isinstance(admin_ids, list) or not all(isinstance(admin_id, int) for admin_id in admin_ids):
+        raise ValueError("bot.admin_ids має бути списком цілих ID")
+
+    if not config['alcohol_types']:
+        raise ValueError("alcohol_types не може бути порожнім")
+    for key, details in config['alcohol_types'].items():
+        if not isinstance(details, dict):
+            raise ValueError(f"alcohol_types.{key}: очікується словник")
+        if not isinstance(details.get('name'), str) or not details['name']:
+            raise ValueError(f"alcohol_types.{key}.name: очікується непорожній рядок")
+        strength = details.get('strength')
+        if not isinstance(strength, (int, float)) or not 0 < strength <= 100:
+            raise ValueError(f"alcohol_types.{key}.strength: очікується число від 0 до 100")
+        default_volume = details.get('default_volume')
+        if not isinstance(default_volume, int) or default_volume <= 0:
+            raise ValueError(f"alcohol_types.{key}.default_volume: очікується додатне ціле число")
+        subtypes = details.get('subtypes')
+        if (not isinstance(subtypes, list) or not subtypes
+                or not all(isinstance(subtype, str) and subtype for subtype in subtypes)):
+            raise ValueError(f"alcohol_types.{key}.subtypes: очікується непорожній список рядків")
+        if len(set(subtypes)) != len(subtypes):
+            raise ValueError(f"alcohol_types.{key}.subtypes: підтипи повторюються")
+
+
+# Параметри з RESTART_KEYS, які відрізняються між двома конфігураціями
+def restart_required(old_config, new_config):
+    changed = []
+    for path in RESTART_KEYS:
+        if _lookup(old_config, path) != _lookup(new_config, path):
+            changed.append('.'.join(path))
+    return changed
+
+
+# Кнопки містять ID типів і підтипів - їхні позиції в config.yml. Без перезапуску
+# можна лише додавати типи й підтипи в кінець списків: видалення чи зміна порядку
+# змінили б значення кнопок у вже відкритих клавіатурах /add і /history.
+# Повертає список таких змін (порожній, якщо ID не змінюються)
+def catalogue_id_changes(old_config, new_config):
+    changes = []
+    new_types = list(new_config['alcohol_types'].items())
+    for type_id, (key, details) in enumerate(old_config['alcohol_types'].items()):
+        if type_id >= len(new_types) or new_types[type_id][0] != key:
+            changes.append(f"alcohol_types: тип '{key}' видалено або переміщено")
+            continue
+        old_subtypes = details['subtypes']
+        if new_types[type_id][1]['subtypes'][:len(old_subtypes)] != old_subtypes:
+            changes.append(f"alcohol_types.{key}.subtypes: підтипи видалено або переміщено")
+    return changes
+
+
+def _lookup(config, path):
+    for key in path:
+        if not isinstance(config, dict):
+            return None
+        config = config.get(key)
+    return config
@@ -0,0 +1,298 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+import metrics
+import slowlog
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Налаштування з'єднань SQLite.
+# WAL дозволяє читати паралельно із записом, synchronous=NORMAL у режимі WAL
+# не втрачає цілісність бази, а лише останні транзакції при збої живлення.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",  # ~32 МБ кешу сторінок
+    "PRAGMA mmap_size = 268435456",  # 256 МБ memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Кількість підготовлених запитів, які кешуються на кожному з'єднанні
+CACHED_STATEMENTS = 256
+
+# Кількість потоків для читання за замовчуванням
+DEFAULT_READ_WORKERS = 4
+
+# Груповий коміт: записи з різних обробників, що надійшли протягом
+# WRITE_FLUSH_MS після першого (або поки пакет не заповниться), виконуються
+# в одній транзакції з одним комітом. Кожен викликач отримує результат лише
+# після коміту пакета; помилка одного запису відкочує лише його (SAVEPOINT).
+DEFAULT_WRITE_BATCH = 64
+DEFAULT_WRITE_FLUSH_MS = 2
+
+_path = None
+_slow_log = None
+_local = threading.local()
+_connections = []
+_lock = threading.Lock()
+
+# Пул потоків для читання і один потік для запису з чергою
+_read_pool = None
+_write_queue = None
+_writer_thread = None
+
+
+# Задаємо шлях до бази даних (викликається один раз при старті)
+def configure(path):
+    global _path
+    close_all()
+    _path = path
+
+
+# Вмикаємо журнал повільних запитів (slowlog.SlowQueryLog) для нових з'єднань
+def enable_slow_log(log):
+    global _slow_log
+    close_all()
+    _slow_log = log
+
+
+# Відкриваємо нове з'єднання з усіма налаштуваннями
+def connect(path=None):
+    conn = sqlite3.connect(
+        path or _path,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,
+        factory=slowlog.ProfiledConnection if _slow_log is not None else sqlite3.Connection
+    )
+    if _slow_log is not None:
+        conn.slow_log = _slow_log
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# Повертаємо довгоживуче з'єднання поточного потоку
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        if _path is None:
+            raise RuntimeError("База даних не налаштована: викличте database.configure()")
+        conn = connect()
+        if getattr(_local, 'read_only', False):
+            conn.execute("PRAGMA query_only = ON")
+        _local.conn = conn
+        with _lock:
+            _connections.append(conn)
+    return conn
+
+
+# Ініціалізатор потоків читання: їхні з'єднання працюють лише на читання
+def _init_reader():
+    _local.read_only = True
+
+
+# Запускаємо пули потоків для асинхронного доступу до бази
+def start(read_workers=DEFAULT_READ_WORKERS, write_batch=DEFAULT_WRITE_BATCH,
+          write_flush_ms=DEFAULT_WRITE_FLUSH_MS):
+    global _read_pool, _write_queue, _writer_thread
+    if _read_pool is None:
+        _read_pool = ThreadPoolExecutor(
+            max_workers=read_workers,
+            thread_name_prefix="db-read",
+            initializer=_init_reader
+        )
+    if _writer_thread is None:
+        _write_queue = queue.Queue()
+        _writer_thread = threading.Thread(
+            target=_writer_loop,
+            args=(_write_queue, write_batch, write_flush_ms / 1000),
+            name="db-write",
+            daemon=True
+        )
+        _writer_thread.start()
+
+
+# Зупиняємо потоки (черга записів дописується до кінця) і закриваємо з'єднання
+def shutdown():
+    global _read_pool, _write_queue, _writer_thread
+    if _read_pool is not None:
+        _read_pool.shutdown(wait=True)
+    if _writer_thread is not None:
+        _write_queue.put(None)
+        _writer_thread.join()
+    _read_pool = _write_queue = _writer_thread = None
+    close_all()
+
+
+# Закриваємо всі відкриті з'єднання (при зупинці бота)
+def close_all():
+    with _lock:
+        while _connections:
+            try:
+                _connections.pop().close()
+            except sqlite3.Error:
+                pass
+    _local.__dict__.pop('conn', None)
+
+
+# Транзакція на спільному з'єднанні: commit при успіху, rollback при помилці
+@contextmanager
+def transaction():
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def fetchone(query, params=()):
+    return get_connection().execute(query, params).fetchone()
+
+
+def fetchall(query, params=()):
+    return get_connection().execute(query, params).fetchall()
+
+
+# Виконуємо один запит на запис і одразу фіксуємо його
+def execute(query, params=()):
+    with transaction() as conn:
+        cursor = conn.execute(query, params)
+        return cursor.rowcount, cursor.lastrowid
+
+
+# Потік запису: збираємо пакет із черги і виконуємо його одним комітом
+def _writer_loop(write_queue, max_batch, flush_delay):
+    while True:
+        item = write_queue.get()
+        if item is None:
+            return
+        batch = [item]
+        stopping = False
+        deadline = time.monotonic() + flush_delay
+        while len(batch) < max_batch:
+            try:
+                # Те, що вже в черзі, беремо одразу; далі чекаємо до кінця вікна
+                timeout = deadline - time.monotonic()
+                item = write_queue.get(timeout=timeout) if timeout > 0 else write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        _commit_batch(batch)
+        if stopping:
+            return
+
+
+def _commit_batch(batch):
+    started = time.perf_counter()
+    conn = get_connection()
+    outcomes = []
+    try:
+        conn.execute("BEGIN")
+        for fn, args, future, loop in batch:
+            conn.execute("SAVEPOINT batch_item")
+            try:
+                result = fn(conn, *args)
+            except Exception as e:
+                conn.execute("ROLLBACK TO batch_item")
+                conn.execute("RELEASE batch_item")
+                outcomes.append((future, loop, None, e))
+            else:
+                conn.execute("RELEASE batch_item")
+                outcomes.append((future, loop, result, None))
+        conn.commit()
+    except Exception as e:
+        # Не вдалося закомітити пакет: помилку отримують усі його учасники
+        conn.rollback()
+        outcomes = [(future, loop, None, e) for _, _, future, loop in batch]
+
+    elapsed = time.perf_counter() - started
+    loop = batch[0][3]
+    loop.call_soon_threadsafe(metrics.observe, metrics.DB_WRITE_BATCH_SIZE, (), len(batch))
+    loop.call_soon_threadsafe(metrics.observe, metrics.DB_WRITE_FLUSH_SECONDS, (), elapsed)
+    for future, loop, result, error in outcomes:
+        loop.call_soon_threadsafe(_resolve, future, result, error)
+
+
+def _resolve(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+# Виконуємо fn(conn, *args) на одному з потоків читання
+async def run_read(fn, *args):
+    return await _run_read(fn, args, fn.__name__)
+
+
+# Виконуємо fn(conn, *args) на єдиному потоці запису в транзакції
+# (груповий коміт разом з іншими записами, що надійшли одночасно).
+# Усі записи серіалізуються, тому SQLite ніколи не конкурує за блокування запису.
+async def run_write(fn, *args):
+    return await _run_write(fn, args, fn.__name__)
+
+
+async def _run_read(fn, args, label):
+    if _read_pool is None:
+        start()
+    loop = asyncio.get_running_loop()
+    return await _timed('read', label, loop.run_in_executor(_read_pool, lambda: fn(get_connection(), *args)))
+
+
+async def _run_write(fn, args, label):
+    if _writer_thread is None:
+        start()
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _write_queue.put((fn, args, future, loop))
+    return await _timed('write', label, future)
+
+
+# Час запиту (разом з очікуванням у черзі пулу) і помилки для метрик
+async def _timed(op, label, future):
+    labels = (('op', op), ('query', label))
+    started = time.perf_counter()
+    try:
+        return await future
+    except Exception:
+        metrics.inc(metrics.DB_ERRORS, labels)
+        raise
+    finally:
+        metrics.observe(metrics.DB_SECONDS, labels, time.perf_counter() - started)
+
+
+# Коротка назва запиту для метрик: дієслово і перша таблиця ("SELECT drinks")
+def query_label(query):
+    words = query.split()
+    verb = words[0].upper() if words else ''
+    for index, word in enumerate(words[:-1]):
+        if word.upper() in ('FROM', 'INTO', 'UPDATE', 'TABLE'):
+            return f"{verb} {words[index + 1].strip('(')}"
+    return verb
+
+
+async def query_one(query, params=()):
+    return await _run_read(lambda conn: conn.execute(query, params).fetchone(), (), query_label(query))
+
+
+async def query_all(query, params=()):
+    return await _run_read(lambda conn: conn.execute(query, params).fetchall(), (), query_label(query))
+
+
+# Асинхронний варіант execute(): повертає (rowcount, lastrowid)
+async def write(query, params=()):
+    def _execute(conn):
+        cursor = conn.execute(query, params)
+        return cursor.rowcount, cursor.lastrowid
+    return await _run_write(_execute, (), query_label(query))
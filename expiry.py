@@ -0,0 +1,51 @@
+import asyncio
+import heapq
+
+# Купа термінів дії (deadline, key) і фонова задача, яка прокидається до
+# найближчого терміну. Спільна для сесій /add (sessions.py) і банів (bans.py).
+# Записи купи видаляються ліниво: власник сам перевіряє, чи запис ще
+# актуальний, бо термін могли продовжити або запис прибрати раніше.
+
+
+class ExpiryHeap:
+    def __init__(self, seconds_until):
+        # Функція deadline -> скільки секунд до нього лишилось
+        self.seconds_until = seconds_until
+        self._heap = []
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, deadline, key):
+        heapq.heappush(self._heap, (deadline, key))
+        # Новий найближчий термін: будимо задачу, щоб вона перерахувала сон
+        if self._wakeup is not None and self._heap[0][1] == key:
+            self._wakeup.set()
+
+    # Замінюємо весь вміст купи записами (deadline, key)
+    def reset(self, entries):
+        self._heap = list(entries)
+        heapq.heapify(self._heap)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Знімаємо з купи всі записи з терміном до now включно (і застарілі теж)
+    def pop_due(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            yield heapq.heappop(self._heap)
+
+    # Фонова задача: викликаємо expire() і спимо до найближчого терміну
+    # (але не довше max_interval)
+    async def run(self, expire, max_interval):
+        self._wakeup = asyncio.Event()
+        while True:
+            await expire()
+            delay = max_interval
+            if self._heap:
+                delay = min(delay, max(0.0, self.seconds_until(self._heap[0][0])))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,93 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import database as db
+
+# Потокове вивантаження записів у CSV або JSON, стиснуте gzip.
+# Рядки читаються з курсора порціями (fetchmany) і одразу пишуться у
+# тимчасовий файл через gzip, тому пам'ять не залежить від кількості рядків.
+# Вивантаження виконується в окремому потоці з власним з'єднанням, щоб не
+# займати пул читання і не блокувати event loop.
+
+FORMATS = ('csv', 'json')
+CHUNK_SIZE = 1000
+COMPRESS_LEVEL = 6
+# Ліміт Telegram на документ: Pyrogram завантажує файли через MTProto
+# (2000 МіБ), а не через Bot API з його лімітом 50 МБ
+MAX_DOCUMENT_BYTES = 2000 * 1024 * 1024
+
+USER_COLUMNS = ('id', 'timestamp', 'alcohol_type', 'subtype', 'volume', 'proof', 'status')
+USER_QUERY = '''
+    SELECT id, timestamp, alcohol_type, subtype, volume, proof, status
+    FROM drinks
+    WHERE user_id = ?
+    ORDER BY id
+'''
+
+ALL_COLUMNS = ('id', 'user_id', 'username', 'alcohol_type', 'subtype', 'volume', 'proof',
+               'status', 'video_file_id', 'timestamp')
+ALL_QUERY = '''
+    SELECT id, user_id, username, alcohol_type, subtype, volume, proof,
+           status, video_file_id, timestamp
+    FROM drinks
+    ORDER BY id
+'''
+
+
+# Рядки запиту порціями по CHUNK_SIZE
+def iter_chunks(conn, query, params=()):
+    cursor = conn.execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+
+def write_csv(file, columns, chunks):
+    writer = csv.writer(file)
+    writer.writerow(columns)
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+# JSON-масив об'єктів, по одному рядку на запис; порція пишеться одним write
+def write_json(file, columns, chunks):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    file.write('[')
+    count = 0
+    for rows in chunks:
+        file.write((',\n' if count else '\n') + ',\n'.join(encode(dict(zip(columns, row))) for row in rows))
+        count += len(rows)
+    file.write('\n]\n')
+    return count
+
+
+# Вивантажуємо запит у тимчасовий файл .csv.gz / .json.gz (виконується в потоці).
+# Повертає (шлях, кількість рядків); файл видаляє той, хто його надіслав
+def export_to_file(query, params, columns, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Невідомий формат вивантаження: {fmt}")
+    writer = write_csv if fmt == 'csv' else write_json
+    handle, path = tempfile.mkstemp(prefix='alcometerbot_', suffix=f'.{fmt}.gz')
+    os.close(handle)
+    conn = db.connect()
+    conn.execute("PRAGMA query_only = ON")
+    try:
+        # Один SELECT читає з одного знімка WAL, навіть якщо паралельно йдуть записи
+        with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=COMPRESS_LEVEL) as file:
+            count = writer(file, columns, iter_chunks(conn, query, params))
+    except BaseException:
+        os.remove(path)
+        raise
+    finally:
+        conn.close()
+    return path, count
@@ -0,0 +1,352 @@
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+import aggregates
+import chats
+import configuration
+import database as db
+import migrations
+import violations
+
+# Імпорт історичних записів у таблицю drinks з CSV або JSON (офлайн, бот зупинено).
+# Записи перевіряються за каталогом alcohol_types з config.yml і вставляються
+# пакетами через executemany, по транзакції на пакет. Індекси drinks на час
+# імпорту видаляються і будуються заново наприкінці, після чого перераховуються
+# всі агреговані таблиці.
+# Позиція у файлі зберігається в import_progress (міграція 11) у тій самій
+# транзакції, що й пакет, тому після переривання повторний запуск продовжує
+# з того ж місця без дублікатів.
+#
+# Запуск з кореня репозиторію:
+#   python import_drinks.py old_bot.csv --rejects rejects.jsonl
+#   python import_drinks.py sheet.csv --map "Користувач=user_id" --map "Тип=alcohol_type"
+#   python import_drinks.py alcometer_20240101_1200.json.gz
+
+DEFAULT_BATCH = 10000
+# Як часто друкувати прогрес (секунди)
+PROGRESS_INTERVAL = 5
+MAX_PRINTED_ERRORS = 20
+READ_SIZE = 1 << 16
+
+FORMATS = ('csv', 'json')
+STATUSES = ('pending', 'approved', 'rejected')
+# Формати дат, які не розуміє datetime.fromisoformat
+TIMESTAMP_FORMATS = ('%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y')
+
+INSERT_QUERY = '''
+    INSERT INTO drinks (user_id, username, alcohol_type, subtype, volume, proof,
+                        status, video_file_id, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+# Формат за розширенням (.csv, .json, .jsonl, також з .gz)
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.json', '.jsonl'):
+        return 'json'
+    raise ValueError(f"Не вдалося визначити формат {path}; вкажіть --format")
+
+
+def open_input(path):
+    # utf-8-sig прибирає BOM, який додають табличні редактори
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def iter_csv(file):
+    return csv.DictReader(file)
+
+
+_JSON_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+# Об'єкти з JSON-масиву або JSON Lines без завантаження всього файлу в пам'ять
+def iter_json(file):
+    decoder = json.JSONDecoder()
+    buffer, pos = '', 0
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            pos = _JSON_SEPARATORS.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if not chunk:
+                    raise
+                break  # об'єкт обірвано на межі блоку - дочитуємо
+            yield record
+        if not chunk:
+            return
+
+
+def _int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}: очікується ціле число, отримано {value!r}")
+
+
+# Час у форматі SQLite (UTC, як CURRENT_TIMESTAMP)
+def parse_timestamp(value):
+    if not value:
+        raise ValueError("timestamp: відсутній")
+    value = str(value).strip()
+    try:
+        moment = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        for timestamp_format in TIMESTAMP_FORMATS:
+            try:
+                moment = datetime.strptime(value, timestamp_format)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"timestamp: невідомий формат {value!r}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Запис з файлу -> кортеж для INSERT_QUERY; ValueError, якщо запис некоректний.
+# mapping перейменовує колонки файлу в поля drinks; id з файлу ігнорується
+def to_row(record, catalogue, mapping):
+    if not isinstance(record, dict):
+        raise ValueError(f"очікується об'єкт, отримано {type(record).__name__}")
+    values = {mapping.get(key, key): value for key, value in record.items()}
+
+    user_id = _int(values.get('user_id'), 'user_id')
+    alias = str(values.get('alcohol_type') or '').strip()
+    alcohol_type = catalogue.find(alias)
+    if alcohol_type is None:
+        raise ValueError(f"alcohol_type: немає в config.yml: {alias!r}")
+    volume = _int(values.get('volume'), 'volume')
+    if volume <= 0:
+        raise ValueError(f"volume: очікується додатне число, отримано {volume}")
+    proof = values.get('proof')
+    if proof is None or proof == '':
+        proof = alcohol_type.strength
+    else:
+        try:
+            proof = float(proof)
+        except (TypeError, ValueError):
+            raise ValueError(f"proof: очікується число, отримано {proof!r}")
+        if not 0 <= proof <= 100:
+            raise ValueError(f"proof: очікується від 0 до 100, отримано {proof}")
+    status = str(values.get('status') or 'approved').strip().lower()
+    if status not in STATUSES:
+        raise ValueError(f"status: очікується одне з {', '.join(STATUSES)}, отримано {status!r}")
+
+    return (
+        user_id,
+        values.get('username') or None,
+        alcohol_type.key,
+        values.get('subtype') or None,
+        volume,
+        proof,
+        status,
+        values.get('video_file_id') or None,
+        parse_timestamp(values.get('timestamp')),
+    )
+
+
+# Стан імпорту файлу: (position, imported, rejected); створює рядок для нового файлу
+def load_progress(conn, source, size):
+    unfinished = conn.execute('''
+        SELECT source FROM import_progress
+        WHERE finished_at IS NULL AND source != ?
+    ''', (source,)).fetchone()
+    if unfinished is not None:
+        raise ValueError(f"Спочатку завершіть незавершений імпорт {unfinished[0]}")
+    row = conn.execute('''
+        SELECT size, position, imported, rejected, finished_at
+        FROM import_progress
+        WHERE source = ?
+    ''', (source,)).fetchone()
+    if row is None:
+        with db.transaction() as tx:
+            tx.execute('INSERT INTO import_progress (source, size) VALUES (?, ?)', (source, size))
+        return 0, 0, 0
+    if row[4] is not None:
+        raise ValueError(f"{source} вже імпортовано {row[4]}")
+    if row[0] != size:
+        raise ValueError(f"{source} змінився після початку імпорту (було {row[0]} байт, зараз {size})")
+    return row[1], row[2], row[3]
+
+
+# Видаляємо індекси drinks до кінця імпорту (при продовженні вони вже видалені)
+def defer_indexes(conn, source):
+    if conn.execute(
+        'SELECT deferred_indexes FROM import_progress WHERE source = ?', (source,)
+    ).fetchone()[0] is not None:
+        return
+    indexes = conn.execute('''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = 'drinks' AND sql IS NOT NULL
+    ''').fetchall()
+    with db.transaction() as tx:
+        tx.execute(
+            'UPDATE import_progress SET deferred_indexes = ? WHERE source = ?',
+            (json.dumps([sql for _, sql in indexes]), source)
+        )
+        for name, _ in indexes:
+            tx.execute(f'DROP INDEX IF EXISTS "{name}"')
+    print(f"Індекси drinks відкладено до кінця імпорту: {len(indexes)}")
+
+
+# Пакет записів і новий стан імпорту - однією транзакцією
+def flush(source, rows, position, imported, rejected):
+    with db.transaction() as tx:
+        tx.executemany(INSERT_QUERY, rows)
+        tx.execute('''
+            UPDATE import_progress SET position = ?, imported = ?, rejected = ?
+            WHERE source = ?
+        ''', (position, imported, rejected, source))
+
+
+# Відновлюємо індекси, перераховуємо підсумки і позначаємо імпорт завершеним
+def finish(conn, source):
+    deferred = conn.execute(
+        'SELECT deferred_indexes FROM import_progress WHERE source = ?', (source,)
+    ).fetchone()[0]
+    started = time.perf_counter()
+    with db.transaction() as tx:
+        for sql in json.loads(deferred or '[]'):
+            tx.execute(sql)
+        users_count = aggregates.rebuild(tx)
+        aggregates.rebuild_rollups(tx)
+        chats.rebuild(tx)
+        violations.rebuild(tx)
+        tx.execute('''
+            UPDATE import_progress SET deferred_indexes = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE source = ?
+        ''', (source,))
+    conn.execute('ANALYZE')
+    print(f"Індекси і підсумки для {users_count} користувачів перераховано "
+          f"за {time.perf_counter() - started:.1f}с")
+
+
+def run(path, fmt, mapping, batch_size, keep_indexes, rejects_path):
+    settings = configuration.load(os.environ.get('ALCOMETERBOT_CONFIG', 'config.yml'))
+    db.configure(settings.config['database']['path'])
+    conn = db.get_connection()
+    migrations.migrate(conn)
+
+    source = os.path.abspath(path)
+    position, imported, rejected = load_progress(conn, source, os.path.getsize(path))
+    if position:
+        print(f"Продовжуємо імпорт {source} з запису {position} "
+              f"(імпортовано {imported}, відхилено {rejected})")
+    if not keep_indexes:
+        defer_indexes(conn, source)
+
+    rejects = open(rejects_path, 'a', encoding='utf-8') if rejects_path else None
+    started = last_report = time.perf_counter()
+    session_imported = 0
+    rows, errors = [], []
+    try:
+        with open_input(path) as file:
+            records = iter_csv(file) if fmt == 'csv' else iter_json(file)
+            for record in itertools.islice(records, position, None):
+                position += 1
+                try:
+                    rows.append(to_row(record, settings.catalogue, mapping))
+                except ValueError as e:
+                    errors.append((position, str(e), record))
+                if position % batch_size:
+                    continue
+
+                flush(source, rows, position, imported + len(rows), rejected + len(errors))
+                imported += len(rows)
+                session_imported += len(rows)
+                rejected += len(errors)
+                _report_errors(errors, rejected, rejects)
+                rows, errors = [], []
+
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    print(f"Оброблено {position} записів, імпортовано {imported}, "
+                          f"відхилено {rejected} ({session_imported / (now - started):.0f} записів/с)")
+
+        flush(source, rows, position, imported + len(rows), rejected + len(errors))
+        imported += len(rows)
+        session_imported += len(rows)
+        rejected += len(errors)
+        _report_errors(errors, rejected, rejects)
+    except KeyboardInterrupt:
+        saved = conn.execute('SELECT position FROM import_progress WHERE source = ?', (source,)).fetchone()[0]
+        print(f"\nІмпорт перервано. Збережено позицію {saved}; "
+              "запустіть ту саму команду ще раз, щоб продовжити.")
+        sys.exit(1)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Імпортовано {imported} записів, відхилено {rejected}; цей запуск: "
+          f"{session_imported} записів за {elapsed:.1f}с ({session_imported / max(elapsed, 1e-9):.0f} записів/с)")
+    finish(conn, source)
+
+
+# Помилки друкуються (перші MAX_PRINTED_ERRORS) і, якщо задано, пишуться у файл
+def _report_errors(errors, rejected, rejects):
+    printed = rejected - len(errors)
+    for position, error, record in errors:
+        if printed < MAX_PRINTED_ERRORS:
+            print(f"Запис {position} відхилено: {error}")
+            printed += 1
+        if rejects is not None:
+            rejects.write(json.dumps(
+                {'position': position, 'error': error, 'record': record}, ensure_ascii=False, default=str
+            ) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Імпорт історичних записів у базу AlcoMeterBot")
+    parser.add_argument('input', help="файл CSV, JSON або JSON Lines (можна .gz)")
+    parser.add_argument('--format', choices=FORMATS, help="формат файлу (за замовчуванням - за розширенням)")
+    parser.add_argument('--map', action='append', default=[], metavar='КОЛОНКА=ПОЛЕ',
+                        help="назва колонки у файлі для поля drinks (можна кілька разів)")
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help="записів в одній транзакції")
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help="не видаляти індекси на час імпорту (для невеликих файлів)")
+    parser.add_argument('--rejects', help="дописувати відхилені записи у файл JSON Lines")
+    args = parser.parse_args()
+
+    mapping = {}
+    for item in args.map:
+        column, separator, field = item.partition('=')
+        if not separator or not column or not field:
+            parser.error(f"--map: очікується КОЛОНКА=ПОЛЕ, отримано {item!r}")
+        mapping[column] = field
+    if args.batch <= 0:
+        parser.error("--batch: очікується додатне число")
+
+    try:
+        fmt = args.format or detect_format(args.input)
+        run(args.input, fmt, mapping, args.batch, args.keep_indexes, args.rejects)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        db.close_all()
+
+
+if __name__ == '__main__':
+    main()
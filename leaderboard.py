@@ -0,0 +1,189 @@
+from bisect import bisect_left, insort
+from itertools import islice
+
+# Рейтинг користувачів у пам'яті за кількістю чистого спирту.
+# Ключі (-pure_alcohol, user_id) зберігаються у SortedKeys, тому зміна
+# підсумків, позиція користувача і сусід зверху - O(log n), а /top - це
+# перші n ключів.
+
+
+# Відсортований список, розбитий на блоки до 2 * LOAD ключів.
+# Вставка чи видалення зсуває лише один блок, а кількість ключів у блоках
+# перед потрібним рахує дерево Фенвіка над довжинами блоків. Дерево
+# перебудовується лише при поділі чи видаленні блоку (раз на LOAD вставок).
+class SortedKeys:
+    LOAD = 512
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._blocks = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._len = len(keys)
+        self._rebuild()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+    def _rebuild(self):
+        self._maxes = [block[-1] for block in self._blocks]
+        tree = [0] * (len(self._blocks) + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, block_index, delta):
+        i = block_index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    # Кількість ключів у блоках перед block_index
+    def _prefix(self, block_index):
+        total = 0
+        i = block_index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, key):
+        if not self._blocks:
+            self._blocks.append([key])
+            self._len = 1
+            self._rebuild()
+            return
+        i = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[i]
+        insort(block, key)
+        self._maxes[i] = block[-1]
+        self._len += 1
+        if len(block) > 2 * self.LOAD:
+            self._blocks[i:i + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._rebuild()
+        else:
+            self._tree_add(i, 1)
+
+    # Ключ має бути у списку
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        block = self._blocks[i]
+        del block[bisect_left(block, key)]
+        self._len -= 1
+        if block:
+            self._maxes[i] = block[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._blocks[i]
+            self._rebuild()
+
+    # Кількість ключів, менших за key
+    def index(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._blocks):
+            return self._len
+        return self._prefix(i) + bisect_left(self._blocks[i], key)
+
+    # Ключ на позиції index (спуск по дереву Фенвіка до потрібного блоку)
+    def __getitem__(self, index):
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+        block_index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = block_index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                block_index = nxt
+                index -= self._tree[nxt]
+            step >>= 1
+        return self._blocks[block_index][index]
+
+
+class Leaderboard:
+    def __init__(self):
+        self._keys = SortedKeys()  # (-pure_alcohol, user_id)
+        self._entries = {}   # user_id -> [username, approved, volume, pure_alcohol]
+
+    def __len__(self):
+        return len(self._keys)
+
+    # Завантажуємо рейтинг з рядків (user_id, username, approved, volume, pure_alcohol)
+    def load(self, rows):
+        self._entries = {}
+        for user_id, username, approved, volume, pure_alcohol in rows:
+            if approved > 0:
+                self._entries[user_id] = [username, approved, volume, pure_alcohol]
+        self._keys = SortedKeys((-entry[3], user_id) for user_id, entry in self._entries.items())
+
+    # Змінюємо підсумки користувача на вказані дельти
+    def update(self, user_id, username, approved_delta, volume_delta, pure_delta):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = [username, 0, 0, 0.0]
+        else:
+            self._keys.remove((-entry[3], user_id))
+
+        if username:
+            entry[0] = username
+        entry[1] += approved_delta
+        entry[2] += volume_delta
+        entry[3] += pure_delta
+
+        if entry[1] > 0:
+            self._entries[user_id] = entry
+            self._keys.add((-entry[3], user_id))
+        else:
+            self._entries.pop(user_id, None)
+
+    # Враховуємо зміну статусу запису (рядок як повертає aggregates.set_status)
+    def apply_status_change(self, row, status):
+        user_id, username, alcohol_type, volume, proof, old_status = row
+        if status == 'approved':
+            sign = 1
+        elif old_status == 'approved':
+            sign = -1
+        else:
+            return
+        self.update(user_id, username, sign, sign * volume, sign * volume * proof / 100)
+
+    # Перші n користувачів: (user_id, username, volume, pure_alcohol)
+    def top(self, n=10):
+        result = []
+        for _, user_id in islice(self._keys, n):
+            username, _, volume, pure_alcohol = self._entries[user_id]
+            result.append((user_id, username, volume, pure_alcohol))
+        return result
+
+    # Позиція користувача: (місце, pure_alcohol, відставання від попереднього,
+    # username попереднього, всього користувачів) або None
+    def rank(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        index = self._keys.index((-entry[3], user_id))
+        gap, ahead_username = 0.0, None
+        if index > 0:
+            ahead_pure, ahead_id = self._keys[index - 1]
+            gap = -ahead_pure - entry[3]
+            ahead_username = self._entries[ahead_id][0]
+        return index + 1, entry[3], gap, ahead_username, len(self._keys)
+
+    # Порівнюємо рейтинг з рядками з бази; повертаємо список user_id з розбіжностями
+    def find_drift(self, rows, tolerance=0.01):
+        expected = {}
+        for user_id, username, approved, volume, pure_alcohol in rows:
+            if approved > 0:
+                expected[user_id] = (approved, volume, pure_alcohol)
+
+        drift = [user_id for user_id in self._entries if user_id not in expected]
+        for user_id, (approved, volume, pure_alcohol) in expected.items():
+            entry = self._entries.get(user_id)
+            if (entry is None or entry[1] != approved or entry[2] != volume
+                    or abs(entry[3] - pure_alcohol) > tolerance):
+                drift.append(user_id)
+        return drift
@@ -0,0 +1,189 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+
+# Метрики роботи бота в пам'яті: гістограми затримок, лічильники помилок
+# і показники (gauge), які обчислюються лише під час зчитування.
+# Запис метрики - це пошук кошика бінарним пошуком і кілька додавань у
+# потоці event loop, тому інструментацію можна не вимикати.
+# Дані віддаються у форматі Prometheus через локальний HTTP-сервер і /metrics.
+
+# Межі кошиків гістограм (секунди)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Межі кошиків для розмірів пакетів
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+HANDLER_SECONDS = 'alcometerbot_handler_seconds'
+HANDLER_ERRORS = 'alcometerbot_handler_errors_total'
+DB_SECONDS = 'alcometerbot_db_seconds'
+DB_ERRORS = 'alcometerbot_db_errors_total'
+DB_WRITE_BATCH_SIZE = 'alcometerbot_db_write_batch_size'
+DB_WRITE_FLUSH_SECONDS = 'alcometerbot_db_write_flush_seconds'
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # останній кошик - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Оцінка квантиля: верхня межа кошика, в який він потрапляє
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class Registry:
+    def __init__(self):
+        self.help = {}
+        self.buckets = {}     # назва -> межі кошиків, якщо не BUCKETS
+        self.histograms = {}  # назва -> {мітки: Histogram}
+        self.counters = {}    # назва -> {мітки: значення}
+        self.gauges = {}      # назва -> функція, що повертає число або {мітки: число}
+
+    def describe(self, name, help_text, buckets=None):
+        self.help[name] = help_text
+        if buckets is not None:
+            self.buckets[name] = buckets
+
+    # Мітки - кортеж пар (ключ, значення)
+    def observe(self, name, labels, value):
+        series = self.histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(self.buckets.get(name, BUCKETS))
+        histogram.observe(value)
+
+    def inc(self, name, labels=(), amount=1):
+        series = self.counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + amount
+
+    # Функція викликається при кожному зчитуванні (може бути async)
+    def gauge(self, name, help_text, fn):
+        self.help[name] = help_text
+        self.gauges[name] = fn
+
+    async def collect_gauges(self):
+        values = {}
+        for name, fn in self.gauges.items():
+            try:
+                value = fn()
+                if asyncio.iscoroutine(value):
+                    value = await value
+            except Exception as e:
+                print(f"Помилка при зчитуванні метрики {name}: {e}")
+                continue
+            values[name] = value if isinstance(value, dict) else {(): value}
+        return values
+
+    # Текстовий формат Prometheus
+    async def render(self):
+        lines = []
+        for name, series in self.histograms.items():
+            self._header(lines, name, 'histogram')
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for name, series in self.counters.items():
+            self._header(lines, name, 'counter')
+            for labels, value in series.items():
+                lines.append(f"{name}{_labels(labels)} {value}")
+        for name, series in (await self.collect_gauges()).items():
+            self._header(lines, name, 'gauge')
+            for labels, value in series.items():
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, name, kind):
+        if name in self.help:
+            lines.append(f"# HELP {name} {self.help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+registry.describe(HANDLER_SECONDS, "Час обробки оновлення Telegram, секунди")
+registry.describe(HANDLER_ERRORS, "Кількість необроблених помилок в обробниках")
+registry.describe(DB_SECONDS, "Час запиту до бази з урахуванням черги пулу, секунди")
+registry.describe(DB_ERRORS, "Кількість помилок запитів до бази")
+registry.describe(DB_WRITE_BATCH_SIZE, "Кількість записів в одному груповому коміті", SIZE_BUCKETS)
+registry.describe(DB_WRITE_FLUSH_SECONDS, "Час виконання і коміту пакета записів, секунди")
+
+observe = registry.observe
+inc = registry.inc
+gauge = registry.gauge
+
+
+# Декоратор для async-обробників: час виконання і кількість помилок
+def timed(handler_name):
+    labels = (('handler', handler_name),)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                registry.inc(HANDLER_ERRORS, labels)
+                raise
+            finally:
+                registry.observe(HANDLER_SECONDS, labels, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# Локальний HTTP-сервер для Prometheus: GET /metrics
+async def serve(host, port):
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # заголовки не потрібні
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', (await registry.render()).encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except Exception as e:
+            print(f"Помилка при віддачі метрик: {e}")
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
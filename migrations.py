@@ -0,0 +1,155 @@
+import aggregates
+import chats
+import sessions
+import violations
+
+# Версійні міграції схеми бази даних.
+# Поточна версія схеми зберігається в PRAGMA user_version, тому при старті
+# застосовуються лише ті міграції, яких ще немає в базі.
+
+# Міграція 1: початкова схема (для існуючих баз нічого не змінює)
+_INITIAL_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS drinks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        alcohol_type TEXT,
+        subtype TEXT,
+        volume INTEGER,
+        proof REAL,
+        video_file_id TEXT,
+        status TEXT DEFAULT 'pending',
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS violations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        violation_type TEXT,
+        ban_duration INTEGER,  -- тривалість бану в годинах
+        ban_until DATETIME,    -- час до якого діє бан
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS alcohol_suggestions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        name TEXT,
+        strength REAL,
+        subtypes TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+)
+
+# Міграція 2: індекси під основні запити.
+# Підсумки користувачів читаються з user_totals (міграція 3), тому покривні
+# індекси drinks не потрібні: кожен з них оновлювався б при кожному записі.
+_DRINKS_INDEXES = (
+    # Записи користувача (/stats, /history)
+    '''
+    CREATE INDEX IF NOT EXISTS idx_drinks_user_id
+    ON drinks (user_id)
+    ''',
+    # Перевірка активного бану
+    '''
+    CREATE INDEX IF NOT EXISTS idx_violations_user_ban_until
+    ON violations (user_id, ban_until)
+    ''',
+    "ANALYZE",
+)
+
+# Міграція 4: індекси для keyset-пагінації /history по (user_id, id).
+# rowid неявно додається в кінець кожного індексу, тому сортування по id
+# всередині user_id (і фільтрів) не потребує окремого сортування.
+_HISTORY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_drinks_user_status_id ON drinks (user_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_drinks_user_type_id ON drinks (user_id, alcohol_type)",
+    "CREATE INDEX IF NOT EXISTS idx_drinks_user_status_type_id ON drinks (user_id, status, alcohol_type)",
+)
+
+# Міграція 5: результати розсилки нових заявок адміністраторам
+_ADMIN_DELIVERIES = (
+    '''
+    CREATE TABLE IF NOT EXISTS admin_deliveries (
+        drink_id INTEGER NOT NULL,
+        admin_id INTEGER NOT NULL,
+        status TEXT NOT NULL,  -- sent / paused / failed
+        error TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (drink_id, admin_id)
+    ) WITHOUT ROWID
+    ''',
+)
+
+# Міграція 6: черга заявок на розгляд (/requests), сортується по id (status, rowid)
+_PENDING_QUEUE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_drinks_status_id ON drinks (status)",
+)
+
+# Міграція 11: стан офлайн-імпорту import_drinks.py (для продовження після переривання)
+_IMPORT_PROGRESS = (
+    '''
+    CREATE TABLE IF NOT EXISTS import_progress (
+        source TEXT PRIMARY KEY,              -- абсолютний шлях до файлу
+        size INTEGER NOT NULL,                -- розмір файлу для перевірки при продовженні
+        position INTEGER NOT NULL DEFAULT 0,  -- оброблено записів з файлу
+        imported INTEGER NOT NULL DEFAULT 0,
+        rejected INTEGER NOT NULL DEFAULT 0,
+        deferred_indexes TEXT,                -- JSON-список CREATE INDEX, видалених на час імпорту
+        started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        finished_at DATETIME
+    )
+    ''',
+)
+
+# Список міграцій: (версія, опис, кроки).
+# Крок - це SQL-рядок або функція, яка приймає з'єднання.
+MIGRATIONS = (
+    (1, "початкова схема", _INITIAL_SCHEMA),
+    (2, "індекси для drinks і violations", _DRINKS_INDEXES),
+    (3, "агреговані підсумки user_totals", aggregates.SCHEMA + (aggregates.rebuild,)),
+    (4, "індекси для пагінації історії", _HISTORY_INDEXES),
+    (5, "журнал розсилки заявок адміністраторам", _ADMIN_DELIVERIES),
+    (6, "індекс черги заявок по id", _PENDING_QUEUE_INDEX),
+    (7, "збережені сесії додавання запису", sessions.SCHEMA),
+    (8, "стан порушень user_violations", violations.SCHEMA + (violations.rebuild,)),
+    (9, "щоденні підсумки user_daily_totals і period_totals",
+     aggregates.ROLLUP_SCHEMA + (aggregates.rebuild_rollups,)),
+    (10, "рейтинги групових чатів chat_totals", chats.SCHEMA),
+    (11, "стан імпорту import_progress", _IMPORT_PROGRESS),
+)
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Застосовуємо всі нові міграції; кожна виконується в окремій транзакції
+def migrate(conn, migrations=MIGRATIONS):
+    if conn.in_transaction:
+        conn.commit()
+    current = get_version(conn)
+    for version, description, steps in migrations:
+        if version <= current:
+            continue
+        print(f"Застосовуємо міграцію {version}: {description}")
+        conn.execute("BEGIN")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        current = version
+    return current
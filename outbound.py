@@ -0,0 +1,168 @@
+import asyncio
+import itertools
+import time
+from pyrogram.errors import FloodWait
+
+# Глобальна черга вихідних повідомлень.
+# Усі client.send_* проходять через неї: загальний і окремий для кожного чату
+# token bucket, повтор після FloodWait і пріоритетні смуги.
+
+# Пріоритети (менше число - вищий пріоритет)
+PRIORITY_USER = 0      # відповіді та підтвердження користувачам
+PRIORITY_ADMIN = 1     # нові заявки для адміністраторів
+PRIORITY_BACKLOG = 2   # масове відправлення черги заявок (/requests)
+
+PRIORITY_NAMES = {
+    PRIORITY_USER: 'user',
+    PRIORITY_ADMIN: 'admin',
+    PRIORITY_BACKLOG: 'backlog',
+}
+
+# Скільки бакетів чатів тримати, перш ніж прибирати неактивні
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    # Скільки секунд чекати до наступного токена (0 - токен взято одразу)
+    def reserve(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class Outbound:
+    def __init__(self, global_rate=25, chat_rate=1, chat_burst=3, workers=4, max_retries=3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.workers_count = workers
+        self.max_retries = max_retries
+        self.queue = None
+        self.workers = []
+        self.sequence = itertools.count()
+        self.pending_by_priority = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.counters = {
+            'sent': 0,
+            'failed': 0,
+            'retries': 0,
+            'flood_waits': 0,
+            'flood_wait_seconds': 0,
+        }
+        self.max_queue_delay = 0.0
+
+    # Запускаємо воркерів (у поточному event loop)
+    def start(self):
+        if self.workers and not all(worker.done() for worker in self.workers):
+            return
+        self.queue = asyncio.PriorityQueue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    # Ставимо виклик method(**kwargs) у чергу; повертаємо future з результатом
+    def submit(self, method, priority=PRIORITY_USER, **kwargs):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.pending_by_priority[priority] += 1
+        self.queue.put_nowait((priority, next(self.sequence), time.monotonic(), method, kwargs, future))
+        return future
+
+    # Відправляємо і чекаємо результат (помилки передаються викликачу)
+    async def send(self, method, priority=PRIORITY_USER, **kwargs):
+        return await self.submit(method, priority, **kwargs)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._prune_buckets()
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    # Прибираємо бакети чатів, які вже повністю відновились
+    def _prune_buckets(self):
+        now = time.monotonic()
+        full_after = self.chat_burst / self.chat_rate
+        for chat_id in [chat_id for chat_id, bucket in self.chat_buckets.items()
+                        if now - bucket.updated > full_after]:
+            del self.chat_buckets[chat_id]
+
+    # Чекаємо на токени глобального ліміту і ліміту чату
+    async def _acquire(self, chat_id):
+        now = time.monotonic()
+        delay = self.global_bucket.reserve(now)
+        if chat_id is not None:
+            delay = max(delay, self._chat_bucket(chat_id).reserve(now))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            priority, _, queued_at, method, kwargs, future = await self.queue.get()
+            self.pending_by_priority[priority] -= 1
+            self.max_queue_delay = max(self.max_queue_delay, time.monotonic() - queued_at)
+            try:
+                if not future.cancelled():
+                    await self._deliver(method, kwargs, future)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, method, kwargs, future):
+        chat_id = kwargs.get('chat_id')
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                result = await method(**kwargs)
+            except FloodWait as e:
+                self.counters['flood_waits'] += 1
+                self.counters['flood_wait_seconds'] += e.value
+                if attempt >= self.max_retries:
+                    self._fail(future, e, chat_id)
+                    return
+                attempt += 1
+                self.counters['retries'] += 1
+                await asyncio.sleep(e.value)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._fail(future, e, chat_id)
+                return
+            else:
+                self.counters['sent'] += 1
+                if not future.done():
+                    future.set_result(result)
+                return
+
+    def _fail(self, future, error, chat_id):
+        self.counters['failed'] += 1
+        print(f"Помилка при надсиланні повідомлення в чат {chat_id}: {error}")
+        if not future.done():
+            future.set_exception(error)
+
+    # Метрики черги для моніторингу
+    def stats(self):
+        stats = dict(self.counters)
+        stats['queue_depth'] = self.queue.qsize() if self.queue is not None else 0
+        for priority, name in PRIORITY_NAMES.items():
+            stats[f'queue_{name}'] = self.pending_by_priority[priority]
+        stats['max_queue_delay'] = round(self.max_queue_delay, 3)
+        stats['chat_buckets'] = len(self.chat_buckets)
+        return stats
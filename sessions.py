@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+import database as db
+from expiry import ExpiryHeap
+
+# Сесії додавання запису (/add) з обмеженим часом життя.
+# Кожна сесія має свій термін дії; прострочені сесії прибираються фоновою
+# задачею по купі термінів (expiry.ExpiryHeap), а при переповненні витісняється найстаріша (LRU).
+# Зміни сесій пачками записуються в таблицю sessions, тому після перезапуску
+# користувач продовжує з того ж кроку. Збережені сесії завантажуються ліниво,
+# при першому зверненні користувача, тому старт не залежить від їх кількості.
+
+DEFAULT_TTL = 300          # 5 хвилин
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,       -- JSON з полями Session
+        expires_at REAL NOT NULL  -- unix-час закінчення сесії
+    )
+    ''',
+)
+
+
+class Session:
+    __slots__ = (
+        'user_id', 'username', 'waiting_for_video', 'file_id', 'is_video_note',
+        'alcohol_type', 'subtype', 'proof', 'volume', 'waiting_for_volume',
+        'expires_at'
+    )
+
+    def __init__(self, user_id, username):
+        self.user_id = user_id
+        self.username = username
+        self.waiting_for_video = True
+        self.file_id = None
+        self.is_video_note = True
+        self.alcohol_type = None
+        self.subtype = None
+        self.proof = None
+        self.volume = None
+        self.waiting_for_volume = False
+        self.expires_at = 0.0
+
+    # Дані сесії для відправлення адмінам і збереження на диск
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'expires_at'}
+
+    @classmethod
+    def from_dict(cls, data, expires_at):
+        session = cls(data['user_id'], data['username'])
+        for name, value in data.items():
+            if name in cls.__slots__:
+                setattr(session, name, value)
+        session.expires_at = expires_at
+        return session
+
+
+class SessionStore:
+    def __init__(self, ttl=DEFAULT_TTL, max_sessions=DEFAULT_MAX_SESSIONS, persist=False,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.persist = persist
+        self.flush_interval = flush_interval
+        self._sessions = OrderedDict()
+        self._expiry = ExpiryHeap(lambda expires_at: expires_at - time.time())
+        # Зміни, які ще не записані на диск
+        self._dirty = set()
+        self._removed = set()
+        # Користувачі, для яких уже перевірили збережену сесію
+        # (потрібні лише до _disk_cutoff, потім множина порожня)
+        self._checked = set()
+        # Після цього часу на диску не лишиться живих сесій з минулого запуску
+        self._disk_cutoff = time.time() + ttl
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    # Активна сесія користувача або None (прострочена сесія одразу видаляється)
+    def get(self, user_id):
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        if session.expires_at <= time.time():
+            self._remove(user_id)
+            return None
+        return session
+
+    # Як get(), але за відсутності в пам'яті шукаємо сесію, збережену до перезапуску
+    async def load(self, user_id):
+        session = self.get(user_id)
+        if session is not None or not self._may_be_on_disk(user_id):
+            return session
+        self._mark_checked(user_id)
+        row = await db.query_one(
+            'SELECT data, expires_at FROM sessions WHERE user_id = ?', (user_id,)
+        )
+        if row is None or row[1] <= time.time() or user_id in self._sessions:
+            return self.get(user_id)
+        session = Session.from_dict(json.loads(row[0]), row[1])
+        self._insert(session)
+        return session
+
+    # Після _disk_cutoff на диску немає сесій з минулого запуску, тому
+    # перевірених користувачів більше не запам'ятовуємо
+    def _mark_checked(self, user_id):
+        if time.time() < self._disk_cutoff:
+            self._checked.add(user_id)
+        elif self._checked:
+            self._checked = set()
+
+    def _may_be_on_disk(self, user_id):
+        return (self.persist and user_id not in self._checked
+                and user_id not in self._removed and time.time() < self._disk_cutoff)
+
+    def create(self, user_id, username):
+        self._remove(user_id)
+        session = Session(user_id, username)
+        self._insert(session)
+        self.touch(session)
+        return session
+
+    def _insert(self, session):
+        while len(self._sessions) >= self.max_sessions:
+            oldest_id = next(iter(self._sessions))
+            self._remove(oldest_id)
+        self._sessions[session.user_id] = session
+        self._mark_checked(session.user_id)
+        self._expiry.push(session.expires_at, session.user_id)
+
+    # Продовжуємо термін дії сесії після дії користувача і позначаємо її
+    # для запису на диск (викликати після зміни полів сесії).
+    # Сесію, яку вже закрили, витіснили чи прибрали, поки обробник чекав,
+    # не чіпаємо
+    def touch(self, session):
+        if self._sessions.get(session.user_id) is not session:
+            return
+        session.expires_at = time.time() + self.ttl
+        self._sessions.move_to_end(session.user_id)
+        self._expiry.push(session.expires_at, session.user_id)
+        if self.persist:
+            self._dirty.add(session.user_id)
+            self._removed.discard(session.user_id)
+        # Старі записи купи видаляються ліниво; не даємо купі рости без меж
+        if len(self._expiry) > 2 * len(self._sessions) + 64:
+            self._expiry.reset((s.expires_at, uid) for uid, s in self._sessions.items())
+
+    def pop(self, user_id):
+        return self._remove(user_id)
+
+    def _remove(self, user_id):
+        session = self._sessions.pop(user_id, None)
+        if session is not None and self.persist:
+            self._dirty.discard(user_id)
+            self._removed.add(user_id)
+        return session
+
+    # Видаляємо всі прострочені сесії; повертаємо їх кількість
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        removed = 0
+        for expires_at, user_id in self._expiry.pop_due(now):
+            session = self._sessions.get(user_id)
+            # Запис купи застарів, якщо сесію продовжили або створили заново
+            if session is not None and session.expires_at == expires_at:
+                self._remove(user_id)
+                removed += 1
+        return removed
+
+    # Фонова задача: прокидаємось до найближчого терміну дії
+    async def run_sweeper(self, max_interval=60):
+        async def expire():
+            self.sweep()
+        await self._expiry.run(expire, max_interval)
+
+    # Записуємо накопичені зміни однією транзакцією
+    async def flush(self):
+        if not self._dirty and not self._removed:
+            return
+        upserts = [
+            (user_id, json.dumps(session.to_dict(), ensure_ascii=False), session.expires_at)
+            for user_id, session in ((uid, self._sessions.get(uid)) for uid in self._dirty)
+            if session is not None
+        ]
+        deletes = [(user_id,) for user_id in self._removed]
+        self._dirty = set()
+        self._removed = set()
+        await db.run_write(_write_sessions, upserts, deletes)
+
+    # Фонова задача: періодично скидаємо зміни на диск
+    async def run_flusher(self):
+        purged = False
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                # Після закінчення TTL прибираємо всі прострочені сесії з диска
+                if not purged and time.time() >= self._disk_cutoff:
+                    await db.run_write(_purge_expired_sessions, time.time())
+                    self._checked = set()
+                    purged = True
+            except Exception as e:
+                print(f"Помилка при збереженні сесій: {e}")
+
+
+def _write_sessions(conn, upserts, deletes):
+    if deletes:
+        conn.executemany('DELETE FROM sessions WHERE user_id = ?', deletes)
+    if upserts:
+        conn.executemany('''
+            INSERT INTO sessions (user_id, data, expires_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                data = excluded.data,
+                expires_at = excluded.expires_at
+        ''', upserts)
+
+
+def _purge_expired_sessions(conn, now):
+    conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
@@ -0,0 +1,189 @@
+import re
+import sqlite3
+import threading
+import time
+
+# Журнал повільних запитів SQLite (вмикається в config.yml).
+# З'єднання створюються з ProfiledConnection: кожен execute() і вибірка
+# рядків з курсора вимірюються, а запит, що перевищив поріг, записується разом
+# з нормалізованим текстом, типами параметрів і EXPLAIN QUERY PLAN.
+# План знімається один раз для кожного нормалізованого запиту.
+
+DEFAULT_THRESHOLD_MS = 50
+DEFAULT_TOP = 10
+DEFAULT_WINDOW = 86400  # звіт за останню добу
+MAX_ENTRIES = 500
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+# Текст запиту без зайвих пробілів і з літералами, заміненими на ?
+def normalize(sql):
+    return _WHITESPACE.sub(' ', _LITERALS.sub('?', sql)).strip()
+
+
+# Типи параметрів: "int, str, None" або "user_id: int" для іменованих
+def parameter_shape(parameters):
+    if isinstance(parameters, dict):
+        return ', '.join(f"{key}: {_type_name(value)}" for key, value in parameters.items())
+    return ', '.join(_type_name(value) for value in parameters)
+
+
+def _type_name(value):
+    return 'None' if value is None else type(value).__name__
+
+
+class SlowQuery:
+    __slots__ = ('sql', 'shape', 'count', 'total', 'max', 'last_seen', 'plan', 'full_scan')
+
+    def __init__(self, sql, shape, plan):
+        self.sql = sql
+        self.shape = shape
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+        self.plan = plan
+        self.full_scan = has_full_scan(plan)
+
+
+# Чи є в плані повний прохід таблиці: SCAN без індексу, не по підзапиту
+def has_full_scan(plan):
+    details = [line.strip() for line in plan]
+    subqueries = {
+        detail.split()[1] for detail in details
+        if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    for detail in details:
+        words = detail.split()
+        if (len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words
+                and not words[1].startswith('(') and words[1] not in subqueries
+                and detail != 'SCAN CONSTANT ROW'):
+            return True
+    return False
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, top=DEFAULT_TOP, window=DEFAULT_WINDOW):
+        self.threshold = threshold_ms / 1000
+        self.top = top
+        self.window = window
+        self._entries = {}  # нормалізований текст -> SlowQuery
+        self._lock = threading.Lock()  # запити виконуються в різних потоках пулу
+
+    def record(self, conn, sql, parameters, elapsed):
+        key = normalize(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            shape = parameter_shape(parameters) if parameters is not None else 'executemany'
+            entry = SlowQuery(key, shape, self._explain(conn, sql, parameters))
+            print(f"Повільний запит {elapsed * 1000:.1f}мс [{shape}]: {key}")
+            for line in entry.plan:
+                print(f"  {line}")
+            with self._lock:
+                entry = self._entries.setdefault(key, entry)
+                if len(self._entries) > MAX_ENTRIES:
+                    self._evict()
+        else:
+            print(f"Повільний запит {elapsed * 1000:.1f}мс: {key}")
+        with self._lock:
+            entry.count += 1
+            entry.total += elapsed
+            entry.max = max(entry.max, elapsed)
+            entry.last_seen = time.time()
+
+    # Видаляємо запит, який найдовше не повторювався
+    def _evict(self):
+        oldest = min(self._entries, key=lambda key: self._entries[key].last_seen)
+        del self._entries[oldest]
+
+    def _explain(self, conn, sql, parameters):
+        # Для executemany план однаковий для всіх рядків, тому підставляємо NULL
+        if parameters is None:
+            parameters = (None,) * sql.count('?')
+        try:
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return [f"EXPLAIN недоступний: {e}"]
+        # Рядки (id, parent, notused, detail); відступ за глибиною вкладеності
+        depth = {0: -1}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append('  ' * depth[node_id] + detail)
+        return plan
+
+    # Найповільніші запити за вікно: список SlowQuery за спаданням max
+    def report(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if now - entry.last_seen > self.window]:
+                del self._entries[key]
+            entries = list(self._entries.values())
+        entries.sort(key=lambda entry: entry.max, reverse=True)
+        return entries[:self.top]
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        self._profile_sql = sql
+        self._profile_parameters = parameters
+        self._profile_elapsed = 0.0
+        self._profile_reported = False
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._account(time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._profile_sql = sql
+        self._profile_parameters = None
+        self._profile_elapsed = 0.0
+        self._profile_reported = False
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._account(time.perf_counter() - started)
+        return self
+
+    # Час вибірки рядків теж належить запиту
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(time.perf_counter() - started)
+        return rows
+
+    def _account(self, elapsed):
+        if not hasattr(self, '_profile_sql'):
+            return
+        self._profile_elapsed += elapsed
+        log = self.connection.slow_log
+        if not self._profile_reported and self._profile_elapsed >= log.threshold:
+            self._profile_reported = True
+            log.record(self.connection, self._profile_sql, self._profile_parameters, self._profile_elapsed)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    slow_log = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,44 @@
+import os
+import sys
+import pytest
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database as db
+import migrations
+
+
+# Конфігурація з config.yml репозиторію (каталог алкоголю як у продакшені)
+@pytest.fixture(scope='session')
+def config():
+    with open(os.path.join(ROOT, 'config.yml'), 'r', encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+
+# Нова база з усіма міграціями; з'єднання поточного потоку
+@pytest.fixture
+def conn(tmp_path):
+    db.configure(str(tmp_path / 'test.db'))
+    connection = db.get_connection()
+    migrations.migrate(connection)
+    yield connection
+    db.shutdown()
+
+
+# Модуль bot з тимчасовою конфігурацією (імпортується один раз на сесію)
+@pytest.fixture(scope='session')
+def bot(config, tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('bot')
+    config = dict(config)
+    config['bot'] = dict(config['bot'], api_id=1, api_hash='test', bot_token='0:test', admin_ids=[1])
+    config['database'] = {'path': str(data_dir / 'bot.db')}
+    config['sessions'] = {'persist': False}
+    config['reload'] = {'watch_interval': 0}
+    path = data_dir / 'config.yml'
+    with open(path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(config, file, allow_unicode=True, sort_keys=False)
+    os.environ['ALCOMETERBOT_CONFIG'] = str(path)
+    import bot
+    return bot
@@ -0,0 +1,116 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+import aggregates
+import chats
+
+TABLES = {
+    'user_totals': 'SELECT * FROM user_totals ORDER BY user_id',
+    'user_type_totals': 'SELECT * FROM user_type_totals ORDER BY user_id, alcohol_type',
+    'user_daily_totals': 'SELECT * FROM user_daily_totals ORDER BY user_id, day, alcohol_type',
+    'period_totals': 'SELECT * FROM period_totals ORDER BY period, user_id',
+    'chat_totals': 'SELECT chat_id, user_id, approved, volume, pure_alcohol FROM chat_totals ORDER BY chat_id, user_id',
+}
+
+DRINK_TYPES = [('beer', 500, 4.5), ('wine', 150, 12.5), ('vodka', 50, 40.0), ('cider', 330, 5.3)]
+# Початок на межі років: 2020-12-31 і 2021-01-03 належать до тижня 2020-W53
+START = datetime(2020, 12, 28, 21, 0, 0)
+
+
+def snapshot(conn):
+    return {
+        name: [tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+               for row in conn.execute(query)]
+        for name, query in TABLES.items()
+    }
+
+
+def rebuild_all(conn):
+    aggregates.rebuild(conn)
+    aggregates.rebuild_rollups(conn)
+    chats.rebuild(conn)
+
+
+def add_drink(conn, user_id, username, alcohol_type, volume, proof, timestamp):
+    record_id = conn.execute('''
+        INSERT INTO drinks (user_id, username, alcohol_type, subtype, volume, proof, video_file_id, timestamp)
+        VALUES (?, ?, ?, NULL, ?, ?, 'video', ?)
+    ''', (user_id, username, alcohol_type, volume, proof, timestamp)).lastrowid
+    aggregates.record_added(conn, user_id, username, alcohol_type)
+    return record_id
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_totals_match_rebuild(conn, seed):
+    rng = random.Random(seed)
+    record_ids = []
+    with conn:
+        for user_id in range(1, 6):
+            if user_id % 2:
+                chats.join(conn, -100, user_id)
+        for _ in range(300):
+            user_id = rng.randint(1, 8)
+            alcohol_type, volume, proof = rng.choice(DRINK_TYPES)
+            timestamp = START + timedelta(hours=rng.randint(0, 24 * 45), seconds=rng.randint(0, 3599))
+            record_ids.append(add_drink(
+                conn, user_id, f"user{user_id}_{rng.randint(0, 2)}", alcohol_type,
+                rng.choice([volume, volume * 2, 1]), proof, timestamp.strftime('%Y-%m-%d %H:%M:%S')
+            ))
+            # Затвердження, відхилення і повернення (approved -> rejected -> approved)
+            for _ in range(rng.randint(0, 3)):
+                aggregates.set_status(conn, rng.choice(record_ids), rng.choice(['approved', 'rejected', 'pending']))
+            # Вступ у чат посеред історії копіює поточні підсумки
+            if rng.random() < 0.05:
+                chats.join(conn, rng.choice([-100, -200]), user_id)
+
+    incremental = snapshot(conn)
+    assert incremental['user_daily_totals'], 'тест має затверджувати записи'
+    with conn:
+        rebuild_all(conn)
+    assert snapshot(conn) == incremental
+
+
+def test_reversal_restores_previous_totals(conn):
+    with conn:
+        chats.join(conn, -100, 1)
+        kept = add_drink(conn, 1, 'user1', 'beer', 500, 4.5, '2024-02-05 10:00:00')
+        reversed_id = add_drink(conn, 1, 'user1', 'vodka', 50, 40.0, '2024-03-01 23:30:00')
+        aggregates.set_status(conn, kept, 'approved')
+    before = snapshot(conn)
+
+    with conn:
+        aggregates.set_status(conn, reversed_id, 'approved')
+    approved = snapshot(conn)
+    assert approved['user_totals'][0][3:] == (2, 550, 42.5)
+    assert ('2024-03', 1, 1, 50, 20.0) in approved['period_totals']
+    assert approved['chat_totals'] == [(-100, 1, 2, 550, 42.5)]
+
+    with conn:
+        aggregates.set_status(conn, reversed_id, 'rejected')
+    # Порожні денні й періодні рядки видаляються, як і при перерахунку
+    assert snapshot(conn) == before
+    assert not any(row[0] in ('2024-03', '2024-W09') for row in before['period_totals'])
+
+    with conn:
+        rebuild_all(conn)
+    assert snapshot(conn) == before
+
+
+def test_set_status_compare_and_set(conn):
+    with conn:
+        record_id = add_drink(conn, 1, 'user1', 'beer', 500, 4.5, '2024-02-05 10:00:00')
+        assert aggregates.set_status(conn, record_id, 'approved', expected_status='pending') is not None
+        # Повторне натискання: статус уже змінено, підсумки не подвоюються
+        assert aggregates.set_status(conn, record_id, 'approved', expected_status='pending') is None
+        assert aggregates.set_status(conn, record_id, 'approved') is None
+    assert conn.execute('SELECT approved FROM user_totals WHERE user_id = 1').fetchone()[0] == 1
+
+
+@pytest.mark.parametrize('day, week, month', [
+    (date(2021, 1, 3), '2020-W53', '2021-01'),
+    (date(2024, 12, 30), '2025-W01', '2024-12'),
+    (date(2024, 2, 29), '2024-W09', '2024-02'),
+])
+def test_period_keys(day, week, month):
+    assert aggregates.week_key(day) == week
+    assert aggregates.month_key(day) == month
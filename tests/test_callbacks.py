@@ -0,0 +1,114 @@
+import random
+import pytest
+import callbacks
+from catalogue import Catalogue
+
+# Найбільший rowid у SQLite
+MAX_ROWID = 2 ** 63 - 1
+
+
+def _buttons(markup):
+    for row in markup.inline_keyboard:
+        yield from row
+
+
+def test_round_trip_random_payloads():
+    rnd = random.Random(16)
+    ops = list(callbacks.OPCODES)
+    for _ in range(5000):
+        op = rnd.choice(ops)
+        args = tuple(
+            rnd.choice((0, 1, 127, 128, 16383, 16384, rnd.getrandbits(rnd.randint(1, 63))))
+            for _ in range(callbacks.OPCODES[op])
+        )
+        data = callbacks.encode(op, *args)
+        assert len(data.encode('utf-8')) <= callbacks.MAX_CALLBACK_DATA
+        assert callbacks.decode(data) == (op, args)
+
+
+def test_history_with_max_varints_fits():
+    args = (MAX_ROWID,) * callbacks.OPCODES[callbacks.OP_HISTORY]
+    data = callbacks.encode(callbacks.OP_HISTORY, *args)
+    assert len(data.encode('utf-8')) <= callbacks.MAX_CALLBACK_DATA
+    assert callbacks.decode(data) == (callbacks.OP_HISTORY, args)
+
+
+def test_encode_rejects_oversized_and_invalid_arguments():
+    with pytest.raises(ValueError):
+        callbacks.encode(callbacks.OP_HISTORY, *(2 ** 120,) * 4)
+    with pytest.raises(ValueError):
+        callbacks.encode(callbacks.OP_APPROVE)
+    with pytest.raises(ValueError):
+        callbacks.encode(callbacks.OP_APPROVE, -1)
+    with pytest.raises(ValueError):
+        callbacks.encode('?')
+
+
+@pytest.mark.parametrize('data', ['', '1', '2a', '1?', '1a!!', '1a', '1s' + 'gA', 'approve_1'])
+def test_decode_rejects_foreign_and_corrupted_data(data):
+    assert callbacks.decode(data) is None
+
+
+def test_catalogue_buttons_fit_limit(config):
+    catalogue = Catalogue(config['alcohol_types'])
+    assert any(
+        any(ord(char) > 127 for char in subtype)
+        for alcohol_type in catalogue.types for subtype in alcohol_type.subtypes
+    )
+    markups = [catalogue.type_keyboard]
+    for alcohol_type in catalogue.types:
+        markups += [alcohol_type.subtype_keyboard, alcohol_type.volume_keyboard]
+    for markup in markups:
+        for button in _buttons(markup):
+            assert len(button.callback_data.encode('utf-8')) <= callbacks.MAX_CALLBACK_DATA
+            assert callbacks.decode(button.callback_data) is not None
+
+
+# Довгі кириличні назви не впливають на довжину callback_data
+def test_long_cyrillic_subtypes_fit_limit():
+    subtypes = [f"Дуже довгий український підтип напою номер {i}" for i in range(300)]
+    catalogue = Catalogue({
+        'самогон': {'name': 'Самогон', 'strength': 45, 'default_volume': 50, 'subtypes': subtypes},
+    })
+    alcohol_type = catalogue.get('самогон')
+    buttons = list(_buttons(alcohol_type.subtype_keyboard))
+    assert len(buttons) == len(subtypes)
+    for subtype_id, button in enumerate(buttons):
+        assert len(button.callback_data.encode('utf-8')) <= callbacks.MAX_CALLBACK_DATA
+        assert callbacks.decode(button.callback_data) == (callbacks.OP_SUBTYPE, (alcohol_type.id, subtype_id))
+
+
+def test_history_buttons_fit_limit(bot):
+    last_type = bot.settings.catalogue.types[-1].key
+    for direction in bot.HISTORY_DIRECTIONS:
+        for status in bot.HISTORY_STATUSES:
+            data = bot._history_callback(direction, MAX_ROWID, status, last_type)
+            assert len(data.encode('utf-8')) <= callbacks.MAX_CALLBACK_DATA
+
+
+def test_decode_legacy_callbacks(bot):
+    catalogue = bot.settings.catalogue
+    first = catalogue.types[0]
+    cases = {
+        'toggle_pause': (callbacks.OP_TOGGLE_PAUSE, ()),
+        'approve_5_500': (bot.OP_LEGACY_APPROVE, (5, 500)),
+        'reject_5_500': (bot.OP_LEGACY_REJECT, (5, 500)),
+        f'alcohol_{first.key}': (callbacks.OP_ALCOHOL, (first.id,)),
+        'volume_custom': (callbacks.OP_VOLUME_CUSTOM, ()),
+        'volume_330': (callbacks.OP_VOLUME, (330,)),
+    }
+    for alcohol_type in catalogue.types:
+        for subtype_id, subtype in enumerate(alcohol_type.subtypes):
+            cases[f'subtype_{alcohol_type.key}_{subtype}'] = (
+                callbacks.OP_SUBTYPE, (alcohol_type.id, subtype_id)
+            )
+    for data, expected in cases.items():
+        assert bot._decode_legacy_callback(data) == expected, data
+
+
+@pytest.mark.parametrize('data', [
+    'alcohol_unknown', 'subtype_unknown_x', 'approve_x', 'approve_7', 'approve_1_2_3',
+    'approve_suggest_1_2', 'rv_a', 'hist_older_1_-_-', 'volume_x', 'garbage',
+])
+def test_decode_legacy_rejects_invalid(bot, data):
+    assert bot._decode_legacy_callback(data) is None
@@ -0,0 +1,60 @@
+import pytest
+import aggregates
+import chats
+
+# (user_id, username, volume, proof): чистий спирт 22.5, 20.0, 20.0, 6.0 мл
+DRINKS = [
+    (1, 'anna', 500, 4.5),
+    (2, 'bohdan', 50, 40.0),
+    (3, 'olena', 200, 10.0),
+    (4, 'taras', 100, 6.0),
+]
+
+
+@pytest.fixture
+def group(conn):
+    with conn:
+        for user_id, username, volume, proof in DRINKS:
+            record_id = conn.execute('''
+                INSERT INTO drinks (user_id, username, alcohol_type, volume, proof, video_file_id, timestamp)
+                VALUES (?, ?, 'beer', ?, ?, 'video', '2024-02-05 10:00:00')
+            ''', (user_id, username, volume, proof)).lastrowid
+            aggregates.record_added(conn, user_id, username, 'beer')
+            aggregates.set_status(conn, record_id, 'approved')
+        # Користувач 4 у іншому чаті, користувач 5 без затверджених записів
+        for user_id in (1, 2, 3, 5):
+            chats.join(conn, -100, user_id)
+        chats.join(conn, -200, 4)
+    return conn
+
+
+def test_join_copies_current_totals(group):
+    assert not chats.join(group, -100, 1)
+    assert group.execute(
+        'SELECT approved, volume, pure_alcohol FROM chat_totals WHERE chat_id = -100 AND user_id = 1'
+    ).fetchone() == (1, 500, 22.5)
+
+
+def test_top_only_contains_chat_members_with_records(group):
+    assert [row[:2] for row in chats.top(group, -100)] == [(1, 'anna'), (2, 'bohdan'), (3, 'olena')]
+    assert [row[0] for row in chats.top(group, -200)] == [4]
+    assert [row[0] for row in chats.top_period(group, -100, '2024-02')] == [1, 2, 3]
+    assert chats.top_period(group, -100, '2024-03') == []
+
+
+def test_rank_breaks_ties_by_user_id(group):
+    assert chats.rank(group, -100, 1) == (1, 22.5, 0.0, None, 3)
+    assert chats.rank(group, -100, 2) == (2, 20.0, 2.5, 'anna', 3)
+    assert chats.rank(group, -100, 3) == (3, 20.0, 0.0, 'bohdan', 3)
+    assert chats.rank(group, -100, 4) is None
+    assert chats.rank(group, -100, 5) is None
+
+
+def test_leave_and_forget(group):
+    with group:
+        chats.leave(group, -100, 1)
+    assert chats.rank(group, -100, 2)[0] == 1
+    with group:
+        assert chats.forget(group, -100) == 3
+    assert chats.top(group, -100) == []
+    assert chats.rebuild(group) == 1
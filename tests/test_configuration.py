@@ -0,0 +1,57 @@
+import asyncio
+import copy
+import pytest
+import yaml
+import configuration
+
+
+def test_appending_types_and_subtypes_keeps_ids(config):
+    new_config = copy.deepcopy(config)
+    first_key = next(iter(new_config['alcohol_types']))
+    new_config['alcohol_types'][first_key]['subtypes'].append('Новий підтип')
+    new_config['alcohol_types']['kvass'] = {
+        'name': 'Квас', 'strength': 1.2, 'default_volume': 500, 'subtypes': ['Хлібний'],
+    }
+    new_config['alcohol_types'][first_key]['name'] = 'Перейменований'
+    assert configuration.catalogue_id_changes(config, new_config) == []
+
+
+def test_removed_or_reordered_types_change_ids(config):
+    keys = list(config['alcohol_types'])
+    reordered = copy.deepcopy(config)
+    reordered['alcohol_types'] = {key: config['alcohol_types'][key] for key in reversed(keys)}
+    assert configuration.catalogue_id_changes(config, reordered)
+
+    removed = copy.deepcopy(config)
+    del removed['alcohol_types'][keys[0]]
+    assert configuration.catalogue_id_changes(config, removed)
+
+
+def test_removed_or_reordered_subtypes_change_ids(config):
+    key = next(iter(config['alcohol_types']))
+    reordered = copy.deepcopy(config)
+    reordered['alcohol_types'][key]['subtypes'].reverse()
+    assert configuration.catalogue_id_changes(config, reordered) == [
+        f"alcohol_types.{key}.subtypes: підтипи видалено або переміщено"
+    ]
+
+    removed = copy.deepcopy(config)
+    removed['alcohol_types'][key]['subtypes'].pop(0)
+    assert configuration.catalogue_id_changes(config, removed)
+
+
+def test_reload_rejects_id_changes(bot, config):
+    old_settings = bot.settings
+    new_config = copy.deepcopy(bot.settings.config)
+    new_config['alcohol_types'] = dict(reversed(list(new_config['alcohol_types'].items())))
+    with open(bot.CONFIG_PATH, 'r', encoding='utf-8') as file:
+        original = file.read()
+    try:
+        with open(bot.CONFIG_PATH, 'w', encoding='utf-8') as file:
+            yaml.safe_dump(new_config, file, allow_unicode=True, sort_keys=False)
+        with pytest.raises(ValueError, match="перезапуску"):
+            asyncio.run(bot.reload_settings())
+        assert bot.settings is old_settings
+    finally:
+        with open(bot.CONFIG_PATH, 'w', encoding='utf-8') as file:
+            file.write(original)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+import database as db
+
+READERS = 4
+DELAY_MS = 100
+
+
+# Навмисно повільне читання: SQL-функція, яка спить у потоці пулу
+def _slow_read(conn, delay_ms):
+    conn.create_function('sleep_ms', 1, lambda ms: time.sleep(ms / 1000) or ms)
+    return conn.execute('SELECT sleep_ms(?)', (delay_ms,)).fetchone()[0]
+
+
+def test_concurrent_reads_do_not_add_up(conn):
+    async def scenario():
+        db.start(read_workers=READERS)
+        # Розігріваємо потоки пулу і їхні з'єднання
+        await asyncio.gather(*(db.run_read(_slow_read, 0) for _ in range(READERS)))
+
+        started = time.perf_counter()
+        assert await db.run_read(_slow_read, DELAY_MS) == DELAY_MS
+        single = time.perf_counter() - started
+
+        ticks = 0
+        running = True
+
+        async def ticker():
+            nonlocal ticks
+            while running:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker_task = asyncio.ensure_future(ticker())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(db.run_read(_slow_read, DELAY_MS) for _ in range(READERS)))
+        elapsed = time.perf_counter() - started
+        running = False
+        await ticker_task
+        return single, elapsed, results, ticks
+
+    single, elapsed, results, ticks = asyncio.run(scenario())
+    assert results == [DELAY_MS] * READERS
+    # Послідовно це тривало б READERS * single
+    assert elapsed < READERS * single / 2
+    # Event loop не блокувався, поки читання виконувались
+    assert ticks > 100
+
+
+def _insert_drink(conn, username):
+    return conn.execute(
+        "INSERT INTO drinks (user_id, username, alcohol_type, volume, proof) VALUES (1, ?, 'beer', 500, 5)",
+        (username,)
+    ).lastrowid
+
+
+# Запис, який встигає змінити базу і лише потім падає
+def _insert_and_fail(conn, username):
+    _insert_drink(conn, username)
+    conn.execute("UPDATE drinks SET status = 'approved'")
+    raise ValueError(username)
+
+
+def test_failed_write_rolls_back_alone(conn, monkeypatch):
+    batch_sizes = []
+    commit_batch = db._commit_batch
+
+    def recording_commit_batch(batch):
+        batch_sizes.append(len(batch))
+        commit_batch(batch)
+
+    monkeypatch.setattr(db, '_commit_batch', recording_commit_batch)
+
+    async def scenario():
+        # Довге вікно групового коміту: усі три записи потрапляють в один пакет
+        db.start(write_batch=10, write_flush_ms=200)
+        return await asyncio.gather(
+            db.run_write(_insert_drink, 'first'),
+            db.run_write(_insert_and_fail, 'broken'),
+            db.run_write(_insert_drink, 'last'),
+            return_exceptions=True
+        )
+
+    first, error, last = asyncio.run(scenario())
+    assert batch_sizes == [3]
+    assert isinstance(error, ValueError) and str(error) == 'broken'
+    assert conn.execute('SELECT id, username, status FROM drinks ORDER BY id').fetchall() == [
+        (first, 'first', 'pending'),
+        (last, 'last', 'pending'),
+    ]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from bans import BanIndex
+from expiry import ExpiryHeap
+from sessions import SessionStore
+
+
+def test_pop_due_returns_entries_in_deadline_order():
+    heap = ExpiryHeap(lambda deadline: deadline - time.time())
+    for deadline, key in [(3, 'c'), (1, 'a'), (5, 'e'), (2, 'b')]:
+        heap.push(deadline, key)
+    assert list(heap.pop_due(3)) == [(1, 'a'), (2, 'b'), (3, 'c')]
+    assert len(heap) == 1
+    heap.reset([(4, 'd')])
+    assert list(heap.pop_due(10)) == [(4, 'd')]
+
+
+# Новий найближчий термін будить задачу, яка спить max_interval
+def test_run_wakes_up_for_earlier_deadline():
+    heap = ExpiryHeap(lambda deadline: deadline - time.monotonic())
+    expired = []
+
+    async def expire():
+        expired.extend(key for _, key in heap.pop_due(time.monotonic()))
+
+    async def scenario():
+        task = asyncio.create_task(heap.run(expire, max_interval=60))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        heap.push(started + 0.05, 'soon')
+        while not expired and time.monotonic() - started < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 1
+    assert expired == ['soon']
+
+
+def test_ban_expirer_notifies_once():
+    bans = BanIndex()
+    notified = []
+
+    async def on_expire(user_id):
+        notified.append(user_id)
+
+    async def scenario():
+        task = asyncio.create_task(bans.run_expirer(on_expire, max_interval=60))
+        await asyncio.sleep(0.01)
+        bans.add(1, datetime.now() + timedelta(seconds=0.05))
+        bans.add(2, datetime.now() + timedelta(hours=1))
+        bans.add(1, datetime.now() + timedelta(seconds=0.1))  # бан продовжено
+        await asyncio.sleep(0.3)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert notified == [1]
+    assert bans.get(1) is None and bans.get(2) is not None
+
+
+def test_session_sweeper_removes_expired_sessions():
+    store = SessionStore(ttl=0.05)
+
+    async def scenario():
+        task = asyncio.create_task(store.run_sweeper(max_interval=60))
+        await asyncio.sleep(0.01)
+        store.create(1, "user1")
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert len(store) == 0
@@ -0,0 +1,126 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+from types import SimpleNamespace
+import pytest
+from pyrogram import enums
+import export
+
+DRINKS = [
+    (1, 'олег', 'beer', 'Світле', 500, 4.5, 'approved', 'video1', '2024-01-01 10:00:00'),
+    (1, 'олег', 'wine', 'Червоне, сухе', 150, 12.0, 'pending', 'video2', '2024-01-02 20:30:00'),
+    (2, 'anna "a"', 'vodka', None, 50, 40.0, 'rejected', 'video3', '2024-01-03 23:59:59'),
+]
+
+
+@pytest.fixture
+def drinks(conn):
+    with conn:
+        conn.executemany(
+            '''INSERT INTO drinks (user_id, username, alcohol_type, subtype, volume, proof,
+                                   status, video_file_id, timestamp)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', DRINKS)
+    return conn.execute(export.ALL_QUERY).fetchall()
+
+
+def read_export(path, fmt):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+        if fmt == 'json':
+            return json.load(file)
+        return list(csv.reader(file))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 1000])
+def test_csv_round_trip(drinks, monkeypatch, chunk_size):
+    monkeypatch.setattr(export, 'CHUNK_SIZE', chunk_size)
+    path, count = export.export_to_file(export.ALL_QUERY, (), export.ALL_COLUMNS, 'csv')
+    try:
+        header, *rows = read_export(path, 'csv')
+    finally:
+        os.remove(path)
+    assert count == len(drinks)
+    assert tuple(header) == export.ALL_COLUMNS
+    assert rows == [['' if value is None else str(value) for value in row] for row in drinks]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 1000])
+def test_json_round_trip(drinks, monkeypatch, chunk_size):
+    monkeypatch.setattr(export, 'CHUNK_SIZE', chunk_size)
+    path, count = export.export_to_file(export.ALL_QUERY, (), export.ALL_COLUMNS, 'json')
+    try:
+        records = read_export(path, 'json')
+    finally:
+        os.remove(path)
+    assert count == len(drinks)
+    assert records == [dict(zip(export.ALL_COLUMNS, row)) for row in drinks]
+
+
+def test_user_export_only_contains_own_rows(drinks):
+    path, count = export.export_to_file(export.USER_QUERY, (1,), export.USER_COLUMNS, 'json')
+    try:
+        records = read_export(path, 'json')
+    finally:
+        os.remove(path)
+    assert count == 2
+    assert [record['id'] for record in records] == [row[0] for row in drinks if row[1] == 1]
+
+
+def test_empty_export_is_valid_json(conn):
+    path, count = export.export_to_file(export.ALL_QUERY, (), export.ALL_COLUMNS, 'json')
+    try:
+        assert read_export(path, 'json') == []
+    finally:
+        os.remove(path)
+    assert count == 0
+
+
+def fake_message(chat_type, command, chat_id=-100):
+    replies = []
+
+    async def edit_text(text, **kwargs):
+        replies.append(text)
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+        return SimpleNamespace(edit_text=edit_text)
+
+    return SimpleNamespace(
+        id=10,
+        chat=SimpleNamespace(id=chat_id, type=chat_type),
+        from_user=SimpleNamespace(id=1, username='admin'),
+        command=command,
+        reply_text=reply_text,
+        replies=replies,
+    )
+
+
+@pytest.mark.parametrize('chat_type', [enums.ChatType.GROUP, enums.ChatType.SUPERGROUP])
+@pytest.mark.parametrize('command', ['export', 'export_all'])
+def test_export_refused_in_group_chats(bot, chat_type, command):
+    handler = getattr(bot, f'{command}_command')
+    message = fake_message(chat_type, [command, 'json'])
+    asyncio.run(handler(None, message))
+    assert message.replies == [bot.PRIVATE_ONLY_TEXT]
+
+
+# Документ надсилається через outbox (ліміти чатів і повтор після FloodWait)
+def test_export_document_goes_through_outbox(bot, drinks, monkeypatch):
+    sent = []
+
+    async def send_document(**kwargs):
+        sent.append((kwargs, read_export(kwargs['document'], 'json')))
+
+    monkeypatch.setattr(bot.app, 'send_document', send_document)
+    message = fake_message(enums.ChatType.PRIVATE, ['export', 'json'], chat_id=1)
+    delivered = bot.outbox.counters['sent']
+    asyncio.run(bot.export_command(None, message))
+
+    assert bot.outbox.counters['sent'] == delivered + 1
+    (kwargs, records), = sent
+    assert kwargs['chat_id'] == 1 and kwargs['reply_to_message_id'] == message.id
+    assert kwargs['file_name'] == 'alcometer_1.json.gz'
+    assert [record['id'] for record in records] == [row[0] for row in drinks if row[1] == 1]
+    assert not os.path.exists(kwargs['document'])
+    assert message.replies[-1] == "✅ Файл готовий."
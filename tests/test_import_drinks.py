@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import pytest
+import yaml
+import aggregates
+import database as db
+import export
+import import_drinks
+
+COLUMNS = ('user_id', 'username', 'alcohol_type', 'volume', 'proof', 'status', 'timestamp')
+TYPES = ('beer', 'wine', 'vodka')
+TOTALS_QUERY = 'SELECT * FROM user_totals ORDER BY user_id'
+
+
+# Тимчасова конфігурація, з якою import_drinks.run відкриває базу
+@pytest.fixture
+def database_path(config, tmp_path, monkeypatch):
+    path = tmp_path / 'import.db'
+    config = dict(config, database={'path': str(path)})
+    config['bot'] = dict(config['bot'], api_id=1, admin_ids=[1])
+    config_path = tmp_path / 'config.yml'
+    with open(config_path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(config, file, allow_unicode=True, sort_keys=False)
+    monkeypatch.setenv('ALCOMETERBOT_CONFIG', str(config_path))
+    yield path
+    db.shutdown()
+
+
+# 95 записів, кожен 10-й з невідомим типом алкоголю
+def write_csv(path, count=95):
+    rows = []
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        for n in range(count):
+            alcohol_type = 'kvass' if n % 10 == 9 else TYPES[n % 3]
+            row = (n % 7 + 1, f"user{n % 7 + 1}", alcohol_type, 100 + n, '',
+                   'approved' if n % 4 else 'rejected', f"2024-01-{n % 28 + 1:02d} 12:00:00")
+            writer.writerow(row)
+            rows.append(row)
+    return [row for row in rows if row[2] != 'kvass']
+
+
+def drinks_indexes(conn):
+    return sorted(row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'drinks' AND sql IS NOT NULL"
+    ))
+
+
+def test_resume_after_interrupt_has_no_duplicates(database_path, tmp_path, monkeypatch):
+    source = tmp_path / 'old_bot.csv'
+    expected = write_csv(source)
+    rejects = tmp_path / 'rejects.jsonl'
+    original_flush = import_drinks.flush
+    calls = []
+
+    # Ctrl+C під час третього пакета: він не зберігається, два попередні - так
+    def interrupted_flush(*args):
+        calls.append(args[2])
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        original_flush(*args)
+
+    monkeypatch.setattr(import_drinks, 'flush', interrupted_flush)
+    with pytest.raises(SystemExit):
+        import_drinks.run(str(source), 'csv', {}, 10, False, str(rejects))
+    conn = db.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM drinks').fetchone()[0] == 18
+    assert conn.execute('SELECT position FROM import_progress').fetchone()[0] == 20
+    assert drinks_indexes(conn) == []
+
+    monkeypatch.setattr(import_drinks, 'flush', original_flush)
+    import_drinks.run(str(source), 'csv', {}, 10, False, str(rejects))
+    conn = db.get_connection()
+
+    imported = conn.execute(
+        'SELECT user_id, username, alcohol_type, volume, status, timestamp FROM drinks ORDER BY id'
+    ).fetchall()
+    assert imported == [(row[0], row[1], row[2], row[3], row[5], row[6]) for row in expected]
+    assert conn.execute(
+        'SELECT position, imported, rejected, deferred_indexes FROM import_progress'
+    ).fetchone() == (95, len(expected), 95 - len(expected), None)
+    with open(rejects, encoding='utf-8') as file:
+        assert [json.loads(line)['position'] for line in file] == list(range(10, 96, 10))
+    assert drinks_indexes(conn) != []
+
+    # Підсумки перераховано з імпортованих записів
+    totals = conn.execute(TOTALS_QUERY).fetchall()
+    with conn:
+        aggregates.rebuild(conn)
+    assert conn.execute(TOTALS_QUERY).fetchall() == totals
+    assert sum(row[2] for row in totals) == len(expected)
+
+    with pytest.raises(ValueError):
+        import_drinks.run(str(source), 'csv', {}, 10, False, None)
+
+
+def test_export_can_be_imported_back(database_path, tmp_path):
+    source = tmp_path / 'old_bot.csv'
+    write_csv(source)
+    import_drinks.run(str(source), 'csv', {}, 25, False, None)
+    conn = db.get_connection()
+    totals = conn.execute(TOTALS_QUERY).fetchall()
+
+    path, count = export.export_to_file(export.ALL_QUERY, (), export.ALL_COLUMNS, 'json')
+    try:
+        conn.execute('DELETE FROM drinks')
+        conn.commit()
+        import_drinks.run(path, 'json', {}, 25, False, None)
+    finally:
+        os.remove(path)
+    conn = db.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM drinks').fetchone()[0] == count
+    assert conn.execute(TOTALS_QUERY).fetchall() == totals
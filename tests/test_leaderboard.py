@@ -0,0 +1,123 @@
+import asyncio
+import bisect
+import random
+import pytest
+import aggregates
+import database as db
+from leaderboard import Leaderboard, SortedKeys
+
+
+def add_drink(conn, user_id, volume=500, proof=5.0):
+    with conn:
+        record_id = conn.execute('''
+            INSERT INTO drinks (user_id, username, alcohol_type, volume, proof, video_file_id)
+            VALUES (?, ?, 'beer', ?, ?, 'video')
+        ''', (user_id, f"user{user_id}", volume, proof)).lastrowid
+        aggregates.record_added(conn, user_id, f"user{user_id}", 'beer')
+    return record_id
+
+
+# Як обробник модерації: рейтинг оновлюється одразу після запису
+async def approve(bot, record_id):
+    row = await db.run_write(aggregates.set_status, record_id, 'approved')
+    bot.leaderboard.apply_status_change(row, 'approved')
+
+
+def test_check_does_not_report_concurrent_approvals(bot, conn):
+    record_ids = [add_drink(conn, user_id % 20 + 1) for user_id in range(200)]
+    bot.leaderboard.load(conn.execute(bot.LEADERBOARD_QUERY).fetchall())
+
+    async def scenario():
+        drifts = []
+        for start in range(0, len(record_ids), 10):
+            tasks = [approve(bot, record_id) for record_id in record_ids[start:start + 10]]
+            tasks.insert(5, bot.check_leaderboard())
+            results = await asyncio.gather(*tasks)
+            drifts.append(results[5])
+        return drifts
+
+    assert asyncio.run(scenario()) == [[]] * 20
+    assert bot.leaderboard.find_drift(conn.execute(bot.LEADERBOARD_QUERY).fetchall()) == []
+
+
+# Затвердження, закомічене поки читається довгий знімок, не вважається розбіжністю
+def test_approval_during_slow_snapshot(bot, conn):
+    with conn:
+        conn.executemany('INSERT INTO user_totals (user_id, username) VALUES (?, ?)',
+                         ((user_id, 'x' * 50) for user_id in range(1000, 101000)))
+    record_id = add_drink(conn, 1)
+    bot.leaderboard.load(conn.execute(bot.LEADERBOARD_QUERY).fetchall())
+
+    async def scenario():
+        check = asyncio.create_task(bot.check_leaderboard())
+        await asyncio.sleep(0.02)
+        await approve(bot, record_id)
+        return await check
+
+    assert asyncio.run(scenario()) == []
+    assert bot.leaderboard.rank(1) is not None
+
+
+def test_check_reloads_on_drift(bot, conn):
+    record_id = add_drink(conn, 1)
+    with conn:
+        aggregates.set_status(conn, record_id, 'approved')
+    bot.leaderboard.load([])
+    assert asyncio.run(bot.check_leaderboard()) == [1]
+    assert bot.leaderboard.rank(1)[0] == 1
+    assert asyncio.run(bot.check_leaderboard()) == []
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sorted_keys_matches_sorted_list(monkeypatch, seed):
+    monkeypatch.setattr(SortedKeys, 'LOAD', 4)
+    rng = random.Random(seed)
+    initial = {(rng.random(), user_id) for user_id in range(rng.randint(0, 50))}
+    keys = SortedKeys(initial)
+    expected = sorted(initial)
+    for _ in range(3000):
+        if expected and rng.random() < 0.45:
+            key = expected[rng.randrange(len(expected))]
+            keys.remove(key)
+            expected.remove(key)
+        else:
+            key = (rng.choice([0.5, rng.random()]), rng.randrange(10 ** 6))
+            if key in expected:
+                continue
+            keys.add(key)
+            bisect.insort(expected, key)
+        probe = (rng.random(), rng.randrange(10 ** 6))
+        assert keys.index(probe) == bisect.bisect_left(expected, probe)
+        assert len(keys) == len(expected)
+        if expected:
+            position = rng.randrange(len(expected))
+            assert keys[position] == expected[position]
+            assert keys.index(expected[position]) == position
+    assert list(keys) == expected
+    with pytest.raises(IndexError):
+        keys[len(expected)]
+
+
+# Рейтинг після випадкових змін збігається з сортуванням підсумків
+def test_leaderboard_rank_matches_naive_order(monkeypatch):
+    monkeypatch.setattr(SortedKeys, 'LOAD', 4)
+    rng = random.Random(1)
+    board = Leaderboard()
+    totals = {}
+    for _ in range(2000):
+        user_id = rng.randint(1, 60)
+        approved, pure = totals.get(user_id, (0, 0.0))
+        if approved and rng.random() < 0.3:
+            delta = (-1, -round(pure / approved, 2))
+        else:
+            delta = (1, rng.choice([2.5, 20.0, rng.uniform(1, 30)]))
+        board.update(user_id, f"user{user_id}", delta[0], 0, delta[1])
+        totals[user_id] = (approved + delta[0], pure + delta[1])
+
+    ranked = sorted((-pure, user_id) for user_id, (approved, pure) in totals.items() if approved > 0)
+    assert [row[0] for row in board.top(len(ranked))] == [user_id for _, user_id in ranked]
+    for position, (_, user_id) in enumerate(ranked, 1):
+        rank = board.rank(user_id)
+        assert rank[0] == position and rank[4] == len(ranked)
+        if position > 1:
+            assert rank[3] == f"user{ranked[position - 2][1]}"
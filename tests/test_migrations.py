@@ -0,0 +1,87 @@
+import pytest
+import export
+import migrations
+import violations
+from slowlog import has_full_scan
+
+
+def _plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+# SQL, який реально виконує функція (з підставленими параметрами)
+def _traced(conn, fn, *args):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        fn(conn, *args)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+
+def _assert_index_search(plan, table='drinks', ordered=True):
+    assert any(
+        line.startswith(f'SEARCH {table} USING') and ('INDEX' in line or 'PRIMARY KEY' in line)
+        for line in plan
+    ), plan
+    assert not has_full_scan(plan), plan
+    if ordered:
+        assert not any('TEMP B-TREE' in line for line in plan), plan
+
+
+def test_user_version_matches_migrations(conn):
+    assert migrations.get_version(conn) == len(migrations.MIGRATIONS)
+
+
+def test_migration_versions_are_sequential():
+    versions = [version for version, _, _ in migrations.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_migrate_is_idempotent(conn):
+    assert migrations.migrate(conn) == len(migrations.MIGRATIONS)
+
+
+def test_drinks_indexes(conn):
+    names = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'drinks' AND sql IS NOT NULL"
+    )}
+    assert names == {
+        'idx_drinks_user_id',
+        'idx_drinks_user_status_id',
+        'idx_drinks_user_type_id',
+        'idx_drinks_user_status_type_id',
+        'idx_drinks_status_id',
+    }
+
+
+def test_pending_queue_plans(bot, conn):
+    for sql in _traced(conn, bot._fetch_review_page, 0, 10):
+        _assert_index_search(_plan(conn, sql))
+    _assert_index_search(_plan(conn, "SELECT COUNT(*) FROM drinks WHERE status = 'pending'"), ordered=False)
+
+
+@pytest.mark.parametrize('status', [None, 'approved'])
+@pytest.mark.parametrize('alcohol_type', [None, 'beer'])
+@pytest.mark.parametrize('cursor, direction', [(None, 'older'), (100, 'older'), (100, 'newer')])
+def test_history_keyset_plans(bot, conn, status, alcohol_type, cursor, direction):
+    statements = _traced(conn, bot._fetch_history_page, 5, status, alcohol_type, cursor, direction)
+    assert statements
+    for sql in statements:
+        _assert_index_search(_plan(conn, sql))
+
+
+def test_per_user_plans(bot, conn):
+    for sql in _traced(conn, bot._find_legacy_pending_record, 5, 500):
+        _assert_index_search(_plan(conn, sql))
+    _assert_index_search(_plan(conn, export.USER_QUERY, (5,)))
+
+
+def test_ban_plans(bot, conn):
+    for sql in _traced(conn, violations.get_state, 5):
+        _assert_index_search(_plan(conn, sql), table='user_violations')
+    # Завантаження активних банів при старті: прохід лише по індексу violations
+    plan = _plan(conn, bot.ACTIVE_BANS_QUERY, ('2024-01-01 00:00:00',))
+    assert not has_full_scan(plan), plan
+    assert any('COVERING INDEX idx_violations_user_ban_until' in line for line in plan), plan
@@ -0,0 +1,122 @@
+import asyncio
+import time
+import pytest
+from pyrogram.errors import FloodWait
+import outbound
+from outbound import Outbound, PRIORITY_ADMIN, PRIORITY_BACKLOG, PRIORITY_USER
+
+
+# Метод надсилання, який кидає FloodWait перші failures разів
+class FakeSend:
+    def __init__(self, failures=0, wait=0):
+        self.failures = failures
+        self.wait = wait
+        self.calls = []
+
+    async def __call__(self, **kwargs):
+        self.calls.append((time.monotonic(), kwargs))
+        if len(self.calls) <= self.failures:
+            raise FloodWait(value=self.wait)
+        return kwargs['text']
+
+
+def test_flood_wait_is_retried(monkeypatch):
+    slept = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        slept.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(outbound.asyncio, 'sleep', sleep)
+    send = FakeSend(failures=2, wait=7)
+
+    async def scenario(box):
+        return await box.send(send, chat_id=1, text='hi')
+
+    box = Outbound(max_retries=3)
+    assert asyncio.run(scenario(box)) == 'hi'
+    assert len(send.calls) == 3
+    assert slept.count(7) == 2
+    assert box.counters['flood_waits'] == 2 and box.counters['retries'] == 2
+    assert box.counters['flood_wait_seconds'] == 14 and box.counters['sent'] == 1
+
+
+def test_flood_wait_gives_up_after_max_retries():
+    send = FakeSend(failures=10)
+
+    async def scenario(box):
+        with pytest.raises(FloodWait):
+            await box.send(send, chat_id=1, text='hi')
+
+    box = Outbound(max_retries=2)
+    asyncio.run(scenario(box))
+    assert len(send.calls) == 3
+    assert box.counters['failed'] == 1 and box.counters['sent'] == 0
+
+
+def test_priority_order():
+    order = []
+
+    async def scenario(box):
+        gate = asyncio.Event()
+
+        async def blocker(**kwargs):
+            await gate.wait()
+
+        async def record(**kwargs):
+            order.append(kwargs['text'])
+
+        first = box.submit(blocker, PRIORITY_USER)
+        await asyncio.sleep(0)
+        futures = [
+            box.submit(record, PRIORITY_BACKLOG, text='backlog1'),
+            box.submit(record, PRIORITY_ADMIN, text='admin1'),
+            box.submit(record, PRIORITY_USER, text='user1'),
+            box.submit(record, PRIORITY_BACKLOG, text='backlog2'),
+            box.submit(record, PRIORITY_USER, text='user2'),
+            box.submit(record, PRIORITY_ADMIN, text='admin2'),
+        ]
+        assert box.stats()['queue_backlog'] == 2
+        gate.set()
+        await asyncio.gather(first, *futures)
+
+    # Один воркер і великі ліміти: порядок визначає лише черга
+    box = Outbound(global_rate=1000, chat_rate=1000, chat_burst=1000, workers=1)
+    asyncio.run(scenario(box))
+    assert order == ['user1', 'user2', 'admin1', 'admin2', 'backlog1', 'backlog2']
+
+
+def test_chat_bucket_limits_one_chat_only():
+    send = FakeSend()
+
+    async def scenario(box):
+        await asyncio.gather(*(box.send(send, chat_id=chat_id, text=str(chat_id))
+                               for chat_id in (1, 1, 1, 2, 3)))
+
+    box = Outbound(global_rate=1000, chat_rate=10, chat_burst=1, workers=5)
+    started = time.monotonic()
+    asyncio.run(scenario(box))
+    sent_at = {}
+    for at, kwargs in send.calls:
+        sent_at.setdefault(kwargs['chat_id'], []).append(at - started)
+    # У чат 1: одразу, через 0.1 с і через 0.2 с; інші чати не чекають
+    first, second, third = sent_at[1]
+    assert second - first >= 0.09 and third - first >= 0.19
+    assert sent_at[2][0] < 0.05 and sent_at[3][0] < 0.05
+
+
+def test_global_bucket_limits_all_chats():
+    send = FakeSend()
+
+    async def scenario(box):
+        await asyncio.gather(*(box.send(send, chat_id=chat_id, text='x') for chat_id in range(30)))
+
+    # У запасі 20 токенів з 50: решта 10 повідомлень чекають 10 / 50 = 0.2 с
+    box = Outbound(global_rate=50, workers=30)
+    box.global_bucket.tokens = 20
+    started = time.monotonic()
+    asyncio.run(scenario(box))
+    sent_at = sorted(at - started for at, _ in send.calls)
+    assert sent_at[19] < 0.05
+    assert 0.15 <= sent_at[-1] < 0.5
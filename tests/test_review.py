@@ -0,0 +1,70 @@
+import asyncio
+import aggregates
+import violations
+
+
+def add_pending(conn, user_id, volume=500, proof=5.0):
+    record_id = conn.execute('''
+        INSERT INTO drinks (user_id, username, alcohol_type, volume, proof, video_file_id)
+        VALUES (?, ?, 'beer', ?, ?, 'video')
+    ''', (user_id, f"user{user_id}", volume, proof)).lastrowid
+    aggregates.record_added(conn, user_id, f"user{user_id}", 'beer')
+    return record_id
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+
+def resolve(bot, monkeypatch, record_ids, action):
+    updates = []
+    monkeypatch.setattr(bot.leaderboard, 'update', lambda *args: updates.append(args))
+    client = FakeClient()
+    resolved = asyncio.run(bot._resolve_review_batch(client, record_ids, action))
+    return resolved, updates, sorted(client.messages)
+
+
+def test_approve_batch_skips_records_resolved_elsewhere(bot, conn, monkeypatch):
+    with conn:
+        first = [add_pending(conn, 1, 500, 5.0), add_pending(conn, 1, 100, 40.0), add_pending(conn, 1)]
+        second = [add_pending(conn, 2, 330, 6.0), add_pending(conn, 2, 330, 6.0)]
+        # Інший адміністратор уже затвердив одну заявку і відхилив іншу
+        bot._moderate_in_transaction(conn, first[2], 'rejected')
+        bot._moderate_in_transaction(conn, second[0], 'approved')
+
+    resolved, updates, messages = resolve(bot, monkeypatch, first + second, 'approve')
+
+    assert resolved == 3
+    # Одна зміна рейтингу на користувача з сумою по його записах
+    assert sorted(updates) == [(1, 'user1', 2, 600, 65.0), (2, 'user2', 1, 330, 19.8)]
+    assert messages == [(1, "🎉 Адміністратор підтвердив ваші записи: 2"),
+                        (2, "🎉 Адміністратор підтвердив ваші записи: 1")]
+    statuses = dict(conn.execute('SELECT id, status FROM drinks'))
+    assert statuses[first[2]] == 'rejected'
+    assert conn.execute('SELECT approved, volume FROM user_totals WHERE user_id = 2').fetchone() == (2, 660)
+    assert all(record_id in bot.resolved_records for record_id in first + second)
+
+
+def test_reject_batch_checks_penalty_once_per_user(bot, conn, monkeypatch):
+    with conn:
+        earlier = [add_pending(conn, 4) for _ in range(2)]
+        for record_id in earlier:
+            bot._moderate_in_transaction(conn, record_id, 'rejected')
+        batch = [add_pending(conn, 4) for _ in range(3)] + [add_pending(conn, 5)]
+        bot._moderate_in_transaction(conn, batch[0], 'approved')
+
+    resolved, updates, messages = resolve(bot, monkeypatch, earlier + batch, 'reject')
+
+    assert resolved == 3
+    assert updates == []
+    # Відхилень стало 4, але бан видано один раз після всього пакета
+    assert violations.get_state(conn, 4)[:3] == (4, 1, 144)
+    assert conn.execute('SELECT COUNT(*) FROM violations WHERE user_id = 4').fetchone()[0] == 1
+    assert violations.get_state(conn, 5)[:2] == (1, 0)
+    assert bot.bans.get(4) is not None and bot.bans.get(5) is None
+    assert messages[0][0] == 4 and messages[0][1].startswith("❌ Адміністратор відхилив ваші записи: 2\n")
+    assert messages[1] == (5, "❌ Адміністратор відхилив ваші записи: 1")
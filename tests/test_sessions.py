@@ -0,0 +1,76 @@
+import asyncio
+import time
+from sessions import SessionStore
+
+
+def test_create_and_pop_leave_no_state_after_cutoff(conn):
+    store = SessionStore(ttl=300, persist=True)
+    store._disk_cutoff = time.time() - 1
+    for user_id in range(10000):
+        session = store.create(user_id, f"user{user_id}")
+        store.touch(session)
+        store.pop(user_id)
+    assert len(store) == 0
+    assert not store._checked
+    asyncio.run(store.flush())
+    assert not store._dirty
+    assert not store._removed
+    assert conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] == 0
+
+
+def test_checked_is_cleared_after_cutoff():
+    store = SessionStore(ttl=300, persist=True)
+    for user_id in range(100):
+        store.create(user_id, f"user{user_id}")
+    assert len(store._checked) == 100
+    store._disk_cutoff = time.time() - 1
+    store.create(100, "user100")
+    assert not store._checked
+
+
+def test_session_survives_restart(conn):
+    async def scenario():
+        store = SessionStore(ttl=300, persist=True)
+        session = store.create(1, "user1")
+        session.alcohol_type = 'beer'
+        store.touch(session)
+        await store.flush()
+
+        restarted = SessionStore(ttl=300, persist=True)
+        return await restarted.load(1)
+
+    session = asyncio.run(scenario())
+    assert session is not None and session.alcohol_type == 'beer'
+
+
+def test_touch_after_pop_is_ignored():
+    store = SessionStore(ttl=300)
+    session = store.create(1, "user1")
+    store.pop(1)
+    store.touch(session)
+    assert store.get(1) is None
+
+
+def test_touch_of_replaced_session_keeps_new_one():
+    store = SessionStore(ttl=300, max_sessions=1)
+    old = store.create(1, "user1")
+    new = store.create(1, "user1")
+    store.create(2, "user2")  # витісняє сесію користувача 1
+    store.touch(old)
+    store.touch(new)
+    assert 1 not in store and store.get(2) is not None
+
+
+def test_touch_after_pop_does_not_restore_row(conn):
+    async def scenario():
+        store = SessionStore(ttl=300, persist=True)
+        session = store.create(1, "user1")
+        await store.flush()
+        store.pop(1)
+        store.touch(session)
+        await store.flush()
+        restarted = SessionStore(ttl=300, persist=True)
+        return await restarted.load(1)
+
+    assert asyncio.run(scenario()) is None
+    assert conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] == 0
@@ -0,0 +1,79 @@
+import aggregates
+import violations
+
+# Бани за 1..12-м відхиленням поспіль (тривалість у годинах, None - без бану)
+EXPECTED_BANS = [None, None, 144, 288, 576, 288, 144, 72, 72, 72, 72, 72]
+
+
+# Правило з початкової версії бота (get_user_info), по повній історії з drinks і violations
+def baseline_ban_duration(conn, user_id):
+    rejected_count = conn.execute(
+        "SELECT COUNT(*) FROM drinks WHERE user_id = ? AND status = 'rejected'", (user_id,)
+    ).fetchone()[0]
+    bans = conn.execute(
+        'SELECT ban_duration FROM violations WHERE user_id = ? ORDER BY id DESC', (user_id,)
+    ).fetchall()
+    if rejected_count < 3:
+        return None
+    last_ban = bans[0][0] if bans else 72
+    if rejected_count > len(bans) * 2:
+        return min(last_ban * 2, 720)
+    return max(72, last_ban // 2)
+
+
+def add_pending(conn, user_id):
+    record_id = conn.execute('''
+        INSERT INTO drinks (user_id, username, alcohol_type, volume, proof, video_file_id)
+        VALUES (?, 'user', 'beer', 500, 5, 'video')
+    ''', (user_id,)).lastrowid
+    aggregates.record_added(conn, user_id, 'user', 'beer')
+    return record_id
+
+
+def test_escalation_matches_baseline_rules(bot, conn):
+    durations = []
+    for rejection in range(1, len(EXPECTED_BANS) + 1):
+        with conn:
+            record_id = add_pending(conn, 1)
+            expected = baseline_ban_duration_after_reject(conn, record_id)
+            record, rejected_count, ban_until = bot._moderate_in_transaction(conn, record_id, 'rejected')
+        assert record is not None and rejected_count == rejection
+        state = violations.get_state(conn, 1)
+        if ban_until is None:
+            durations.append(None)
+        else:
+            durations.append(state[2])
+            assert state[3] == ban_until.isoformat(sep=' ')
+        assert durations[-1] == expected, rejection
+        assert state[1] == sum(duration is not None for duration in durations)
+    assert durations == EXPECTED_BANS
+
+
+# Рішення за старим правилом, якби запис уже був відхилений
+def baseline_ban_duration_after_reject(conn, record_id):
+    conn.execute('SAVEPOINT baseline')
+    conn.execute("UPDATE drinks SET status = 'rejected' WHERE id = ?", (record_id,))
+    duration = baseline_ban_duration(conn, 1)
+    conn.execute('ROLLBACK TO baseline')
+    conn.execute('RELEASE baseline')
+    return duration
+
+
+def test_approved_records_do_not_count(bot, conn):
+    with conn:
+        for _ in range(5):
+            bot._moderate_in_transaction(conn, add_pending(conn, 2), 'approved')
+        for _ in range(2):
+            bot._moderate_in_transaction(conn, add_pending(conn, 2), 'rejected')
+    assert violations.get_state(conn, 2)[:2] == (2, 0)
+
+
+def test_rebuild_restores_state(bot, conn):
+    with conn:
+        for _ in range(5):
+            bot._moderate_in_transaction(conn, add_pending(conn, 3), 'rejected')
+    state = violations.get_state(conn, 3)
+    with conn:
+        violations.rebuild(conn)
+    assert violations.get_state(conn, 3) == state
+    assert state[:3] == (5, 3, 576)
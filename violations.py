@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+# Стан порушень користувача одним рядком у user_violations.
+# Лічильник відхилень оновлюється в тій самій транзакції, що й статус запису,
+# тому рішення про бан приймається за O(1) без перерахунку історії.
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS user_violations (
+        user_id INTEGER PRIMARY KEY,
+        rejected_count INTEGER NOT NULL DEFAULT 0,
+        ban_count INTEGER NOT NULL DEFAULT 0,
+        last_ban_duration INTEGER,   -- тривалість останнього бану в годинах
+        current_ban_until DATETIME   -- кінець останнього бану
+    )
+    ''',
+)
+
+# Кількість відхилень, після якої користувача блокують
+BAN_THRESHOLD = 3
+MIN_BAN_HOURS = 72    # 3 дні
+MAX_BAN_HOURS = 720   # 30 днів
+
+
+# Змінюємо лічильник відхилень (delta = 1 або -1)
+def record_rejection(conn, user_id, delta):
+    conn.execute('''
+        INSERT INTO user_violations (user_id, rejected_count)
+        VALUES (?, MAX(?, 0))
+        ON CONFLICT (user_id) DO UPDATE SET
+            rejected_count = MAX(rejected_count + ?, 0)
+    ''', (user_id, delta, delta))
+
+
+# (rejected_count, ban_count, last_ban_duration, current_ban_until)
+def get_state(conn, user_id):
+    row = conn.execute('''
+        SELECT rejected_count, ban_count, last_ban_duration, current_ban_until
+        FROM user_violations
+        WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+    return row or (0, 0, None, None)
+
+
+# Тривалість наступного бану за станом порушень
+def next_ban_duration(rejected_count, ban_count, last_ban_duration):
+    if rejected_count == 0:
+        return MIN_BAN_HOURS  # 3 дні для першого порушення
+    last_ban = last_ban_duration or MIN_BAN_HOURS
+    if rejected_count > ban_count * 2:
+        return min(last_ban * 2, MAX_BAN_HOURS)
+    return max(MIN_BAN_HOURS, last_ban // 2)  # Зменшуємо покарання
+
+
+# Записуємо бан і оновлюємо стан порушень; повертаємо ban_until
+def ban(conn, user_id, username, duration_hours):
+    ban_until = datetime.now().replace(microsecond=0) + timedelta(hours=duration_hours)
+    ban_until_text = ban_until.isoformat(sep=' ')
+    conn.execute('''
+        INSERT INTO violations (user_id, username, violation_type, ban_duration, ban_until)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, username, 'rejection_ban', duration_hours, ban_until_text))
+    conn.execute('''
+        INSERT INTO user_violations (user_id, ban_count, last_ban_duration, current_ban_until)
+        VALUES (?, 1, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            ban_count = ban_count + 1,
+            last_ban_duration = excluded.last_ban_duration,
+            current_ban_until = excluded.current_ban_until
+    ''', (user_id, duration_hours, ban_until_text))
+    return ban_until
+
+
+# Після відхилення (у тій самій транзакції) вирішуємо, чи блокувати користувача.
+# Повертає (rejected_count, ban_until або None)
+def apply_rejection_penalty(conn, user_id, username):
+    rejected_count, ban_count, last_ban_duration, _ = get_state(conn, user_id)
+    if rejected_count < BAN_THRESHOLD:
+        return rejected_count, None
+    duration = next_ban_duration(rejected_count, ban_count, last_ban_duration)
+    return rejected_count, ban(conn, user_id, username, duration)
+
+
+# Перераховуємо стан порушень з drinks і violations
+def rebuild(conn):
+    conn.execute('DELETE FROM user_violations')
+    conn.execute('''
+        INSERT INTO user_violations (user_id, rejected_count, ban_count, last_ban_duration, current_ban_until)
+        SELECT
+            users.user_id,
+            COALESCE(rejected.count, 0),
+            COALESCE(bans.count, 0),
+            (
+                SELECT ban_duration FROM violations AS last
+                WHERE last.user_id = users.user_id
+                ORDER BY last.timestamp DESC, last.id DESC
+                LIMIT 1
+            ),
+            bans.ban_until
+        FROM (
+            SELECT user_id FROM drinks WHERE status = 'rejected'
+            UNION
+            SELECT user_id FROM violations
+        ) AS users
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS count
+            FROM drinks
+            WHERE status = 'rejected'
+            GROUP BY user_id
+        ) AS rejected ON rejected.user_id = users.user_id
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS count, MAX(ban_until) AS ban_until
+            FROM violations
+            GROUP BY user_id
+        ) AS bans ON bans.user_id = users.user_id
+    ''')
+    return conn.execute('SELECT COUNT(*) FROM user_violations').fetchone()[0]